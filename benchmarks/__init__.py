@@ -0,0 +1,5 @@
+"""
+Microbenchmarks for the request hot path
+
+Run with `python -m benchmarks`; see benchmarks/runner.py for options.
+"""
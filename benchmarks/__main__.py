@@ -0,0 +1,8 @@
+"""
+Entry point for `python -m benchmarks`
+"""
+
+from benchmarks.runner import main
+
+
+main()
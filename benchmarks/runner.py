@@ -0,0 +1,292 @@
+"""
+Standalone benchmark runner
+
+Usage:
+    python -m benchmarks [-k FILTER] [--rounds N] [--min-time SECONDS]
+                         [--json PATH] [--compare BASELINE]
+
+Benchmarks are async or sync callables registered with `bench`. An optional
+`setup` async context manager prepares their input (seeded tables, clients)
+and is skipped, not failed, when its backend is unreachable. Each benchmark
+is calibrated so one round lasts at least `--min-time`, then timed for
+`--rounds` rounds; per-operation statistics are printed and, with `--json`,
+written to a file that a later run can `--compare` against.
+"""
+
+import sys
+import json
+import time
+import asyncio
+import platform
+import argparse
+import statistics
+import subprocess
+
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Callable
+from typing import Optional
+
+from contextlib import asynccontextmanager
+
+
+Setup = Callable[[], Any]
+
+
+class Benchmark:
+    """
+    Declaration of a single benchmark.
+
+    Attributes:
+        name (str): Unique name, dotted by group, e.g. 'ids.encode'.
+        func (Callable): Operation to time; receives the setup value if any.
+        setup (Optional[Setup]): Async context manager factory for the input.
+    """
+
+    def __init__(
+        self, name: str, func: Callable, setup: Optional[Setup] = None
+    ):
+        """
+        Declare a benchmark.
+
+        :param name: Unique benchmark name.
+        :param func: Sync or async operation to time.
+        :param setup: Async context manager factory yielding the input.
+        """
+        self.name = name
+        self.func = func
+        self.setup = setup
+        self.is_async = asyncio.iscoroutinefunction(func)
+
+    async def _time(self, arg: Any, iterations: int) -> float:
+        """
+        Run the operation `iterations` times and return the elapsed seconds.
+        """
+        args = () if arg is None else (arg,)
+        func = self.func
+        started = time.perf_counter()
+        if self.is_async:
+            for _ in range(iterations):
+                await func(*args)
+        else:
+            for _ in range(iterations):
+                func(*args)
+        return time.perf_counter() - started
+
+    async def measure(
+        self, arg: Any, rounds: int, min_time: float
+    ) -> Dict[str, Any]:
+        """
+        Calibrate and time the benchmark.
+
+        :param arg: Value yielded by the setup, or None.
+        :param rounds: Number of timed rounds.
+        :param min_time: Minimum duration of one round in seconds.
+        :return: Per-operation statistics in nanoseconds.
+        """
+        await self._time(arg, 1)
+        iterations = 1
+        while True:
+            elapsed = await self._time(arg, iterations)
+            if elapsed >= min_time or iterations >= 1_000_000:
+                break
+            iterations *= 10 if elapsed < min_time / 10 else 2
+
+        samples = sorted([
+            await self._time(arg, iterations) / iterations * 1e9
+            for _ in range(rounds)
+        ])
+        median = statistics.median(samples)
+        return {
+            "name": self.name,
+            "rounds": rounds,
+            "iterations": iterations,
+            "min_ns": samples[0],
+            "median_ns": median,
+            "mean_ns": statistics.fmean(samples),
+            "p95_ns": samples[min(int(len(samples) * 0.95), len(samples) - 1)],
+            "stdev_ns": statistics.stdev(samples) if rounds > 1 else 0.0,
+            "ops_per_sec": 1e9 / median if median else 0.0,
+        }
+
+
+class BenchmarkRegistry:
+    """
+    Registry of declared benchmarks.
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty registry.
+        """
+        self._benchmarks: Dict[str, Benchmark] = {}
+
+    def bench(self, name: str, setup: Optional[Setup] = None) -> Callable:
+        """
+        Decorator registering a benchmark.
+
+        :param name: Unique benchmark name.
+        :param setup: Async context manager factory yielding the input.
+        :return: Decorator returning the function unchanged.
+        """
+        def decorator(func: Callable) -> Callable:
+            self._benchmarks[name] = Benchmark(name, func, setup)
+            return func
+
+        return decorator
+
+    def select(self, pattern: Optional[str] = None) -> List[Benchmark]:
+        """
+        Return benchmarks whose name contains `pattern`, in declaration order.
+
+        :param pattern: Substring filter; every benchmark when None.
+        :return: Matching benchmarks.
+        """
+        return [
+            b for name, b in self._benchmarks.items()
+            if not pattern or pattern in name
+        ]
+
+
+benchmarks = BenchmarkRegistry()
+bench = benchmarks.bench
+
+
+@asynccontextmanager
+async def _no_setup():
+    yield None
+
+
+async def run(
+    selected: List[Benchmark],
+    rounds: int,
+    min_time: float,
+) -> List[Dict[str, Any]]:
+    """
+    Run benchmarks, grouping those that share a setup into one context.
+
+    :param selected: Benchmarks to run.
+    :param rounds: Number of timed rounds per benchmark.
+    :param min_time: Minimum duration of one round in seconds.
+    :return: One result per benchmark; 'skipped' is set when the setup
+        failed and 'error' when the benchmark itself raised.
+    """
+    results = []
+    groups: Dict[Any, List[Benchmark]] = {}
+    for benchmark in selected:
+        groups.setdefault(benchmark.setup or _no_setup, []).append(benchmark)
+
+    for setup, members in groups.items():
+        try:
+            async with setup() as arg:
+                for benchmark in members:
+                    try:
+                        result = await benchmark.measure(arg, rounds, min_time)
+                    except Exception as e:
+                        result = {"name": benchmark.name, "error": repr(e)}
+                    results.append(result)
+                    _print_result(result)
+        except Exception as e:
+            done = {r["name"] for r in results}
+            for benchmark in members:
+                if benchmark.name not in done:
+                    result = {"name": benchmark.name, "skipped": repr(e)}
+                    results.append(result)
+                    _print_result(result)
+    return results
+
+
+def _format_ns(value: float) -> str:
+    """
+    Format a duration in nanoseconds with a readable unit.
+    """
+    for unit, scale in (("s", 1e9), ("ms", 1e6), ("us", 1e3)):
+        if value >= scale:
+            return f"{value / scale:.2f}{unit}"
+    return f"{value:.0f}ns"
+
+
+def _print_result(
+    result: Dict[str, Any], baseline: Optional[Dict] = None
+) -> None:
+    """
+    Print one result line, with the change against a baseline if given.
+    """
+    for status in ("skipped", "error"):
+        if status in result:
+            print(f"{result['name']:<40} {status}: {result[status]}")
+            return
+    line = (
+        f"{result['name']:<40} median {_format_ns(result['median_ns']):>10}"
+        f"  p95 {_format_ns(result['p95_ns']):>10}"
+        f"  {result['ops_per_sec']:>12,.0f} ops/s"
+    )
+    if baseline and "median_ns" in baseline:
+        change = result["median_ns"] / baseline["median_ns"] - 1
+        line += f"  {change:+.1%}"
+    print(line, flush=True)
+
+
+def _metadata() -> Dict[str, Any]:
+    """
+    Describe the environment a run was made in.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+    }
+
+
+def main() -> None:
+    """
+    Parse arguments, run the selected benchmarks and report the results.
+    """
+    parser = argparse.ArgumentParser(description="Hot path microbenchmarks")
+    parser.add_argument(
+        "-k", dest="pattern", help="Only names containing this"
+    )
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--min-time", type=float, default=0.01)
+    parser.add_argument(
+        "--json", dest="output", help="Write results to a file"
+    )
+    parser.add_argument("--compare", help="Baseline JSON of an earlier run")
+    args = parser.parse_args()
+
+    from benchmarks import suites  # noqa: F401  registers the benchmarks
+
+    results = asyncio.run(
+        run(benchmarks.select(args.pattern), args.rounds, args.min_time)
+    )
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = {
+                r["name"]: r for r in json.load(baseline_file)["results"]
+            }
+        print(f"\nCompared with {args.compare}:")
+        for result in results:
+            _print_result(result, baseline.get(result["name"]))
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(
+                {"meta": _metadata(), "results": results},
+                output_file, indent=2,
+            )
+        print(f"Results written to {args.output}")
+
+    if any("error" in r for r in results):
+        sys.exit(1)
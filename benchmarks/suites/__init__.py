@@ -0,0 +1,9 @@
+"""
+Benchmark suites; importing this package registers every benchmark.
+"""
+
+from . import responses  # noqa
+from . import ids  # noqa
+from . import pagination  # noqa
+from . import limiter  # noqa
+from . import roundtrip  # noqa
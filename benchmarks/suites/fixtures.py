@@ -0,0 +1,147 @@
+"""
+Shared benchmark fixtures
+
+Backends are the ones configured in .env; point them at local stand-ins
+(e.g. the docker-compose services) before running. A fixture whose backend
+is disabled or unreachable raises, and its benchmarks are reported as
+skipped. Database fixtures write inside a transaction or a throwaway
+collection and leave no data behind.
+"""
+
+import os
+import uuid
+import asyncio
+
+from datetime import datetime
+from datetime import timezone
+
+from contextlib import asynccontextmanager
+
+from db.registry import registry
+
+
+SEED_ROWS = 1000
+PAGE_SIZE = 20
+
+
+def make_users(count: int) -> list:
+    """
+    Build transient User instances with every column populated.
+    """
+    from src.models.user import User
+
+    now = datetime.now(timezone.utc)
+    return [
+        User(id=i, name=f"user-{i}", created_at=now, updated_at=now)
+        for i in range(1, count + 1)
+    ]
+
+
+@asynccontextmanager
+async def users():
+    """
+    Yield 50 transient users for serialization benchmarks.
+    """
+    yield make_users(50)
+
+
+@asynccontextmanager
+async def fernet():
+    """
+    Make sure a Fernet key is configured, generating a throwaway one.
+    """
+    if not os.environ.get("FERNET_KEY"):
+        from cryptography.fernet import Fernet
+
+        os.environ["FERNET_KEY"] = Fernet.generate_key().decode()
+    from utils.helpers.pagination import encode_id
+
+    yield await encode_id(123456)
+
+
+@asynccontextmanager
+async def postgres():
+    """
+    Yield a session on a transaction seeded with SEED_ROWS users, rolled
+    back afterwards. SQL echo is turned off so logging does not dominate.
+    """
+    from sqlalchemy import insert
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    from src.models.user import User
+
+    engine = registry.get("postgres")
+    engine.sync_engine.echo = False
+    async with engine.connect() as connection:
+        transaction = await connection.begin()
+        try:
+            await connection.execute(
+                insert(User),
+                [{"name": f"bench-{i}"} for i in range(SEED_ROWS)],
+            )
+            async with AsyncSession(bind=connection) as session:
+                yield session
+        finally:
+            await transaction.rollback()
+
+
+@asynccontextmanager
+async def mongo():
+    """
+    Yield a throwaway collection seeded with SEED_ROWS documents and the
+    index backing the paginator's compound sort; dropped afterwards.
+    """
+    client = registry.get("mongo")
+    collection = client.db[f"bench_{uuid.uuid4().hex}"]
+    await asyncio.wait_for(client.db.command("ping"), timeout=3)
+    try:
+        await collection.insert_many([
+            {"name": f"bench-{i}", "score": i % 97} for i in range(SEED_ROWS)
+        ])
+        await collection.create_index([("score", -1), ("_id", -1)])
+        yield collection
+    finally:
+        await collection.drop()
+
+
+@asynccontextmanager
+async def redis():
+    """
+    Yield the configured synchronous Redis client after a ping.
+    """
+    client = registry.get("redis")
+    client.ping()
+    yield client
+
+
+@asynccontextmanager
+async def asgi_client():
+    """
+    Yield an httpx client calling the app in-process.
+    """
+    from httpx import AsyncClient
+    from httpx import ASGITransport
+
+    from src.main import app
+
+    transport = ASGITransport(app=app, client=("127.0.0.1", 1234))
+    async with AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        yield client
+    await registry.shutdown()
+
+
+@asynccontextmanager
+async def asgi_client_db():
+    """
+    Yield an in-process httpx client after checking the database is up.
+    """
+    from sqlalchemy import text
+
+    engine = registry.get("postgres")
+    engine.sync_engine.echo = False
+    async with engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+    async with asgi_client() as client:
+        yield client
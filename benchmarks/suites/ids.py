@@ -0,0 +1,19 @@
+"""
+Cursor id encoding
+"""
+
+from benchmarks.runner import bench
+from benchmarks.suites import fixtures
+
+from utils.helpers.pagination import decode_id
+from utils.helpers.pagination import encode_id
+
+
+@bench("ids.encode", setup=fixtures.fernet)
+async def encode(token):
+    await encode_id(123456)
+
+
+@bench("ids.decode", setup=fixtures.fernet)
+async def decode(token):
+    await decode_id(token)
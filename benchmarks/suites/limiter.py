@@ -0,0 +1,30 @@
+"""
+RequestLimiter overhead: the same handler with and without the decorator
+"""
+
+from types import SimpleNamespace
+
+from benchmarks.runner import bench
+from benchmarks.suites import fixtures
+
+from utils.limiters.throttle import limiter
+
+
+request = SimpleNamespace(client=SimpleNamespace(host="127.0.0.1"))
+
+
+async def handler(request):
+    return None
+
+
+limited = limiter.limiter(max_requests=10 ** 12, period=3600)(handler)
+
+
+@bench("limiter.baseline", setup=fixtures.redis)
+async def baseline(client):
+    await handler(request=request)
+
+
+@bench("limiter.limited", setup=fixtures.redis)
+async def limited_call(client):
+    await limited(request=request)
@@ -0,0 +1,45 @@
+"""
+Page costs of the SQL and Mongo paginators
+"""
+
+from sqlalchemy import select
+
+from benchmarks.runner import bench
+from benchmarks.suites import fixtures
+
+from src.models.user import User
+from utils.paginations.mongo import MongoPaginator
+from utils.paginations.postgres import DBPaginator
+
+
+@bench("pagination.db_first", setup=fixtures.postgres)
+async def db_first(session):
+    await DBPaginator(
+        session, select(User), User, fixtures.PAGE_SIZE
+    ).get_first()
+
+
+@bench("pagination.db_next", setup=fixtures.postgres)
+async def db_next(session):
+    paginator = DBPaginator(session, select(User), User, fixtures.PAGE_SIZE)
+    _, _, cursor = await paginator.get_first()
+    await DBPaginator(
+        session, select(User), User, fixtures.PAGE_SIZE, cursor
+    ).get_next()
+
+
+@bench("pagination.mongo_first", setup=fixtures.mongo)
+async def mongo_first(collection):
+    await MongoPaginator(collection, {}, fixtures.PAGE_SIZE).get_page()
+
+
+@bench("pagination.mongo_next_compound", setup=fixtures.mongo)
+async def mongo_next_compound(collection):
+    paginator = MongoPaginator(
+        collection, {}, fixtures.PAGE_SIZE, sort=[("score", -1)]
+    )
+    await paginator.get_page()
+    await MongoPaginator(
+        collection, {}, fixtures.PAGE_SIZE,
+        cursor=paginator.next_cursor, sort=[("score", -1)],
+    ).get_page()
@@ -0,0 +1,26 @@
+"""
+Response building and serialization
+"""
+
+from benchmarks.runner import bench
+from benchmarks.suites import fixtures
+
+from src.response.user import UserResponse
+
+
+response = UserResponse()
+
+
+@bench("responses.success", setup=fixtures.users)
+def success(users):
+    response.success(record=users[0])
+
+
+@bench("responses.get_all", setup=fixtures.users)
+def get_all(users):
+    response.get_all(users)
+
+
+@bench("responses.get_all_json", setup=fixtures.users)
+def get_all_json(users):
+    response.get_all(users).model_dump_json()
@@ -0,0 +1,21 @@
+"""
+Full request round trips through the in-process ASGI app
+"""
+
+from benchmarks.runner import bench
+from benchmarks.suites import fixtures
+
+
+@bench("roundtrip.openapi", setup=fixtures.asgi_client)
+async def openapi(client):
+    await client.get("/openapi.json")
+
+
+@bench("roundtrip.user_missing", setup=fixtures.asgi_client_db)
+async def user_missing(client):
+    await client.get("/users/0")
+
+
+@bench("roundtrip.users_list", setup=fixtures.asgi_client_db)
+async def users_list(client):
+    await client.get("/users/")
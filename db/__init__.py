@@ -2,6 +2,4 @@
 Initialize db
 """
 
-from .aws import * # noqa
-from .redis import * # noqa
-from .storage import * # noqa
+from .registry import * # noqa
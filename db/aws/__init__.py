@@ -3,3 +3,4 @@ Initialize AWS
 """
 
 from .bucket import * # noqa
+from .storage import * # noqa
@@ -2,17 +2,41 @@
 AWS connection
 """
 
-import boto3
+from typing import Any
 
+from db.registry import registry
 from libs.environs import env
 
-AWS_IS_ENABLED = env.bool("AWS_IS_ENABLE", default=False)
+AWS_IS_ENABLED = registry.is_enabled("s3")
 
 
-if AWS_IS_ENABLED:
-    aws_client = boto3.client(
+def create_client() -> Any:
+    """
+    Create the S3 client. boto3 is imported here so that processes
+    which never touch S3 do not pay for loading it.
+
+    :return: boto3 S3 client.
+    """
+    import boto3
+
+    from botocore.config import Config
+
+    return boto3.client(
         "s3",
         region_name=env.str("AWS_REGION_NAME"),
         aws_access_key_id=env.str("AWS_ACCESS_KEY_ID"),
-        aws_secret_access_key=env.str("AWS_SECRET_ACCESS_KEY")
+        aws_secret_access_key=env.str("AWS_SECRET_ACCESS_KEY"),
+        endpoint_url=env.str("AWS_ENDPOINT_URL", default="") or None,
+        config=Config(
+            max_pool_connections=env.int("AWS_MAX_CONCURRENCY", default=8)
+        ),
     )
+
+
+def __getattr__(name: str) -> Any:
+    """
+    Resolve `aws_client` lazily through the backend registry.
+    """
+    if name == "aws_client":
+        return registry.get("s3")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,327 @@
+"""
+Async S3 object storage
+"""
+
+import time
+import asyncio
+
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Tuple
+from typing import Optional
+from typing import AsyncIterator
+
+from db.registry import registry
+from libs.environs import env
+
+
+AWS_BUCKET_NAME = env.str("AWS_BUCKET_NAME", default="")
+AWS_MAX_CONCURRENCY = env.int("AWS_MAX_CONCURRENCY", default=8)
+AWS_PART_SIZE = env.int("AWS_PART_SIZE", default=8 * 1024 * 1024)
+AWS_PRESIGNED_URL_TTL = env.int("AWS_PRESIGNED_URL_TTL", default=3600)
+
+MIN_PART_SIZE = 5 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+PRESIGNED_URL_CACHE_SIZE = 10000
+
+
+class TransferMetrics:
+    """
+    Running totals of S3 transfers for throughput reporting.
+    """
+
+    def __init__(self):
+        """
+        Initialize all counters to zero.
+        """
+        self.uploads = 0
+        self.downloads = 0
+        self.parts_uploaded = 0
+        self.bytes_uploaded = 0
+        self.bytes_downloaded = 0
+        self.upload_seconds = 0.0
+        self.download_seconds = 0.0
+        self.presign_cache_hits = 0
+        self.presign_cache_misses = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Return the counters along with average throughput in bytes/second.
+
+        :return: Dictionary of metric values.
+        """
+        return {
+            **self.__dict__,
+            "upload_throughput": (
+                self.bytes_uploaded / self.upload_seconds
+                if self.upload_seconds else 0.0
+            ),
+            "download_throughput": (
+                self.bytes_downloaded / self.download_seconds
+                if self.download_seconds else 0.0
+            ),
+        }
+
+
+class ObjectStorage:
+    """
+    Async facade over the boto3 S3 client.
+
+    boto3 is synchronous, so every call runs in a worker thread and never
+    blocks the event loop. A semaphore bounds the number of concurrent S3
+    calls per process, which also bounds the memory held by in-flight
+    upload parts. Point AWS_ENDPOINT_URL at moto server or MinIO to run
+    against a local stand-in.
+    """
+
+    def __init__(
+        self,
+        bucket: str = AWS_BUCKET_NAME,
+        client: Any = None,
+        part_size: int = AWS_PART_SIZE,
+        max_concurrency: int = AWS_MAX_CONCURRENCY,
+        url_ttl: int = AWS_PRESIGNED_URL_TTL,
+    ):
+        """
+        Initialize the storage service.
+
+        :param bucket: Bucket holding the objects.
+        :param client: boto3 S3 client; defaults to the registry's client.
+        :param part_size: Multipart part size in bytes (at least 5 MiB).
+        :param max_concurrency: Maximum concurrent S3 calls.
+        :param url_ttl: Lifetime of presigned URLs in seconds.
+        """
+        self.bucket = bucket
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.max_concurrency = max_concurrency
+        self.url_ttl = url_ttl
+        self.metrics = TransferMetrics()
+        self._client = client
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._urls: Dict[Tuple[str, str], Tuple[str, float]] = {}
+
+    @property
+    def client(self) -> Any:
+        """
+        The boto3 S3 client given to the constructor, or else the registry's,
+        looked up on every access so that after `registry.after_fork()` a
+        worker never reuses its parent's client.
+        """
+        if self._client is not None:
+            return self._client
+        return registry.get("s3")
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        """
+        Semaphore bounding concurrent S3 calls, created on first use.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _call(self, method: str, **kwargs: Any) -> Any:
+        """
+        Run a client method in a worker thread under the concurrency limit.
+
+        :param method: Name of the boto3 client method.
+        :param kwargs: Arguments for the method.
+        :return: The method's result.
+        """
+        async with self.semaphore:
+            return await asyncio.to_thread(
+                getattr(self.client, method), **kwargs
+            )
+
+    async def upload_stream(
+        self,
+        key: str,
+        chunks: AsyncIterator[bytes],
+        content_type: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Stream an async byte iterator into S3.
+
+        Bodies that fit in a single part are sent with one `put_object`.
+        Larger bodies become a multipart upload whose parts are uploaded in
+        parallel while the next part is still being received; the upload
+        is aborted if anything fails.
+
+        :param key: Object key.
+        :param chunks: Async iterator of body chunks, e.g. `request.stream()`.
+        :param content_type: Optional Content-Type of the object.
+        :return: Key, size and ETag of the stored object.
+        """
+        started = time.perf_counter()
+        extra = {"ContentType": content_type} if content_type else {}
+        buffer = bytearray()
+        size = 0
+        upload_id: Optional[str] = None
+        tasks: List[asyncio.Task] = []
+
+        async def upload_part(number: int, body: bytes) -> Dict[str, Any]:
+            result = await self._call(
+                "upload_part",
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload_id,
+                PartNumber=number,
+                Body=body,
+            )
+            self.metrics.parts_uploaded += 1
+            return {"PartNumber": number, "ETag": result["ETag"]}
+
+        try:
+            async for chunk in chunks:
+                buffer.extend(chunk)
+                size += len(chunk)
+                while len(buffer) >= self.part_size:
+                    if upload_id is None:
+                        upload = await self._call(
+                            "create_multipart_upload",
+                            Bucket=self.bucket,
+                            Key=key,
+                            **extra,
+                        )
+                        upload_id = upload["UploadId"]
+                    pending = [t for t in tasks if not t.done()]
+                    if len(pending) >= self.max_concurrency:
+                        done, _ = await asyncio.wait(
+                            pending, return_when=asyncio.FIRST_COMPLETED
+                        )
+                        for task in done:
+                            task.result()
+                    body = bytes(buffer[:self.part_size])
+                    del buffer[:self.part_size]
+                    tasks.append(asyncio.create_task(
+                        upload_part(len(tasks) + 1, body)
+                    ))
+
+            if upload_id is None:
+                result = await self._call(
+                    "put_object",
+                    Bucket=self.bucket,
+                    Key=key,
+                    Body=bytes(buffer),
+                    **extra,
+                )
+            else:
+                if buffer:
+                    tasks.append(asyncio.create_task(
+                        upload_part(len(tasks) + 1, bytes(buffer))
+                    ))
+                parts = await asyncio.gather(*tasks)
+                result = await self._call(
+                    "complete_multipart_upload",
+                    Bucket=self.bucket,
+                    Key=key,
+                    UploadId=upload_id,
+                    MultipartUpload={"Parts": list(parts)},
+                )
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            if upload_id is not None:
+                await self._call(
+                    "abort_multipart_upload",
+                    Bucket=self.bucket,
+                    Key=key,
+                    UploadId=upload_id,
+                )
+            raise
+
+        self.metrics.uploads += 1
+        self.metrics.bytes_uploaded += size
+        self.metrics.upload_seconds += time.perf_counter() - started
+        return {"key": key, "size": size, "etag": result.get("ETag")}
+
+    async def download_stream(
+        self,
+        key: str,
+        byte_range: Optional[str] = None,
+        chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+    ) -> Tuple[AsyncIterator[bytes], Dict[str, Any]]:
+        """
+        Open an object for streaming, optionally for a byte range.
+
+        :param key: Object key.
+        :param byte_range: HTTP Range header value, e.g. 'bytes=0-1023'.
+        :param chunk_size: Size of each chunk read from S3.
+        :return: Pair of (async chunk iterator, object metadata) where the
+            metadata holds ContentLength, ContentType and ContentRange.
+        """
+        kwargs = {"Range": byte_range} if byte_range else {}
+        response = await self._call(
+            "get_object", Bucket=self.bucket, Key=key, **kwargs
+        )
+        body = response["Body"]
+        metadata = {
+            "ContentLength": response.get("ContentLength"),
+            "ContentType": response.get("ContentType"),
+            "ContentRange": response.get("ContentRange"),
+            "ETag": response.get("ETag"),
+        }
+
+        async def iterate() -> AsyncIterator[bytes]:
+            started = time.perf_counter()
+            try:
+                while True:
+                    async with self.semaphore:
+                        chunk = await asyncio.to_thread(body.read, chunk_size)
+                    if not chunk:
+                        break
+                    self.metrics.bytes_downloaded += len(chunk)
+                    yield chunk
+            finally:
+                body.close()
+                self.metrics.downloads += 1
+                self.metrics.download_seconds += time.perf_counter() - started
+
+        return iterate(), metadata
+
+    async def presigned_url(
+        self,
+        key: str,
+        method: str = "get_object",
+    ) -> str:
+        """
+        Return a presigned URL, reusing a cached one while it stays valid
+        for at least half of its lifetime.
+
+        :param key: Object key.
+        :param method: Client method the URL grants, e.g. 'put_object'.
+        :return: The presigned URL.
+        """
+        now = time.monotonic()
+        cached = self._urls.get((method, key))
+        if cached and cached[1] > now:
+            self.metrics.presign_cache_hits += 1
+            return cached[0]
+
+        self.metrics.presign_cache_misses += 1
+        url = await asyncio.to_thread(
+            self.client.generate_presigned_url,
+            ClientMethod=method,
+            Params={"Bucket": self.bucket, "Key": key},
+            ExpiresIn=self.url_ttl,
+        )
+        if len(self._urls) >= PRESIGNED_URL_CACHE_SIZE:
+            self._urls = {
+                k: v for k, v in self._urls.items() if v[1] > now
+            }
+        self._urls[(method, key)] = (url, now + self.url_ttl / 2)
+        return url
+
+    async def delete(self, key: str) -> None:
+        """
+        Delete an object and drop its cached presigned URLs.
+
+        :param key: Object key.
+        """
+        await self._call("delete_object", Bucket=self.bucket, Key=key)
+        for cache_key in [k for k in self._urls if k[1] == key]:
+            del self._urls[cache_key]
+
+
+storage = ObjectStorage()
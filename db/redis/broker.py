@@ -1,16 +1,50 @@
 """
 Redis connection
 """
+from typing import Any
+
 import redis
 
+from db.registry import registry
 from libs.environs import env
 
-REDIS_IS_ENABLE = env.bool("REDIS_IS_ENABLE", default=False)
+REDIS_IS_ENABLE = registry.is_enabled("redis")
+
+
+def create_client() -> redis.Redis:
+    """
+    Create the Redis client.
+
+    :return: Redis client.
+    """
+    return redis.Redis(
+        db=env.str('REDIS_DB'),
+        host=env.str('REDIS_HOST'),
+        port=env.int('REDIS_PORT'),
+        password=env.str('REDIS_PASSWORD')
+    )
+
+
+def create_async_client() -> Any:
+    """
+    Create the asyncio Redis client used by background subsystems.
 
-if REDIS_IS_ENABLE:
-    redis_client = redis.Redis(
+    :return: redis.asyncio.Redis client.
+    """
+    from redis import asyncio as aioredis
+
+    return aioredis.Redis(
         db=env.str('REDIS_DB'),
         host=env.str('REDIS_HOST'),
         port=env.int('REDIS_PORT'),
         password=env.str('REDIS_PASSWORD')
     )
+
+
+def __getattr__(name: str) -> Any:
+    """
+    Resolve `redis_client` lazily through the backend registry.
+    """
+    if name == "redis_client":
+        return registry.get("redis")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,257 @@
+"""
+Datastore backend registry
+"""
+
+import inspect
+import importlib
+
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Callable
+from typing import Optional
+
+from libs.environs import env
+
+
+__all__ = ["Backend", "BackendRegistry", "DB_TYPE", "registry"]
+
+
+class Backend:
+    """
+    Declaration of a datastore backend.
+
+    The backend's module is only imported, and its client only created,
+    the first time the backend is requested. Disabled backends are never
+    loaded at all.
+
+    Attributes:
+        name (str): Registry key of the backend.
+        factory (str): Import path of the client factory, 'module:function'.
+        enabled (bool): Whether the backend is turned on by configuration.
+        close_method (Optional[str]): Client method releasing its resources.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        factory: str,
+        enabled: bool,
+        close_method: Optional[str] = None,
+    ):
+        """
+        Declare a backend.
+
+        :param name: Registry key of the backend.
+        :param factory: Import path of the client factory, 'module:function'.
+        :param enabled: Whether the backend is turned on by configuration.
+        :param close_method: Client method to call on shutdown, sync or async.
+        """
+        self.name = name
+        self.factory = factory
+        self.enabled = enabled
+        self.close_method = close_method
+        self._client: Any = None
+        self._loaded = False
+        self._hooks: List[Callable[[Any], None]] = []
+
+    @property
+    def loaded(self) -> bool:
+        """
+        Whether the client has been created.
+        """
+        return self._loaded
+
+    def get(self) -> Any:
+        """
+        Return the backend client, creating it on first use.
+
+        :return: The backend client.
+        :raises RuntimeError: If the backend is disabled.
+        """
+        if not self.enabled:
+            raise RuntimeError(f"Backend '{self.name}' is disabled")
+        if not self._loaded:
+            module_name, function_name = self.factory.split(":")
+            module = importlib.import_module(module_name)
+            self._client = getattr(module, function_name)()
+            self._loaded = True
+            for hook in self._hooks:
+                hook(self._client)
+        return self._client
+
+    def on_load(self, hook: Callable[[Any], None]) -> None:
+        """
+        Call `hook` with the client whenever it is created, and right away
+        if it already exists. Used to attach instrumentation.
+
+        :param hook: Callable receiving the client.
+        """
+        self._hooks.append(hook)
+        if self._loaded:
+            hook(self._client)
+
+    async def close(self) -> None:
+        """
+        Release the client's resources if it was ever created.
+        """
+        if not self._loaded:
+            return
+        if self.close_method:
+            result = getattr(self._client, self.close_method)()
+            if inspect.isawaitable(result):
+                await result
+        self._client = None
+        self._loaded = False
+
+    def after_fork(self) -> None:
+        """
+        Drop connections inherited from a parent process without closing
+        them, so a forked worker never shares sockets with its parent.
+
+        SQLAlchemy engines keep their configuration and only discard the
+        pool, as do clients with an `after_fork` method of their own;
+        other clients are forgotten and recreated on first use.
+        """
+        if not self._loaded:
+            return
+        sync_engine = getattr(self._client, "sync_engine", None)
+        if sync_engine is not None:
+            sync_engine.dispose(close=False)
+            return
+        if callable(getattr(self._client, "after_fork", None)):
+            self._client.after_fork()
+            return
+        self._client = None
+        self._loaded = False
+
+
+class BackendRegistry:
+    """
+    Registry of declared datastore backends.
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty registry.
+        """
+        self._backends: Dict[str, Backend] = {}
+
+    def register(self, backend: Backend) -> Backend:
+        """
+        Declare a backend.
+
+        :param backend: Backend declaration.
+        :return: The registered backend.
+        """
+        self._backends[backend.name] = backend
+        return backend
+
+    def backend(self, name: str) -> Backend:
+        """
+        Return a backend declaration by name.
+
+        :param name: Registry key of the backend.
+        :return: Backend declaration.
+        :raises KeyError: If no such backend is declared.
+        """
+        return self._backends[name]
+
+    def get(self, name: str) -> Any:
+        """
+        Return a backend client, creating it on first use.
+
+        :param name: Registry key of the backend.
+        :return: The backend client.
+        """
+        return self.backend(name).get()
+
+    def is_enabled(self, name: str) -> bool:
+        """
+        Check whether a backend is turned on by configuration.
+
+        :param name: Registry key of the backend.
+        :return: True if the backend is enabled.
+        """
+        backend = self._backends.get(name)
+        return backend is not None and backend.enabled
+
+    def enabled(self) -> List[Backend]:
+        """
+        Return every enabled backend declaration.
+
+        :return: List of enabled backends.
+        """
+        return [b for b in self._backends.values() if b.enabled]
+
+    async def startup(self) -> None:
+        """
+        Create clients for all enabled backends. Meant for the app lifespan.
+        """
+        for backend in self.enabled():
+            backend.get()
+
+    async def shutdown(self) -> None:
+        """
+        Close every client that was created.
+        """
+        for backend in self._backends.values():
+            await backend.close()
+
+    def after_fork(self) -> None:
+        """
+        Reset every backend in a freshly forked worker process.
+        """
+        for backend in self._backends.values():
+            backend.after_fork()
+
+
+DB_TYPE = env.str("DB_TYPE", default="postgres")
+
+registry = BackendRegistry()
+
+registry.register(Backend(
+    name="postgres",
+    factory="db.storage.postgres.connection:get_engine",
+    enabled=DB_TYPE == "postgres",
+    close_method="dispose",
+))
+registry.register(Backend(
+    name="mysql",
+    factory="db.storage.mysql.connection:create_engine",
+    enabled=DB_TYPE == "mysql",
+    close_method="dispose",
+))
+registry.register(Backend(
+    name="shards",
+    factory="db.storage.postgres.shards:create_shard_map",
+    enabled=(
+        DB_TYPE == "postgres"
+        and env.bool("SHARDING_ENABLED", default=False)
+    ),
+    close_method="dispose",
+))
+registry.register(Backend(
+    name="mongo",
+    factory="db.storage.mongo.connection:create_client",
+    enabled=env.bool("MONGO_IS_ENABLED", default=False),
+    close_method="close",
+))
+registry.register(Backend(
+    name="redis",
+    factory="db.redis.broker:create_client",
+    enabled=env.bool("REDIS_IS_ENABLE", default=False),
+    close_method="close",
+))
+registry.register(Backend(
+    name="redis_async",
+    factory="db.redis.broker:create_async_client",
+    enabled=env.bool("REDIS_IS_ENABLE", default=False),
+    close_method="aclose",
+))
+registry.register(Backend(
+    name="s3",
+    factory="db.aws.bucket:create_client",
+    enabled=env.bool("AWS_IS_ENABLE", default=False),
+    close_method="close",
+))
@@ -1,7 +1,6 @@
 """
 Initialize db
-"""
 
-from .mongo import * # noqa
-from .postgres import * # noqa
-from .mysql import * # noqa
+Backends are loaded lazily through `db.registry`; import the
+backend packages directly when their module-level names are needed.
+"""
@@ -2,13 +2,17 @@
 Mongo DB configurations
 """
 
+from typing import Any
+
 from motor.motor_asyncio import AsyncIOMotorClient
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
+from db.registry import registry
 from libs.environs import env
 
-MONGO_IS_ENABLED = env.bool("MONGO_IS_ENABLED", default=False)
+MONGO_IS_ENABLED = registry.is_enabled("mongo")
 MONGODB_URL = env.str('MONGODB_URL', default='mongodb://localhost:27017')
+MONGO_DB_NAME = env.str('MONGO_DB_NAME', default='') or 'default_db'
 
 
 class MongoDB:
@@ -19,9 +23,7 @@ class MongoDB:
     def __init__(self, uri: str, db_name: str = "default_db") -> None:
         self.client: AsyncIOMotorClient = AsyncIOMotorClient(uri)
         self.db: AsyncIOMotorDatabase = (
-            self.client.get_default_database()
-            if uri.startswith("mongodb://") and "/" in uri
-            else self.client[db_name]
+            self.client.get_default_database(db_name)
         )
 
     async def close(self) -> None:
@@ -31,8 +33,19 @@ class MongoDB:
         self.client.close()
 
 
-mongo_client: MongoDB | None
-if MONGO_IS_ENABLED:
-    mongo_client = MongoDB(MONGODB_URL)
-else:
-    mongo_client = None
+def create_client() -> MongoDB:
+    """
+    Create the MongoDB client.
+
+    :return: MongoDB client wrapper.
+    """
+    return MongoDB(MONGODB_URL, MONGO_DB_NAME)
+
+
+def __getattr__(name: str) -> Any:
+    """
+    Resolve `mongo_client` lazily through the backend registry.
+    """
+    if name == "mongo_client":
+        return registry.get("mongo") if MONGO_IS_ENABLED else None
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -2,13 +2,18 @@
 MySQL DB configurations
 """
 
+from typing import Any
+from functools import lru_cache
 from urllib.parse import quote
 
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncEngine
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 
+from db.registry import registry
+from db.storage.pool import TimedAsyncQueuePool
 from libs.environs import env
 
 
@@ -23,23 +28,51 @@ DB_PASSWORD = quote(env.str("DB_PASSWORD"))
 
 DB_URL = f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-engine = create_async_engine(
-    url=DB_URL,
-    echo=True,
-)
 
-async_session = sessionmaker(
-    bind=engine,
-    class_=AsyncSession,
-    autocommit=False,
-    autoflush=False,
-    expire_on_commit=False,
-)
+def create_engine() -> AsyncEngine:
+    """
+    Create the MySQL engine. Called by the registry on first use, so the
+    aiomysql driver is only loaded when MySQL is enabled and needed.
+
+    :return: Async SQLAlchemy engine.
+    """
+    return create_async_engine(
+        url=DB_URL,
+        echo=True,
+        poolclass=TimedAsyncQueuePool,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_session_factory() -> sessionmaker:
+    """
+    Return the session factory bound to the registry's MySQL engine.
+
+    :return: Async session factory.
+    """
+    return sessionmaker(
+        bind=registry.get("mysql"),
+        class_=AsyncSession,
+        autocommit=False,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+
+def __getattr__(name: str) -> Any:
+    """
+    Resolve `engine` and `async_session` lazily through the registry.
+    """
+    if name == "engine":
+        return registry.get("mysql")
+    if name == "async_session":
+        return get_session_factory()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 async def get_db() -> AsyncSession:
     """
     Dependency to get DB session.
     """
-    async with async_session() as session:
+    async with get_session_factory()() as session:
         yield session
@@ -3,14 +3,19 @@ Database connection
 """
 import re
 
+from typing import Any
+from functools import lru_cache
 from urllib.parse import quote
 
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm import declared_attr
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.ext.asyncio import AsyncEngine
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.asyncio import create_async_engine
 
+from db.registry import registry
+from db.storage.pool import TimedAsyncQueuePool
 from libs.environs import env
 
 DB_USER = env.str('DB_USER')
@@ -21,19 +26,6 @@ DB_PASSWORD = quote(env.str('DB_PASSWORD'))
 
 db_url = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"  # noqa
 
-engine = create_async_engine(
-    url=db_url,
-    echo=True
-)
-
-async_session = sessionmaker(
-    autocommit=False,
-    autoflush=False,
-    bind=engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-)
-
 
 class Base(DeclarativeBase):
     @declared_attr.directive
@@ -54,6 +46,59 @@ class Base(DeclarativeBase):
         return pluralized_name
 
 
+def get_engine(url: str = db_url) -> AsyncEngine:
+    """
+    Create the PostgreSQL engine. Called by the registry on first use, so
+    importing this module never builds an engine or loads asyncpg.
+
+    :param url: Database URL; defaults to the DB_* settings.
+    :return: Async SQLAlchemy engine.
+    """
+    return create_async_engine(
+        url=url,
+        echo=True,
+        poolclass=TimedAsyncQueuePool,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_session_factory() -> sessionmaker:
+    """
+    Return the session factory bound to the registry's PostgreSQL engine,
+    or routing to the shards of the shard map when sharding is enabled.
+
+    :return: Async session factory.
+    """
+    if registry.is_enabled("shards"):
+        return registry.get("shards").session_factory()
+    return sessionmaker(
+        autocommit=False,
+        autoflush=False,
+        bind=registry.get("postgres"),
+        class_=AsyncSession,
+        expire_on_commit=False,
+    )
+
+
+def async_session(**kwargs: Any) -> AsyncSession:
+    """
+    Open a session on the registry's PostgreSQL engine.
+
+    :param kwargs: Session options passed to the session factory.
+    :return: Async session, to be used as an async context manager.
+    """
+    return get_session_factory()(**kwargs)
+
+
+def __getattr__(name: str) -> Any:
+    """
+    Resolve `engine` lazily through the registry.
+    """
+    if name == "engine":
+        return registry.get("postgres")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 async def get_db() -> AsyncSession:
     async with async_session() as session:
         yield session
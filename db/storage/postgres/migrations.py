@@ -0,0 +1,326 @@
+"""
+Online migration helpers for large tables
+
+Use them from Alembic migrations instead of `op.create_index` and
+`op.create_foreign_key`/`op.create_check_constraint`, which take locks
+blocking reads or writes for as long as the table takes to scan.
+"""
+
+import time
+import logging
+
+from typing import Any
+from typing import List
+from typing import Optional
+
+from sqlalchemy import text
+
+from libs.environs import env
+
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_LOCK_TIMEOUT_MS = env.int(
+    "MIGRATION_LOCK_TIMEOUT_MS", default=5000
+)
+MIGRATION_BATCH_SIZE = env.int("MIGRATION_BATCH_SIZE", default=5000)
+MIGRATION_BATCH_PAUSE = env.float("MIGRATION_BATCH_PAUSE", default=0.1)
+MIGRATION_PROGRESS_INTERVAL = env.float(
+    "MIGRATION_PROGRESS_INTERVAL", default=10.0
+)
+
+# PostgreSQL identifiers are truncated at 63 bytes.
+MAX_IDENTIFIER_LENGTH = 63
+
+
+def set_lock_timeout(
+    op: Any, lock_timeout_ms: int = MIGRATION_LOCK_TIMEOUT_MS
+) -> None:
+    """
+    Make the rest of the migration transaction give up waiting for a lock
+    after `lock_timeout_ms`.
+
+    A DDL statement waiting for its ACCESS EXCLUSIVE lock queues every
+    later query of the table behind it; failing fast and rerunning the
+    migration is cheaper than stalling traffic.
+
+    :param op: alembic.op.
+    :param lock_timeout_ms: Lock timeout; 0 waits forever.
+    """
+    op.execute(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}")
+
+
+def _index_state(bind: Any, name: str) -> Optional[bool]:
+    """
+    Return whether an index is valid, or None if it does not exist.
+    """
+    return bind.execute(
+        text(
+            "SELECT indisvalid FROM pg_index "
+            "WHERE indexrelid = to_regclass(:name)"
+        ),
+        {"name": name},
+    ).scalar()
+
+
+def _partitions(bind: Any, table: str) -> Optional[List[str]]:
+    """
+    Return the partitions of a partitioned table, or None if the table
+    is not partitioned.
+    """
+    kind = bind.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)"),
+        {"table": table},
+    ).scalar()
+    if kind != "p":
+        return None
+    return list(bind.execute(
+        text(
+            "SELECT inhrelid::regclass::text FROM pg_inherits "
+            "WHERE inhparent = to_regclass(:table)"
+        ),
+        {"table": table},
+    ).scalars())
+
+
+def create_index_concurrently(
+    op: Any,
+    name: str,
+    table: str,
+    columns: str,
+    unique: bool = False,
+    using: Optional[str] = None,
+    where: Optional[str] = None,
+) -> None:
+    """
+    Build an index without blocking writes to the table.
+
+    Runs `CREATE INDEX CONCURRENTLY` outside the migration transaction.
+    An invalid index left by an interrupted build is dropped and built
+    again. PostgreSQL cannot build an index CONCURRENTLY on a partitioned
+    table, so there the index is created on the parent only and each
+    partition's index is built concurrently and attached; the parent
+    index becomes valid once every partition has one.
+
+    Usage:
+        create_index_concurrently(
+            op, "ix_users_email", "users", "lower(email)", unique=True
+        )
+
+    :param op: alembic.op.
+    :param name: Index name.
+    :param table: Table name.
+    :param columns: Indexed columns or expressions, as SQL.
+    :param unique: Build a unique index.
+    :param using: Index method, e.g. 'gin'.
+    :param where: Predicate of a partial index, as SQL.
+    """
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    method = f" USING {using}" if using else ""
+    predicate = f" WHERE {where}" if where else ""
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        partitions = _partitions(bind, table)
+        if partitions is None:
+            _build_concurrently(
+                bind, name,
+                f"CREATE {kind} CONCURRENTLY {name} "
+                f"ON {table}{method} ({columns}){predicate}",
+            )
+            return
+        bind.execute(text(
+            f"CREATE {kind} IF NOT EXISTS {name} "
+            f"ON ONLY {table}{method} ({columns}){predicate}"
+        ))
+        for partition in partitions:
+            child = f"{name}_{partition}"[:MAX_IDENTIFIER_LENGTH]
+            _build_concurrently(
+                bind, child,
+                f"CREATE {kind} CONCURRENTLY {child} "
+                f"ON {partition}{method} ({columns}){predicate}",
+            )
+            attached = bind.execute(
+                text(
+                    "SELECT 1 FROM pg_inherits "
+                    "WHERE inhrelid = to_regclass(:child)"
+                ),
+                {"child": child},
+            ).scalar()
+            if not attached:
+                bind.execute(
+                    text(f"ALTER INDEX {name} ATTACH PARTITION {child}")
+                )
+
+
+def _build_concurrently(bind: Any, name: str, statement: str) -> None:
+    """
+    Run a CREATE INDEX CONCURRENTLY unless a valid index of that name
+    exists, dropping an invalid leftover first.
+    """
+    state = _index_state(bind, name)
+    if state:
+        logger.info("Index %s already exists", name)
+        return
+    if state is False:
+        logger.warning("Dropping invalid index %s of a failed build", name)
+        bind.execute(text(f"DROP INDEX CONCURRENTLY {name}"))
+    started = time.monotonic()
+    bind.execute(text(statement))
+    logger.info("Built index %s in %.1fs", name, time.monotonic() - started)
+
+
+def drop_index_concurrently(op: Any, name: str) -> None:
+    """
+    Drop an index without blocking reads or writes of its table.
+
+    :param op: alembic.op.
+    :param name: Index name.
+    """
+    with op.get_context().autocommit_block():
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def add_constraint(
+    op: Any,
+    table: str,
+    name: str,
+    definition: str,
+    validate: bool = True,
+) -> None:
+    """
+    Add a CHECK or FOREIGN KEY constraint without scanning the table under
+    an exclusive lock.
+
+    The constraint is added `NOT VALID`, which only takes a brief lock
+    and checks new rows, then validated in its own transaction under a
+    SHARE UPDATE EXCLUSIVE lock that lets reads and writes go on. Before
+    PostgreSQL 18, partitioned tables reject NOT VALID constraints.
+
+    Usage:
+        add_constraint(
+            op, "users", "ck_users_name_length",
+            "CHECK (char_length(name) <= 200)",
+        )
+
+    :param op: alembic.op.
+    :param table: Table name.
+    :param name: Constraint name.
+    :param definition: Constraint definition, as SQL.
+    :param validate: Validate existing rows now; pass False to validate
+        later with `validate_constraint`, e.g. after a backfill.
+    """
+    set_lock_timeout(op)
+    op.execute(
+        f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition} NOT VALID"
+    )
+    if validate:
+        validate_constraint(op, table, name)
+
+
+def validate_constraint(op: Any, table: str, name: str) -> None:
+    """
+    Validate a NOT VALID constraint in its own transaction.
+
+    :param op: alembic.op.
+    :param table: Table name.
+    :param name: Constraint name.
+    """
+    with op.get_context().autocommit_block():
+        started = time.monotonic()
+        op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}")
+        logger.info(
+            "Validated %s on %s in %.1fs",
+            name, table, time.monotonic() - started,
+        )
+
+
+def set_not_null(op: Any, table: str, column: str) -> None:
+    """
+    Make a column NOT NULL without scanning the table under an exclusive
+    lock.
+
+    A validated `CHECK (column IS NOT NULL)` lets `SET NOT NULL` skip its
+    scan; the check is dropped afterwards.
+
+    :param op: alembic.op.
+    :param table: Table name.
+    :param column: Column name.
+    """
+    check = f"{table}_{column}_not_null"[:MAX_IDENTIFIER_LENGTH]
+    add_constraint(op, table, check, f"CHECK ({column} IS NOT NULL)")
+    set_lock_timeout(op)
+    op.execute(f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL")
+    op.execute(f"ALTER TABLE {table} DROP CONSTRAINT {check}")
+
+
+def backfill(
+    op: Any,
+    table: str,
+    assignments: str,
+    where: Optional[str] = None,
+    key: str = "id",
+    batch_size: int = MIGRATION_BATCH_SIZE,
+    pause: float = MIGRATION_BATCH_PAUSE,
+) -> int:
+    """
+    Update every row of a large table in small committed batches.
+
+    Rows are walked by ranges of an integer `key`, `batch_size` key
+    values per UPDATE, each committed on its own so row locks are short
+    and vacuum can keep up. The helper sleeps `pause` seconds between
+    batches, plus as long again as the batch took when `pause` is not 0,
+    so the backfill yields to traffic under load. Progress is logged
+    every MIGRATION_PROGRESS_INTERVAL seconds. Pass a `where` excluding
+    rows already done, e.g. 'email_lower IS NULL', so an interrupted
+    backfill can simply be run again.
+
+    Usage:
+        backfill(op, "users", "email_lower = lower(email)",
+                 where="email_lower IS NULL")
+
+    :param op: alembic.op.
+    :param table: Table name.
+    :param assignments: SET clause, as SQL.
+    :param where: Extra predicate of the rows to update, as SQL.
+    :param key: Integer column to walk, usually the primary key.
+    :param batch_size: Key values covered by one UPDATE.
+    :param pause: Seconds to sleep between batches.
+    :return: Number of rows updated.
+    """
+    predicate = f" AND ({where})" if where else ""
+    statement = text(
+        f"UPDATE {table} SET {assignments} "
+        f"WHERE {key} >= :low AND {key} < :high{predicate}"
+    )
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        first, last = bind.execute(
+            text(f"SELECT min({key}), max({key}) FROM {table}")
+        ).one()
+        if first is None:
+            return 0
+        span = last - first + 1
+        updated = 0
+        started = reported = time.monotonic()
+        low = first
+        while low <= last:
+            high = low + batch_size
+            batch_started = time.monotonic()
+            updated += bind.execute(
+                statement, {"low": low, "high": high}
+            ).rowcount
+            low = high
+            now = time.monotonic()
+            if now - reported >= MIGRATION_PROGRESS_INTERVAL or low > last:
+                reported = now
+                done = min(low - first, span) / span
+                elapsed = now - started
+                logger.info(
+                    "Backfill of %s: %.1f%% (%s < %s), %d rows, "
+                    "%.0fs elapsed, %.0fs left",
+                    table, done * 100, key, low, updated, elapsed,
+                    elapsed / done - elapsed,
+                )
+            if pause and low <= last:
+                time.sleep(pause + (now - batch_started))
+    return updated
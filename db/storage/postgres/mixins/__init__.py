@@ -1,3 +1,4 @@
 from .pk import * # noqa
 from .softdeletion import * # noqa
 from .timestamp import * # noqa
+from .partition import * # noqa
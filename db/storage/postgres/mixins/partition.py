@@ -0,0 +1,41 @@
+"""
+Time partitioning mixin for database models
+"""
+
+from sqlalchemy import PrimaryKeyConstraint
+from sqlalchemy.orm import Mapped
+from sqlalchemy.orm import mapped_column
+from sqlalchemy.orm import declared_attr
+from sqlalchemy.orm import declarative_mixin
+
+from db.storage.postgres.partitions import TimePartition
+
+
+@declarative_mixin
+class TimePartitionMixin:
+    """
+    Range-partitions a model's table by a timestamp column, declared as
+    `__partition__ = TimePartition(...)`, on PostgreSQL. Use it instead
+    of IntIdPkMixin.
+
+    PostgreSQL requires the partition key in the primary key, so the
+    table's key is (id, <column>), with `id` still generated by a
+    sequence; the ORM identifies rows by `id` alone. Queries bounded on
+    the column only scan the partitions in range.
+    """
+
+    __partition__ = TimePartition()
+
+    id: Mapped[int] = mapped_column(autoincrement=True)
+
+    @declared_attr.directive
+    def __table_args__(cls):
+        column = cls.__partition__.column
+        return (
+            PrimaryKeyConstraint("id", column),
+            {"postgresql_partition_by": f"RANGE ({column})"},
+        )
+
+    @declared_attr.directive
+    def __mapper_args__(cls):
+        return {"primary_key": [cls.__table__.c.id]}
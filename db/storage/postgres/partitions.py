@@ -0,0 +1,342 @@
+"""
+Time-based range partitioning
+"""
+
+import logging
+
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+
+from typing import Any
+from typing import List
+from typing import Tuple
+from typing import Optional
+
+from sqlalchemy import text
+
+from libs.environs import env
+
+
+logger = logging.getLogger(__name__)
+
+PARTITION_LOCK_TIMEOUT_MS = env.int(
+    "PARTITION_LOCK_TIMEOUT_MS", default=2000
+)
+
+INTERVALS = ("day", "week", "month", "year")
+EXPIRE_ACTIONS = ("detach", "drop")
+
+PARTITIONS_QUERY = """
+SELECT child.relname,
+       (regexp_match(
+           pg_get_expr(child.relpartbound, child.oid), 'TO \\(''(.*)''\\)'
+       ))[1]::timestamptz AS upper_bound
+FROM pg_inherits
+JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+WHERE pg_inherits.inhparent = CAST(:parent AS regclass)
+"""
+
+
+class TimePartition:
+    """
+    Declares a table range-partitioned by a timestamp column.
+
+    Each partition covers one `interval` and is named
+    '<table>_p<period>', e.g. 'users_p2026_10' for a monthly partition.
+    Partitions whose range ended more than `retention` intervals ago
+    are detached, or dropped, by `PartitionManager`.
+
+    Attributes:
+        column (str): Partition key, a timezone-aware timestamp column.
+        interval (str): Partition size: 'day', 'week', 'month' or 'year'.
+        premake (int): Future partitions kept ready.
+        retention (Optional[int]): Intervals kept; None keeps them all.
+        expire (str): What happens to expired partitions: 'detach' or
+            'drop'.
+    """
+
+    def __init__(
+        self,
+        column: str = "created_at",
+        interval: str = "month",
+        premake: int = 3,
+        retention: Optional[int] = None,
+        expire: str = "detach",
+    ):
+        """
+        Declare the partitioning of a table.
+
+        :param column: Partition key column.
+        :param interval: Partition size.
+        :param premake: Future partitions kept ready.
+        :param retention: Intervals kept; None or 0 keeps every partition.
+        :param expire: 'detach' or 'drop' expired partitions.
+        :raises ValueError: If the interval or expire action is unknown.
+        """
+        if interval not in INTERVALS:
+            raise ValueError(f"Unknown partition interval '{interval}'")
+        if expire not in EXPIRE_ACTIONS:
+            raise ValueError(f"Unknown partition expire action '{expire}'")
+        self.column = column
+        self.interval = interval
+        self.premake = premake
+        self.retention = retention or None
+        self.expire = expire
+
+    def period_start(self, moment: datetime) -> datetime:
+        """
+        Return the start of the interval containing `moment`, in UTC.
+        """
+        moment = moment.astimezone(timezone.utc)
+        day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        if self.interval == "day":
+            return day
+        if self.interval == "week":
+            return day - timedelta(days=day.weekday())
+        if self.interval == "month":
+            return day.replace(day=1)
+        return day.replace(month=1, day=1)
+
+    def shift(self, start: datetime, periods: int) -> datetime:
+        """
+        Return the start of the interval `periods` after `start`.
+        """
+        if self.interval == "day":
+            return start + timedelta(days=periods)
+        if self.interval == "week":
+            return start + timedelta(weeks=periods)
+        if self.interval == "month":
+            month = start.month - 1 + periods
+            return start.replace(
+                year=start.year + month // 12, month=month % 12 + 1
+            )
+        return start.replace(year=start.year + periods)
+
+    def partition_name(self, table: str, start: datetime) -> str:
+        """
+        Return the name of the partition starting at `start`.
+        """
+        formats = {
+            "day": "%Y_%m_%d",
+            "week": "%Y_%m_%d",
+            "month": "%Y_%m",
+            "year": "%Y",
+        }
+        return f"{table}_p{start.strftime(formats[self.interval])}"
+
+    def partitions(
+        self, table: str, since: datetime, until: datetime
+    ) -> List[Tuple[str, datetime, datetime]]:
+        """
+        Return the partitions covering [since, until).
+
+        :param table: Parent table name.
+        :param since: Start of the covered range.
+        :param until: End of the covered range.
+        :return: (name, start, end) of each partition.
+        """
+        result = []
+        start = self.period_start(since)
+        while start < until:
+            end = self.shift(start, 1)
+            result.append((self.partition_name(table, start), start, end))
+            start = end
+        return result
+
+
+def create_partition_sql(
+    table: str, name: str, start: datetime, end: datetime
+) -> str:
+    """
+    Return the DDL creating one partition of a range-partitioned table.
+
+    :param table: Parent table name.
+    :param name: Partition name.
+    :param start: Inclusive lower bound.
+    :param end: Exclusive upper bound.
+    """
+    return (
+        f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" '
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+
+
+def create_partitions(
+    op: Any,
+    table: str,
+    spec: TimePartition,
+    since: datetime,
+    until: datetime,
+) -> None:
+    """
+    Create the partitions of a table covering [since, until) from an
+    Alembic migration.
+
+    Usage:
+        create_partitions(op, "users", TimePartition(), now, later)
+
+    :param op: alembic.op.
+    :param table: Parent table name, created with
+        `postgresql_partition_by='RANGE (<column>)'`.
+    :param spec: Partitioning of the table.
+    :param since: Start of the covered range.
+    :param until: End of the covered range.
+    """
+    for name, start, end in spec.partitions(table, since, until):
+        op.execute(create_partition_sql(table, name, start, end))
+
+
+class PartitionManager:
+    """
+    Keeps the partitions of every partitioned model up to date.
+
+    `maintain` creates the partitions of the current interval and the
+    next `premake` ones, and detaches, then drops if configured, the
+    partitions whose range ended more than `retention` intervals ago.
+    DDL runs with a short lock timeout so it never queues traffic behind
+    it; an operation that cannot get its lock is retried on the next run.
+    Expired partitions are detached CONCURRENTLY (PostgreSQL 14 or newer)
+    so reads and writes of the parent are not blocked.
+    """
+
+    def __init__(self, lock_timeout_ms: int = PARTITION_LOCK_TIMEOUT_MS):
+        """
+        Initialize the manager.
+
+        :param lock_timeout_ms: Lock timeout of each DDL statement.
+        """
+        self.lock_timeout_ms = lock_timeout_ms
+
+    @staticmethod
+    def models() -> List[Any]:
+        """
+        Return the mapped models declaring a `__partition__`.
+        """
+        from db.storage.postgres.connection import Base
+
+        return [
+            mapper.class_ for mapper in Base.registry.mappers
+            if getattr(mapper.class_, "__partition__", None) is not None
+        ]
+
+    async def maintain(
+        self, engine: Any, now: Optional[datetime] = None
+    ) -> None:
+        """
+        Create upcoming partitions and expire old ones for every model.
+
+        :param engine: Async SQLAlchemy engine.
+        :param now: Current time; defaults to now.
+        """
+        now = now or datetime.now(timezone.utc)
+        for model in self.models():
+            table = model.__tablename__
+            spec = model.__partition__
+            try:
+                await self.create_upcoming(engine, table, spec, now)
+                await self.expire(engine, table, spec, now)
+            except Exception as e:
+                logger.warning(
+                    "Partition maintenance of %s failed: %s", table, e
+                )
+
+    async def create_upcoming(
+        self, engine: Any, table: str, spec: TimePartition, now: datetime
+    ) -> List[str]:
+        """
+        Create the partitions of the current and next `premake` intervals.
+
+        Ranges already covered by attached partitions are skipped, going
+        by their bounds rather than their names, e.g. the legacy partition
+        the migration attached up to a future cutoff: intervals ending by
+        the greatest upper bound are skipped and the one containing it
+        starts there.
+
+        :return: Names of the partitions created.
+        """
+        until = spec.shift(spec.period_start(now), spec.premake + 1)
+        created = []
+        async with engine.connect() as connection:
+            attached = await self._partitions(connection, table)
+            await connection.commit()
+            existing = {name for name, _ in attached}
+            covered = max(
+                (upper for _, upper in attached if upper is not None),
+                default=None,
+            )
+            for name, start, end in spec.partitions(table, now, until):
+                if name in existing:
+                    continue
+                if covered is not None:
+                    if end <= covered:
+                        continue
+                    start = max(start, covered)
+                async with connection.begin():
+                    await connection.exec_driver_sql(
+                        "SET LOCAL lock_timeout = "
+                        f"{int(self.lock_timeout_ms)}"
+                    )
+                    await connection.exec_driver_sql(
+                        create_partition_sql(table, name, start, end)
+                    )
+                created.append(name)
+                logger.info("Created partition %s", name)
+        return created
+
+    async def expire(
+        self, engine: Any, table: str, spec: TimePartition, now: datetime
+    ) -> List[str]:
+        """
+        Detach, and drop if configured, partitions past the retention.
+
+        :return: Names of the partitions expired.
+        """
+        if spec.retention is None:
+            return []
+        cutoff = spec.shift(spec.period_start(now), -spec.retention)
+        expired = []
+        async with engine.connect() as connection:
+            partitions = await self._partitions(connection, table)
+            await connection.commit()
+            autocommit = await connection.execution_options(
+                isolation_level="AUTOCOMMIT"
+            )
+            await autocommit.exec_driver_sql(
+                f"SET lock_timeout = {int(self.lock_timeout_ms)}"
+            )
+            try:
+                for name, upper_bound in partitions:
+                    if upper_bound is None or upper_bound > cutoff:
+                        continue
+                    await autocommit.exec_driver_sql(
+                        f'ALTER TABLE "{table}" '
+                        f'DETACH PARTITION "{name}" CONCURRENTLY'
+                    )
+                    if spec.expire == "drop":
+                        await autocommit.exec_driver_sql(
+                            f'DROP TABLE "{name}"'
+                        )
+                    expired.append(name)
+                    logger.info(
+                        "Expired partition %s (%s)", name, spec.expire
+                    )
+            finally:
+                await autocommit.exec_driver_sql("RESET lock_timeout")
+        return expired
+
+    @staticmethod
+    async def _partitions(
+        connection: Any, table: str
+    ) -> List[Tuple[str, Optional[datetime]]]:
+        """
+        Return the attached partitions of a table and their upper bound,
+        None for MAXVALUE or a default partition.
+        """
+        result = await connection.execute(
+            text(PARTITIONS_QUERY), {"parent": table}
+        )
+        return [(name, upper_bound) for name, upper_bound in result.all()]
+
+
+partitions = PartitionManager()
@@ -0,0 +1,73 @@
+"""
+Alembic revision state
+"""
+
+import os
+
+from functools import lru_cache
+
+from typing import Any
+from typing import FrozenSet
+
+from libs.environs import env
+
+
+# Repository root, three directories above db/storage/postgres.
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), *[".."] * 3))
+ALEMBIC_CONFIG = env.str(
+    "ALEMBIC_CONFIG", default=os.path.join(ROOT, "alembic.ini")
+)
+
+
+def alembic_config() -> Any:
+    """
+    Load the Alembic configuration, with the script location made
+    absolute so it does not depend on the working directory.
+    """
+    from alembic.config import Config
+
+    config = Config(ALEMBIC_CONFIG)
+    location = config.get_main_option("script_location")
+    if location and not os.path.isabs(location):
+        config.set_main_option(
+            "script_location",
+            os.path.join(os.path.dirname(ALEMBIC_CONFIG), location),
+        )
+    return config
+
+
+@lru_cache(maxsize=1)
+def script_heads() -> FrozenSet[str]:
+    """
+    Return the head revisions of the migration scripts, read once.
+    """
+    from alembic.script import ScriptDirectory
+
+    return frozenset(ScriptDirectory.from_config(alembic_config()).get_heads())
+
+
+async def applied_revisions(connection: Any) -> FrozenSet[str]:
+    """
+    Return the revisions recorded in `alembic_version`, empty when the
+    database was never migrated.
+
+    :param connection: Async SQLAlchemy connection.
+    """
+    exists = await connection.exec_driver_sql(
+        "SELECT to_regclass('alembic_version') IS NOT NULL"
+    )
+    if not exists.scalar():
+        return frozenset()
+    result = await connection.exec_driver_sql(
+        "SELECT version_num FROM alembic_version"
+    )
+    return frozenset(result.scalars())
+
+
+async def pending_migrations(connection: Any) -> bool:
+    """
+    Check whether the database is behind the migration scripts.
+
+    :param connection: Async SQLAlchemy connection.
+    """
+    return await applied_revisions(connection) != script_heads()
@@ -0,0 +1,476 @@
+"""
+Hash-based horizontal sharding
+
+Rows of sharded tables are spread over several PostgreSQL databases, the
+shards, by a consistent hash of a shard key column. Sessions are
+SQLAlchemy `ShardedSession`s, so repositories keep working on a single
+session:
+
+* statements filtering the shard key by equality or IN go to the shards
+  owning those keys; other statements on sharded tables go to every
+  shard and their results are concatenated, which `merge_sorted` turns
+  back into a single ordered listing;
+* new records are flushed to the shard owning their key, and loaded
+  records go back to the shard they came from;
+* unsharded tables and the id sequence live on the primary shard.
+
+Every shard has the full schema: run the migrations against each of them.
+"""
+
+import heapq
+import bisect
+import hashlib
+
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Callable
+from typing import Iterable
+from typing import Iterator
+from typing import Optional
+from typing import Sequence
+from itertools import islice
+from contextlib import contextmanager
+
+from sqlalchemy import text
+from sqlalchemy import inspect
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.engine import Row
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BinaryExpression
+from sqlalchemy.sql.elements import BindParameter
+from sqlalchemy.sql.elements import BooleanClauseList
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+
+from libs.environs import env
+
+
+__all__ = [
+    "HashRing",
+    "ShardMap",
+    "ShardSession",
+    "create_shard_map",
+    "shard_map",
+    "assign_shard_keys",
+    "merge_sorted",
+]
+
+# Shard name to database URL, e.g.
+# 'shard0=postgresql+asyncpg://u:p@db0/app,shard1=postgresql+asyncpg://...'.
+SHARDS = env.dict("SHARDS", default={})
+SHARD_PRIMARY = env.str("SHARD_PRIMARY", default="")
+# Sharded table to shard key column.
+SHARD_KEYS = env.dict("SHARD_KEYS", default={"users": "id"})
+SHARD_VNODES = env.int("SHARD_VNODES", default=128)
+
+# Session.info key of the shard a block of statements is pinned to.
+SHARD_PINNED = "shard_pinned"
+
+
+class HashRing:
+    """
+    Consistent hash ring mapping keys to shards.
+
+    Each shard owns `vnodes` points of a 64-bit ring and a key belongs to
+    the shard of the first point at or after the key's hash. Adding a
+    shard to N others moves about 1/(N + 1) of the keys, all of them to
+    the new shard.
+    """
+
+    def __init__(self, shards: Sequence[str], vnodes: int = SHARD_VNODES):
+        """
+        Build the ring.
+
+        :param shards: Shard names.
+        :param vnodes: Points per shard; more points even out the load.
+        :raises ValueError: If there is no shard.
+        """
+        if not shards:
+            raise ValueError("A hash ring needs at least one shard")
+        points = sorted(
+            (self.hash(f"{shard}#{index}"), shard)
+            for shard in shards
+            for index in range(vnodes)
+        )
+        self.shards = list(shards)
+        self._hashes = [point for point, _ in points]
+        self._owners = [shard for _, shard in points]
+
+    @staticmethod
+    def hash(value: Any) -> int:
+        """
+        Hash a value to a point of the ring, stable across processes.
+
+        :param value: Key or vnode label.
+        :return: 64-bit unsigned integer.
+        """
+        digest = hashlib.blake2b(str(value).encode(), digest_size=8)
+        return int.from_bytes(digest.digest(), "big")
+
+    def shard_for(self, key: Any) -> str:
+        """
+        Return the shard owning a key.
+
+        :param key: Shard key value.
+        :return: Shard name.
+        """
+        index = bisect.bisect_left(self._hashes, self.hash(key))
+        return self._owners[index % len(self._owners)]
+
+
+class ShardSession(ShardedSession):
+    """
+    Sharded session whose `get_bind()` without a mapper, as used to look
+    up the dialect, returns the primary shard.
+    """
+
+    def __init__(self, *args: Any, primary_shard: str, **kwargs: Any):
+        """
+        :param primary_shard: Shard bound when no mapper is given.
+        """
+        super().__init__(*args, **kwargs)
+        self.primary_shard = primary_shard
+
+    def get_bind(
+        self, mapper: Any = None, *, shard_id: Any = None, **kw: Any
+    ) -> Any:
+        if mapper is None and shard_id is None:
+            shard_id = self.primary_shard
+        return super().get_bind(mapper, shard_id=shard_id, **kw)
+
+
+class ShardMap:
+    """
+    Shards, their engines and the routing rules of sharded sessions.
+
+    Attributes:
+        engines (Dict[str, AsyncEngine]): Engine of each shard.
+        ring (HashRing): Ring of the shard names.
+        primary (str): Shard holding unsharded tables and the id sequence.
+        keys (Dict[str, str]): Shard key column of each sharded table.
+    """
+
+    def __init__(
+        self,
+        urls: Dict[str, str],
+        keys: Dict[str, str],
+        primary: Optional[str] = None,
+        vnodes: int = SHARD_VNODES,
+        engine_factory: Optional[Callable[[str], Any]] = None,
+    ):
+        """
+        Create an engine per shard.
+
+        :param urls: Shard name to database URL.
+        :param keys: Sharded table name to shard key column.
+        :param primary: Primary shard; defaults to the first one.
+        :param vnodes: Ring points per shard.
+        :param engine_factory: Builds an async engine from a URL.
+        :raises ValueError: If the primary shard is not in `urls`.
+        """
+        if engine_factory is None:
+            from db.storage.postgres.connection import get_engine
+
+            engine_factory = get_engine
+        self.engines = {
+            name: engine_factory(url) for name, url in urls.items()
+        }
+        self.ring = HashRing(list(urls), vnodes)
+        self.primary = primary or next(iter(urls))
+        if self.primary not in self.engines:
+            raise ValueError(f"Unknown primary shard '{self.primary}'")
+        self.keys = dict(keys)
+
+    def key_column(self, table: Any) -> Optional[str]:
+        """
+        Return the shard key column of a table, None if it is unsharded.
+
+        :param table: Table or table name.
+        """
+        return self.keys.get(getattr(table, "name", table))
+
+    def shard_for(self, table: Any, key: Any) -> str:
+        """
+        Return the shard owning a row.
+
+        :param table: Table or table name.
+        :param key: Shard key value of the row; ignored for unsharded
+            tables.
+        :return: Shard name.
+        """
+        if self.key_column(table) is None:
+            return self.primary
+        return self.ring.shard_for(key)
+
+    def split(
+        self, table: Any, rows: Iterable[Dict[str, Any]]
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Group rows by the shard owning them.
+
+        :param table: Table or table name.
+        :param rows: Column values, containing the shard key.
+        :return: Shard name to its rows, in their original order.
+        :raises ValueError: If a row lacks the shard key.
+        """
+        column = self.key_column(table)
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            if column is not None and row.get(column) is None:
+                raise ValueError(
+                    f"Rows of sharded table '{table}' need '{column}'"
+                )
+            key = row.get(column) if column else None
+            groups.setdefault(self.shard_for(table, key), []).append(row)
+        return groups
+
+    def shard_chooser(
+        self, mapper: Any, instance: Any, clause: Any = None, **kw: Any
+    ) -> str:
+        """
+        Pick the shard a new record is flushed to.
+        """
+        if mapper is None:
+            return self.primary
+        table = mapper.local_table
+        column = self.key_column(table)
+        if column is None or instance is None:
+            return self.primary
+        key = getattr(instance, column)
+        if key is None:
+            raise ValueError(
+                f"{mapper.class_.__name__}.{column} is not set; "
+                "call assign_shard_keys before adding the record"
+            )
+        return self.ring.shard_for(key)
+
+    def identity_chooser(
+        self, mapper: Any, primary_key: Sequence[Any], **kw: Any
+    ) -> List[str]:
+        """
+        Pick the shards a primary key lookup may find the record in.
+        """
+        column = self.key_column(mapper.local_table)
+        names = [c.name for c in mapper.primary_key]
+        if column not in names:
+            return list(self.engines) if column else [self.primary]
+        return [self.ring.shard_for(primary_key[names.index(column)])]
+
+    def execute_chooser(self, context: Any) -> List[str]:
+        """
+        Pick the shards a statement runs on.
+        """
+        pinned = context.session.info.get(SHARD_PINNED)
+        if pinned is not None:
+            return [pinned]
+        table = _statement_table(context)
+        column = self.key_column(table) if table is not None else None
+        if column is None:
+            return [self.primary]
+        keys = _key_values(context.statement, table, column)
+        if keys is None:
+            if context.is_insert:
+                raise ValueError(
+                    f"INSERT into sharded table '{table.name}' must be "
+                    "pinned to a shard"
+                )
+            return list(self.engines)
+        return sorted({self.ring.shard_for(key) for key in keys})
+
+    def session_factory(self) -> sessionmaker:
+        """
+        Return a factory of async sessions routed over the shards.
+
+        :return: Async session factory.
+        """
+        return sessionmaker(
+            autocommit=False,
+            autoflush=False,
+            class_=AsyncSession,
+            sync_session_class=ShardSession,
+            expire_on_commit=False,
+            primary_shard=self.primary,
+            shards={
+                name: engine.sync_engine
+                for name, engine in self.engines.items()
+            },
+            shard_chooser=self.shard_chooser,
+            identity_chooser=self.identity_chooser,
+            execute_chooser=self.execute_chooser,
+        )
+
+    async def dispose(self) -> None:
+        """
+        Close the connection pool of every shard.
+        """
+        for engine in self.engines.values():
+            await engine.dispose()
+
+    def after_fork(self) -> None:
+        """
+        Drop the pools inherited from a parent process without closing
+        their connections.
+        """
+        for engine in self.engines.values():
+            engine.sync_engine.dispose(close=False)
+
+
+def _statement_table(context: Any) -> Any:
+    """
+    Return the table a statement reads or writes, if it is mapped or DML.
+    """
+    mapper = context.bind_mapper
+    if mapper is not None:
+        return mapper.local_table
+    return getattr(context.statement, "table", None)
+
+
+def _key_values(statement: Any, table: Any, column: str) -> Optional[list]:
+    """
+    Collect the shard key values a statement is restricted to.
+
+    Only criteria ANDed at the top level of the WHERE clause count, so a
+    key compared under OR or NOT never narrows the shards.
+
+    :return: Key values, or None if the statement may touch any key.
+    """
+    criteria = list(getattr(statement, "_where_criteria", ()))
+    while criteria:
+        criterion = criteria.pop(0)
+        if (
+            isinstance(criterion, BooleanClauseList)
+            and criterion.operator is operators.and_
+        ):
+            criteria.extend(criterion.clauses)
+            continue
+        if not isinstance(criterion, BinaryExpression):
+            continue
+        left, right = criterion.left, criterion.right
+        if (
+            getattr(left, "table", None) is not table
+            or getattr(left, "name", None) != column
+            or not isinstance(right, BindParameter)
+            or right.callable is not None
+        ):
+            continue
+        if criterion.operator is operators.eq and right.value is not None:
+            return [right.value]
+        if criterion.operator is operators.in_op and right.value:
+            return list(right.value)
+    return None
+
+
+def create_shard_map() -> ShardMap:
+    """
+    Build the shard map from the SHARDS settings. Registry factory.
+
+    :return: Shard map.
+    :raises ValueError: If no shard is configured.
+    """
+    if not SHARDS:
+        raise ValueError("Sharding is enabled but SHARDS is empty")
+    return ShardMap(SHARDS, SHARD_KEYS, SHARD_PRIMARY or None)
+
+
+def shard_map(session: AsyncSession) -> Optional[ShardMap]:
+    """
+    Return the shard map a session routes over, None if it is unsharded.
+
+    :param session: Async session.
+    """
+    if not isinstance(session.sync_session, ShardedSession):
+        return None
+    from db.registry import registry
+
+    return registry.get("shards")
+
+
+@contextmanager
+def pinned(session: AsyncSession, shard: str) -> Iterator[None]:
+    """
+    Send every statement of the block to one shard.
+
+    :param session: Sharded async session.
+    :param shard: Shard name.
+    """
+    previous = session.info.get(SHARD_PINNED)
+    session.info[SHARD_PINNED] = shard
+    try:
+        yield
+    finally:
+        session.info[SHARD_PINNED] = previous
+
+
+async def assign_shard_keys(
+    session: AsyncSession, records: Sequence[Any]
+) -> None:
+    """
+    Give new records of sharded tables their shard key before the flush.
+
+    Records without a key are given ids from the `<table>_<key>_seq`
+    sequence of the primary shard, fetched in one round trip, so ids stay
+    unique across shards. Does nothing on an unsharded session.
+
+    :param session: Async session.
+    :param records: New model instances.
+    """
+    shards = shard_map(session)
+    if shards is None:
+        return
+    missing: Dict[Any, List[Any]] = {}
+    for record in records:
+        table = inspect(record).mapper.local_table
+        column = shards.key_column(table)
+        if column is not None and getattr(record, column) is None:
+            missing.setdefault((table.name, column), []).append(record)
+    for (table, column), pending in missing.items():
+        result = await session.execute(
+            text(
+                "SELECT nextval(:sequence) "
+                "FROM generate_series(1, :count)"
+            ),
+            {"sequence": f"{table}_{column}_seq", "count": len(pending)},
+            bind_arguments={"shard_id": shards.primary},
+        )
+        for record, key in zip(pending, result.scalars()):
+            setattr(record, column, key)
+
+
+def merge_sorted(
+    rows: Iterable[Any],
+    key: Callable[[Any], Any],
+    limit: Optional[int] = None,
+    shard_of: Optional[Callable[[Any], Any]] = None,
+    reverse: bool = False,
+) -> List[Any]:
+    """
+    Merge the sorted per-shard runs of a scattered query.
+
+    A sharded session concatenates the results of each shard; every run
+    is sorted by the query's ORDER BY, so a k-way merge on the same key
+    restores the global order.
+
+    :param rows: Records, or rows whose first element is a record.
+    :param key: Sort key of a row, matching the ORDER BY.
+    :param limit: Number of rows to keep.
+    :param shard_of: Shard of a row; defaults to the identity token of
+        the row's record.
+    :param reverse: Whether the ORDER BY is descending.
+    :return: Rows in global order.
+    """
+    if shard_of is None:
+        shard_of = _identity_token
+    runs: Dict[Any, List[Any]] = {}
+    for row in rows:
+        runs.setdefault(shard_of(row), []).append(row)
+    merged = heapq.merge(*runs.values(), key=key, reverse=reverse)
+    return list(islice(merged, limit))
+
+
+def _identity_token(row: Any) -> Any:
+    """
+    Return the shard a record, or the first record of a row, came from.
+    """
+    record = row[0] if isinstance(row, (Row, tuple)) else row
+    return inspect(record).identity_token
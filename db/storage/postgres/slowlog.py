@@ -0,0 +1,348 @@
+"""
+Slow query log
+"""
+
+import re
+import json
+import time
+import random
+import asyncio
+import logging
+
+from typing import Any
+from typing import Set
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from sqlalchemy import event
+
+from db.registry import registry
+from libs.environs import env
+
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_ENABLED = env.bool("SLOW_QUERY_ENABLED", default=True)
+SLOW_QUERY_THRESHOLD_MS = env.float("SLOW_QUERY_THRESHOLD_MS", default=200.0)
+SLOW_QUERY_TOP_N = env.int("SLOW_QUERY_TOP_N", default=20)
+SLOW_QUERY_CAPACITY = env.int("SLOW_QUERY_CAPACITY", default=500)
+SLOW_QUERY_WINDOW = env.int("SLOW_QUERY_WINDOW", default=3600)
+SLOW_QUERY_EXPLAIN_RATE = env.float("SLOW_QUERY_EXPLAIN_RATE", default=0.0)
+SLOW_QUERY_EXPLAIN_INTERVAL = env.int(
+    "SLOW_QUERY_EXPLAIN_INTERVAL", default=600
+)
+SLOW_QUERY_EXPLAIN_TIMEOUT_MS = env.int(
+    "SLOW_QUERY_EXPLAIN_TIMEOUT_MS", default=5000
+)
+
+_LITERALS = re.compile(
+    r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|\$\d+|%\(\w+\)s|\?"
+)
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_READ_ONLY = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+_WRITES = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE)\b", re.IGNORECASE)
+
+PARAMETERS_MAX_LENGTH = 500
+
+
+def fingerprint(statement: str) -> str:
+    """
+    Normalize a statement so executions differing only in literals,
+    bind parameters or IN-list length share one entry.
+
+    :param statement: SQL sent to the database.
+    :return: Statement with whitespace collapsed and literals replaced by
+        '?'.
+    """
+    shape = _LITERALS.sub("?", " ".join(statement.split()))
+    return _IN_LISTS.sub("(...)", shape)
+
+
+class SlowQuery:
+    """
+    Aggregated executions of one statement fingerprint.
+
+    Attributes:
+        fingerprint (str): Normalized statement.
+        statement (str): Statement of the slowest execution.
+        parameters (str): Parameters of the slowest execution, truncated.
+        count (int): Slow executions seen.
+        total (float): Total seconds of the slow executions.
+        max (float): Slowest execution in seconds.
+        last_seen (float): Unix time of the latest slow execution.
+        plan (Optional[Any]): Latest EXPLAIN plan, if captured.
+        plan_captured (Optional[float]): Unix time the plan was captured.
+    """
+
+    def __init__(self, fingerprint: str):
+        """
+        Initialize an empty entry.
+
+        :param fingerprint: Normalized statement.
+        """
+        self.fingerprint = fingerprint
+        self.statement = ""
+        self.parameters = ""
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last_seen = 0.0
+        self.plan: Optional[Any] = None
+        self.plan_captured: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Return the entry in report form, durations in milliseconds.
+        """
+        return {
+            "fingerprint": self.fingerprint,
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 2),
+            "mean_ms": round(self.total * 1000 / self.count, 2),
+            "max_ms": round(self.max * 1000, 2),
+            "last_seen": self.last_seen,
+            "statement": self.statement,
+            "parameters": self.parameters,
+            "plan": self.plan,
+            "plan_captured": self.plan_captured,
+        }
+
+
+class SlowQueryLog:
+    """
+    Records SQL statements slower than a threshold, per process.
+
+    Statements are timed with `before/after_cursor_execute` hooks and
+    aggregated by fingerprint; the slowest execution's statement and
+    parameters are kept. Entries not seen within `window` seconds are
+    dropped, and at most `capacity` fingerprints are kept, evicting the
+    least total time first. Each worker process keeps its own log, so
+    with several workers a report only covers the worker serving it.
+
+    The plan of a sample of slow SELECT statements is captured with plain
+    `EXPLAIN`, which plans the statement without running it, on a
+    separate pooled connection inside a read-only, rolled-back transaction
+    with a statement timeout. Plans show estimates, not actual row counts
+    or timings, but capturing one can never repeat a statement's side
+    effects (e.g. `nextval()` or advisory locks in a SELECT). At most one
+    plan is captured at a time and each fingerprint at most every
+    `explain_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        threshold_ms: float = SLOW_QUERY_THRESHOLD_MS,
+        capacity: int = SLOW_QUERY_CAPACITY,
+        window: int = SLOW_QUERY_WINDOW,
+        explain_rate: float = SLOW_QUERY_EXPLAIN_RATE,
+        explain_interval: int = SLOW_QUERY_EXPLAIN_INTERVAL,
+        explain_timeout_ms: int = SLOW_QUERY_EXPLAIN_TIMEOUT_MS,
+    ):
+        """
+        Initialize the log.
+
+        :param threshold_ms: Statements at or above this duration are
+            recorded.
+        :param capacity: Maximum number of fingerprints kept.
+        :param window: Seconds an entry is kept after its last slow
+            execution.
+        :param explain_rate: Fraction of slow statements to EXPLAIN, 0 to 1.
+        :param explain_interval: Minimum seconds between plans of a
+            fingerprint.
+        :param explain_timeout_ms: Statement timeout of the EXPLAIN run.
+        """
+        self.threshold = threshold_ms / 1000
+        self.capacity = capacity
+        self.window = window
+        self.explain_rate = explain_rate
+        self.explain_interval = explain_interval
+        self.explain_timeout_ms = explain_timeout_ms
+        self._entries: Dict[str, SlowQuery] = {}
+        self._explaining: Set[asyncio.Task] = set()
+        self._instrumented: Set[int] = set()
+
+    def install(self) -> None:
+        """
+        Instrument the PostgreSQL engine as soon as it is created.
+        """
+        registry.backend("postgres").on_load(self.instrument)
+
+    def instrument(self, engine: Any) -> None:
+        """
+        Attach the timing hooks to an async SQLAlchemy engine.
+
+        :param engine: Async SQLAlchemy engine.
+        """
+        sync_engine = engine.sync_engine
+        if id(sync_engine) in self._instrumented:
+            return
+        self._instrumented.add(id(sync_engine))
+
+        def before_execute(conn, cursor, statement, parameters, context, many):
+            conn.info["slow_query_started"] = time.perf_counter()
+
+        def after_execute(conn, cursor, statement, parameters, context, many):
+            started = conn.info.pop("slow_query_started", None)
+            if started is None:
+                return
+            duration = time.perf_counter() - started
+            if duration >= self.threshold:
+                self.record(statement, parameters, duration, engine, many)
+
+        event.listen(sync_engine, "before_cursor_execute", before_execute)
+        event.listen(sync_engine, "after_cursor_execute", after_execute)
+
+    def record(
+        self,
+        statement: str,
+        parameters: Any,
+        duration: float,
+        engine: Optional[Any] = None,
+        many: bool = False,
+    ) -> None:
+        """
+        Record a slow execution and maybe schedule an EXPLAIN of it.
+
+        :param statement: SQL sent to the database.
+        :param parameters: Bound parameters.
+        :param duration: Execution time in seconds.
+        :param engine: Async engine to EXPLAIN on; no plan when None.
+        :param many: Whether the statement ran as executemany.
+        """
+        if statement.lstrip()[:7].upper() == "EXPLAIN":
+            return
+        key = fingerprint(statement)
+        entry = self._entries.get(key)
+        if entry is None:
+            self._prune()
+            entry = self._entries[key] = SlowQuery(key)
+        entry.count += 1
+        entry.total += duration
+        entry.last_seen = time.time()
+        if duration >= entry.max:
+            entry.max = duration
+            entry.statement = statement
+            entry.parameters = repr(parameters)[:PARAMETERS_MAX_LENGTH]
+
+        logger.warning(
+            "Slow query (%.1f ms): %s", duration * 1000, key[:500],
+            extra={"slow_query": {
+                "fingerprint": key, "duration_ms": duration * 1000,
+            }},
+        )
+
+        if (
+            engine is not None and not many
+            and self._should_explain(entry, statement)
+        ):
+            self._schedule_explain(engine, entry, statement, parameters)
+
+    def _prune(self) -> None:
+        """
+        Drop expired entries and make room for a new one.
+        """
+        expired = time.time() - self.window
+        for key in [
+            k for k, e in self._entries.items() if e.last_seen < expired
+        ]:
+            del self._entries[key]
+        while len(self._entries) >= self.capacity:
+            key = min(self._entries, key=lambda k: self._entries[k].total)
+            del self._entries[key]
+
+    def _should_explain(self, entry: SlowQuery, statement: str) -> bool:
+        """
+        Decide whether to capture a plan for this execution.
+        """
+        if self.explain_rate <= 0 or self._explaining:
+            return False
+        if not _READ_ONLY.match(statement) or _WRITES.search(statement):
+            return False
+        if (
+            entry.plan_captured
+            and time.time() - entry.plan_captured < self.explain_interval
+        ):
+            return False
+        return random.random() < self.explain_rate
+
+    def _schedule_explain(
+        self, engine: Any, entry: SlowQuery, statement: str, parameters: Any
+    ) -> None:
+        """
+        Run the EXPLAIN in the background of the current event loop.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(
+            self.explain(engine, entry, statement, parameters)
+        )
+        self._explaining.add(task)
+        task.add_done_callback(self._explaining.discard)
+
+    async def explain(
+        self, engine: Any, entry: SlowQuery, statement: str, parameters: Any
+    ) -> None:
+        """
+        Capture the plan of a statement on a separate connection.
+
+        :param engine: Async SQLAlchemy engine.
+        :param entry: Entry receiving the plan.
+        :param statement: SQL to explain, as sent to the driver.
+        :param parameters: Bound parameters, as sent to the driver.
+        """
+        try:
+            async with engine.connect() as connection:
+                transaction = await connection.begin()
+                try:
+                    await connection.exec_driver_sql(
+                        "SET TRANSACTION READ ONLY"
+                    )
+                    await connection.exec_driver_sql(
+                        "SET LOCAL statement_timeout = "
+                        f"{int(self.explain_timeout_ms)}"
+                    )
+                    result = await connection.exec_driver_sql(
+                        "EXPLAIN (FORMAT JSON) " + statement, parameters
+                    )
+                    plan = result.scalar()
+                finally:
+                    await transaction.rollback()
+        except Exception as e:
+            logger.info("Could not EXPLAIN slow query: %s", e)
+            entry.plan_captured = time.time()
+            return
+        entry.plan = json.loads(plan) if isinstance(plan, str) else plan
+        entry.plan_captured = time.time()
+
+    def top(
+        self, limit: int = SLOW_QUERY_TOP_N, order_by: str = "total"
+    ) -> List[Dict[str, Any]]:
+        """
+        Return the worst fingerprints of the current window.
+
+        :param limit: Number of entries to return.
+        :param order_by: 'total', 'max', 'count' or 'mean'.
+        :return: Entries in report form, worst first.
+        """
+        expired = time.time() - self.window
+        keys = {
+            "total": lambda e: e.total,
+            "max": lambda e: e.max,
+            "count": lambda e: e.count,
+            "mean": lambda e: e.total / e.count,
+        }
+        entries = [e for e in self._entries.values() if e.last_seen >= expired]
+        entries.sort(key=keys[order_by], reverse=True)
+        return [entry.to_dict() for entry in entries[:limit]]
+
+    def reset(self) -> None:
+        """
+        Forget every recorded statement.
+        """
+        self._entries.clear()
+
+
+slow_queries = SlowQueryLog()
@@ -1,13 +1,11 @@
 #!/bin/sh
 set -e
 
-echo "⏳ Waiting for database..."
-sleep 5
-
-echo "📦 Running migrations..."
 cd /app
 export PYTHONPATH=/app
-alembic upgrade head
+
+echo "📦 Checking migrations..."
+python -m src.commands.migrate
 
 echo "🚀 Starting FastAPI app..."
-exec gunicorn src.main:app --workers 1 --worker-class uvicorn.workers.UvicornWorker --bind 0.0.0.0:8000 --timeout 60
+exec python -m src.commands.serve
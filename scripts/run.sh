@@ -1 +1 @@
-uvicorn src.main:app --reload --port 8000
+python -m src.commands.serve --reload --bind 127.0.0.1:8000
@@ -0,0 +1,394 @@
+"""
+Load-test harness
+
+Usage:
+    python -m src.commands.loadtest seed [--rows N] [--deleted-ratio R]
+                                         [--batch N] [--truncate]
+    python -m src.commands.loadtest run [--workload mixed|pagination|burst]
+                                        [--url URL | --in-process]
+                                        [--concurrency N] [--duration S]
+                                        [--json PATH]
+
+`seed` bulk loads synthetic users with COPY (PostgreSQL only): names drawn
+from a small vocabulary, creation times spread over two years and a share
+of soft-deleted rows, then ANALYZEs the table so the planner sees the new
+statistics. A million rows takes seconds rather than the minutes ORM
+inserts would.
+
+`run` drives a workload with N concurrent clients for S seconds against a
+running server, or in-process through ASGITransport, and reports request
+count, throughput, p50/p95/p99 latency and status codes per endpoint:
+
+    mixed       reads by id, page reads, creates and updates (80/10/5/5)
+    pagination  page reads at random offsets across the whole table
+    burst       back-to-back requests to one path, e.g. a throttled one
+"""
+
+import json
+import time
+import random
+import asyncio
+import argparse
+import statistics
+
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Tuple
+from typing import Callable
+from typing import Optional
+
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+
+from db.registry import registry
+from libs.environs import env
+
+
+FIRST_NAMES = [
+    "alex", "maria", "john", "aziza", "li", "fatima", "david", "olga",
+    "omar", "sara", "ivan", "emma", "yusuf", "anna", "carlos", "mei",
+]
+LAST_NAMES = [
+    "smith", "karimov", "garcia", "chen", "ivanova", "khan", "brown",
+    "tanaka", "nowak", "silva", "müller", "rossi", "kim", "haddad",
+]
+
+LOADTEST_URL = env.str("LOADTEST_URL", default="http://127.0.0.1:8000")
+PAGE_SIZE = 50
+
+
+def synthetic_users(
+    count: int,
+    deleted_ratio: float,
+    seed: int,
+) -> List[Tuple[str, datetime, datetime, Optional[datetime]]]:
+    """
+    Generate user rows in the column order (name, created_at, updated_at,
+    deleted_at).
+
+    :param count: Number of rows.
+    :param deleted_ratio: Share of rows that are soft-deleted.
+    :param seed: Random seed, so batches differ but runs repeat.
+    :return: Row tuples ready for COPY.
+    """
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    span = 2 * 365 * 24 * 3600
+    rows = []
+    for _ in range(count):
+        created = now - timedelta(seconds=rng.randrange(span))
+        updated = created + timedelta(seconds=rng.randrange(
+            int((now - created).total_seconds()) + 1
+        ))
+        deleted = updated if rng.random() < deleted_ratio else None
+        name = (
+            f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} "
+            f"{rng.randrange(100000)}"
+        )
+        rows.append((name, created, updated, deleted))
+    return rows
+
+
+async def seed(
+    rows: int,
+    deleted_ratio: float,
+    batch: int,
+    truncate: bool,
+) -> None:
+    """
+    Bulk load synthetic users with COPY and refresh planner statistics.
+
+    :param rows: Total number of rows to insert.
+    :param deleted_ratio: Share of soft-deleted rows.
+    :param batch: Rows per COPY batch, bounding memory use.
+    :param truncate: Empty the table and reset its ids first.
+    """
+    from sqlalchemy import text
+
+    engine = registry.get("postgres")
+    engine.sync_engine.echo = False
+    started = time.perf_counter()
+    async with engine.connect() as connection:
+        raw = await connection.get_raw_connection()
+        driver = raw.driver_connection
+        if truncate:
+            await driver.execute("TRUNCATE users RESTART IDENTITY")
+        done = 0
+        while done < rows:
+            size = min(batch, rows - done)
+            await driver.copy_records_to_table(
+                "users",
+                records=synthetic_users(size, deleted_ratio, seed=done),
+                columns=["name", "created_at", "updated_at", "deleted_at"],
+            )
+            done += size
+            elapsed = time.perf_counter() - started
+            print(f"  {done:>12,} rows  {done / elapsed:>12,.0f} rows/s")
+        await driver.execute("ANALYZE users")
+        total = (await connection.execute(
+            text("SELECT count(*) FROM users")
+        )).scalar_one()
+    await registry.shutdown()
+    print(
+        f"Seeded {rows:,} users in {time.perf_counter() - started:.1f}s "
+        f"({total:,} in table)"
+    )
+
+
+class Stats:
+    """
+    Latencies and status codes collected for one endpoint.
+    """
+
+    def __init__(self):
+        """
+        Initialize empty samples.
+        """
+        self.latencies: List[float] = []
+        self.statuses: Dict[int, int] = {}
+        self.errors = 0
+
+    def record(self, latency: float, status: Optional[int]) -> None:
+        """
+        Record one request; a None status counts as a transport error.
+        """
+        self.latencies.append(latency)
+        if status is None:
+            self.errors += 1
+        else:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def summary(self, duration: float) -> Dict[str, Any]:
+        """
+        Summarize the samples.
+
+        :param duration: Length of the run in seconds.
+        :return: Count, throughput, latency percentiles in ms and statuses.
+        """
+        latencies = sorted(self.latencies)
+        if len(latencies) > 1:
+            cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+            p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+        else:
+            p50 = p95 = p99 = latencies[0] if latencies else 0.0
+        return {
+            "requests": len(latencies),
+            "throughput": len(latencies) / duration if duration else 0.0,
+            "p50_ms": p50 * 1000,
+            "p95_ms": p95 * 1000,
+            "p99_ms": p99 * 1000,
+            "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+            "errors": self.errors,
+        }
+
+
+Operation = Callable[[random.Random], Tuple[str, str, str, Optional[dict]]]
+
+
+def build_workload(
+    name: str,
+    max_id: int,
+    burst_path: str,
+) -> List[Tuple[float, Operation]]:
+    """
+    Return the weighted operations of a workload.
+
+    Each operation returns (label, method, path, json body).
+
+    :param name: Workload name: mixed, pagination or burst.
+    :param max_id: Highest user id, bounding random ids and offsets.
+    :param burst_path: Path hammered by the burst workload.
+    :return: List of (weight, operation).
+    """
+    def read(rng):
+        path = f"/users/{rng.randint(1, max_id)}"
+        return "GET /users/{id}", "GET", path, None
+
+    def page(rng):
+        return "GET /users/", "GET", f"/users/?limit={PAGE_SIZE}", None
+
+    def deep_page(rng):
+        skip = rng.randrange(max(max_id - PAGE_SIZE, 1))
+        return (
+            "GET /users/ (deep)", "GET",
+            f"/users/?skip={skip}&limit={PAGE_SIZE}", None,
+        )
+
+    def create(rng):
+        return "POST /users/", "POST", "/users/", {
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        }
+
+    def update(rng):
+        return (
+            "PATCH /users/{id}", "PATCH",
+            f"/users/{rng.randint(1, max_id)}",
+            {"name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"},
+        )
+
+    def burst(rng):
+        return f"GET {burst_path}", "GET", burst_path, None
+
+    workloads = {
+        "mixed": [(0.80, read), (0.10, page), (0.05, create), (0.05, update)],
+        "pagination": [(1.0, deep_page)],
+        "burst": [(1.0, burst)],
+    }
+    return workloads[name]
+
+
+async def max_user_id() -> int:
+    """
+    Return the highest user id, for picking random existing rows.
+    """
+    from sqlalchemy import text
+
+    engine = registry.get("postgres")
+    engine.sync_engine.echo = False
+    async with engine.connect() as connection:
+        result = await connection.execute(text("SELECT max(id) FROM users"))
+        return result.scalar() or 1
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Drive the workload and return the per-endpoint report.
+
+    :param args: Parsed command line arguments.
+    :return: Report with one summary per endpoint and a total.
+    """
+    import httpx
+
+    max_id = args.max_id or await max_user_id()
+    operations = build_workload(args.workload, max_id, args.burst_path)
+    weights = [weight for weight, _ in operations]
+    functions = [operation for _, operation in operations]
+
+    if args.in_process:
+        from src.main import app
+
+        transport = httpx.ASGITransport(app=app, client=("127.0.0.1", 1234))
+        base_url = "http://loadtest"
+    else:
+        transport = httpx.AsyncHTTPTransport(retries=0)
+        base_url = args.url
+
+    stats: Dict[str, Stats] = {}
+    total = Stats()
+    limits = httpx.Limits(max_connections=args.concurrency)
+    deadline = time.monotonic() + args.duration
+
+    async def client_loop(client: httpx.AsyncClient, seed_: int) -> None:
+        rng = random.Random(seed_)
+        while time.monotonic() < deadline:
+            operation = rng.choices(functions, weights)[0]
+            label, method, path, body = operation(rng)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = None
+            latency = time.perf_counter() - started
+            stats.setdefault(label, Stats()).record(latency, status)
+            total.record(latency, status)
+
+    async with httpx.AsyncClient(
+        transport=transport, base_url=base_url, limits=limits, timeout=30,
+    ) as client:
+        started = time.monotonic()
+        await asyncio.gather(*(
+            client_loop(client, i) for i in range(args.concurrency)
+        ))
+        duration = time.monotonic() - started
+    await registry.shutdown()
+
+    return {
+        "workload": args.workload,
+        "concurrency": args.concurrency,
+        "duration": duration,
+        "max_id": max_id,
+        "endpoints": {
+            label: s.summary(duration) for label, s in sorted(stats.items())
+        },
+        "total": total.summary(duration),
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    """
+    Print the report as a table.
+    """
+    print(
+        f"\nworkload={report['workload']} concurrency={report['concurrency']} "
+        f"duration={report['duration']:.1f}s max_id={report['max_id']:,}\n"
+    )
+    header = (
+        f"{'endpoint':<24}{'requests':>10}{'req/s':>10}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  statuses"
+    )
+    print(header)
+    print("-" * len(header))
+    rows = list(report["endpoints"].items()) + [("total", report["total"])]
+    for label, s in rows:
+        statuses = " ".join(f"{k}:{v}" for k, v in s["statuses"].items())
+        if s["errors"]:
+            statuses += f" errors:{s['errors']}"
+        print(
+            f"{label:<24}{s['requests']:>10,}{s['throughput']:>10.1f}"
+            f"{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}"
+            f"  {statuses}"
+        )
+
+
+def main() -> None:
+    """
+    Parse arguments and seed or run.
+    """
+    parser = argparse.ArgumentParser(description="Load-test harness")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed", help="Bulk load synthetic users")
+    seed_parser.add_argument("--rows", type=int, default=1_000_000)
+    seed_parser.add_argument("--deleted-ratio", type=float, default=0.05)
+    seed_parser.add_argument("--batch", type=int, default=100_000)
+    seed_parser.add_argument("--truncate", action="store_true")
+
+    run_parser = commands.add_parser("run", help="Run a workload")
+    run_parser.add_argument(
+        "--workload", choices=["mixed", "pagination", "burst"], default="mixed"
+    )
+    run_parser.add_argument("--url", default=LOADTEST_URL)
+    run_parser.add_argument(
+        "--in-process", action="store_true",
+        help="Call the app through ASGITransport instead of over HTTP",
+    )
+    run_parser.add_argument("--concurrency", type=int, default=50)
+    run_parser.add_argument("--duration", type=float, default=30.0)
+    run_parser.add_argument("--burst-path", default="/users/1")
+    run_parser.add_argument(
+        "--max-id", type=int, default=0,
+        help="Highest user id; read from the database when omitted",
+    )
+    run_parser.add_argument("--json", dest="output")
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        asyncio.run(
+            seed(args.rows, args.deleted_ratio, args.batch, args.truncate)
+        )
+        return
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
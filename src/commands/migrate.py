@@ -0,0 +1,148 @@
+"""
+Migrate the database on container start
+
+Usage:
+    python -m src.commands.migrate
+
+Waits for PostgreSQL with exponential backoff instead of a fixed sleep,
+then compares `alembic_version` with the migration heads and exits at
+once when nothing is pending, so replicas of an up-to-date deployment
+skip Alembic entirely. Otherwise the replica takes a PostgreSQL advisory
+lock as its migration lease, checks again in case another replica has
+just migrated, and runs `alembic upgrade head`. The lease is released
+when the connection closes, even if the process dies.
+"""
+
+import sys
+import time
+import asyncio
+import logging
+
+from typing import Any
+
+from libs.environs import env
+
+
+logger = logging.getLogger("migrate")
+
+MIGRATE_WAIT_TIMEOUT = env.float("MIGRATE_WAIT_TIMEOUT", default=60.0)
+MIGRATE_BACKOFF_MAX = env.float("MIGRATE_BACKOFF_MAX", default=2.0)
+MIGRATE_LEASE_TIMEOUT = env.float("MIGRATE_LEASE_TIMEOUT", default=900.0)
+# Advisory lock key shared by every replica of the application.
+MIGRATE_LEASE_KEY = env.int("MIGRATE_LEASE_KEY", default=727274)
+
+BACKOFF_START = 0.05
+
+
+async def wait_for_database(engine: Any, timeout: float) -> None:
+    """
+    Retry a trivial query with exponential backoff until it succeeds.
+
+    :param engine: Async SQLAlchemy engine.
+    :param timeout: Seconds to keep trying.
+    :raises SystemExit: If the database is still unreachable.
+    """
+    deadline = time.monotonic() + timeout
+    delay = BACKOFF_START
+    while True:
+        try:
+            async with engine.connect() as connection:
+                await connection.exec_driver_sql("SELECT 1")
+            return
+        except Exception as e:
+            if time.monotonic() + delay > deadline:
+                raise SystemExit(f"Database unreachable: {e}")
+            logger.info("Database not ready (%s), retrying in %.2fs", e, delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MIGRATE_BACKOFF_MAX)
+
+
+async def acquire_lease(connection: Any, timeout: float) -> None:
+    """
+    Take the migration advisory lock, polling with backoff.
+
+    :param connection: Autocommit connection holding the lease.
+    :param timeout: Seconds to wait for another replica's migration.
+    :raises SystemExit: If the lease cannot be taken in time.
+    """
+    deadline = time.monotonic() + timeout
+    delay = BACKOFF_START
+    while True:
+        result = await connection.exec_driver_sql(
+            f"SELECT pg_try_advisory_lock({MIGRATE_LEASE_KEY})"
+        )
+        if result.scalar():
+            return
+        if time.monotonic() + delay > deadline:
+            raise SystemExit("Timed out waiting for the migration lease")
+        logger.info("Another replica is migrating, waiting")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, MIGRATE_BACKOFF_MAX)
+
+
+def upgrade() -> None:
+    """
+    Run `alembic upgrade head`.
+    """
+    from alembic import command
+    from db.storage.postgres.revisions import alembic_config
+
+    command.upgrade(alembic_config(), "head")
+
+
+async def migrate() -> bool:
+    """
+    Bring the schema to the migration heads if it is behind.
+
+    :return: True if migrations ran, False if the schema was current.
+    """
+    from sqlalchemy.pool import NullPool
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from db.storage.postgres.connection import db_url
+    from db.storage.postgres.revisions import pending_migrations
+
+    engine = create_async_engine(db_url, poolclass=NullPool)
+    try:
+        await wait_for_database(engine, MIGRATE_WAIT_TIMEOUT)
+        async with engine.connect() as connection:
+            if not await pending_migrations(connection):
+                logger.info("Schema is up to date, skipping migrations")
+                return False
+
+        # Autocommit: an idle open transaction would make CREATE INDEX
+        # CONCURRENTLY in the migrations wait for the lease forever.
+        async with engine.connect() as lease:
+            lease = await lease.execution_options(isolation_level="AUTOCOMMIT")
+            await acquire_lease(lease, MIGRATE_LEASE_TIMEOUT)
+            try:
+                async with engine.connect() as connection:
+                    if not await pending_migrations(connection):
+                        logger.info("Schema migrated by another replica")
+                        return False
+                started = time.monotonic()
+                await asyncio.to_thread(upgrade)
+                logger.info(
+                    "Migrated in %.1fs", time.monotonic() - started
+                )
+                return True
+            finally:
+                await lease.exec_driver_sql(
+                    f"SELECT pg_advisory_unlock({MIGRATE_LEASE_KEY})"
+                )
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    """
+    Migrate the database if needed.
+    """
+    logging.basicConfig(
+        level=logging.INFO, stream=sys.stdout, format="%(message)s"
+    )
+    asyncio.run(migrate())
+
+
+if __name__ == "__main__":
+    main()
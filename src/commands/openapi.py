@@ -0,0 +1,41 @@
+"""
+Pre-generate the OpenAPI schema
+
+Usage:
+    python -m src.commands.openapi [path]
+
+Point OPENAPI_SCHEMA_PATH at the written file so workers load it instead
+of building the schema from the routes on the first docs request. The
+file records the app version and route set it was built from, and
+workers ignore it once either changes.
+"""
+
+import sys
+import json
+
+from libs.environs import env
+
+
+def main() -> None:
+    """
+    Write the application's OpenAPI schema to disk.
+    """
+    path = (
+        sys.argv[1] if len(sys.argv) > 1
+        else env.str("OPENAPI_SCHEMA_PATH", default="openapi.json")
+    )
+
+    from fastapi import FastAPI
+    from src.main import app
+    from src.main import openapi_key
+    from src.main import OPENAPI_KEY_FIELD
+
+    app.openapi_schema = None
+    schema = {**FastAPI.openapi(app), OPENAPI_KEY_FIELD: openapi_key()}
+    with open(path, "w") as schema_file:
+        json.dump(schema, schema_file, separators=(",", ":"))
+    print(f"OpenAPI schema written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Copy rows of sharded tables to a new shard map
+
+Usage:
+    python -m src.commands.reshard --to NAME=URL[,NAME=URL...]
+                                   [--table TABLE] [--batch-size N]
+                                   [--dry-run]
+    python -m src.commands.reshard --prune [--table TABLE]
+                                   [--batch-size N] [--dry-run]
+
+Resharding, e.g. adding a shard:
+
+1. Create the schema on the new shard by running the migrations on it.
+2. `--to` with the new map walks every current shard by shard key and
+   upserts each row whose owner changes into its new shard. With
+   consistent hashing only the rows moving to the new shard are copied.
+   The copy is idempotent: run it again right before switching to bring
+   over rows written in the meantime.
+3. Deploy the new map in SHARDS. Writes to moving rows between the last
+   copy and the switch are lost, so pause them or run step 2 once more
+   with writes stopped.
+4. `--prune` deletes from each shard of the current map the rows it no
+   longer owns.
+"""
+
+import asyncio
+import logging
+import argparse
+
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import AsyncIterator
+
+from sqlalchemy import text
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from libs.environs import env
+
+
+logger = logging.getLogger("reshard")
+
+RESHARD_BATCH_SIZE = env.int("RESHARD_BATCH_SIZE", default=1000)
+
+
+def parse_map(value: str) -> Dict[str, str]:
+    """
+    Parse 'name=url,name=url' into a shard map.
+    """
+    return {
+        name.strip(): url.strip()
+        for name, url in (item.split("=", 1) for item in value.split(","))
+    }
+
+
+async def walk(
+    engine: Any, table: Any, column: str, batch_size: int
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Yield the rows of a table in batches ordered by the shard key.
+
+    :param engine: Async engine of the shard.
+    :param table: Table.
+    :param column: Shard key column.
+    :param batch_size: Rows per batch.
+    """
+    key = table.c[column]
+    last: Optional[Any] = None
+    while True:
+        query = select(table).order_by(key).limit(batch_size)
+        if last is not None:
+            query = query.where(key > last)
+        async with engine.connect() as connection:
+            rows = [
+                dict(row) for row in
+                (await connection.execute(query)).mappings().all()
+            ]
+        if not rows:
+            return
+        yield rows
+        last = rows[-1][column]
+
+
+async def copy(
+    source: Any,
+    target: Any,
+    source_urls: Dict[str, str],
+    target_urls: Dict[str, str],
+    tables: List[str],
+    batch_size: int,
+    dry_run: bool,
+) -> Dict[str, int]:
+    """
+    Upsert every row whose owner changes into its shard of `target`.
+
+    :return: Rows copied to each target shard.
+    """
+    from db.storage.postgres import Base
+
+    copied = {name: 0 for name in target.engines}
+    for table_name in tables:
+        table = Base.metadata.tables[table_name]
+        column = source.key_column(table)
+        key_columns = [c.name for c in table.primary_key]
+        for name, engine in source.engines.items():
+            async for rows in walk(engine, table, column, batch_size):
+                groups = target.split(table, rows)
+                for shard, group in groups.items():
+                    if target_urls[shard] == source_urls[name]:
+                        continue
+                    copied[shard] += len(group)
+                    if dry_run:
+                        continue
+                    stmt = insert(table).values(group)
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=key_columns,
+                        set_={
+                            c.name: stmt.excluded[c.name]
+                            for c in table.columns
+                            if c.name not in key_columns
+                        },
+                    )
+                    async with target.engines[shard].begin() as connection:
+                        await connection.execute(stmt)
+                logger.info(
+                    "%s of %s: copied up to %s=%s",
+                    table_name, name, column, rows[-1][column],
+                )
+        if not dry_run and target.primary != source.primary:
+            await carry_sequence(source, target, table_name, column)
+    return copied
+
+
+async def carry_sequence(
+    source: Any, target: Any, table: str, column: str
+) -> None:
+    """
+    Advance the id sequence of the new primary shard past the old one's,
+    so ids handed out after the switch stay unique.
+    """
+    sequence = f"{table}_{column}_seq"
+    async with source.engines[source.primary].connect() as connection:
+        last = (await connection.execute(
+            text(f"SELECT last_value FROM {sequence}")
+        )).scalar()
+    async with target.engines[target.primary].begin() as connection:
+        await connection.execute(
+            text(
+                f"SELECT setval('{sequence}', "
+                f"GREATEST((SELECT last_value FROM {sequence}), :last))"
+            ),
+            {"last": last},
+        )
+
+
+async def prune(
+    shards: Any, tables: List[str], batch_size: int, dry_run: bool
+) -> Dict[str, int]:
+    """
+    Delete from each shard the rows another shard owns.
+
+    :return: Rows deleted from each shard.
+    """
+    from db.storage.postgres import Base
+
+    deleted = {name: 0 for name in shards.engines}
+    for table_name in tables:
+        table = Base.metadata.tables[table_name]
+        column = shards.key_column(table)
+        key = table.c[column]
+        for name, engine in shards.engines.items():
+            async for rows in walk(engine, table, column, batch_size):
+                misplaced = [
+                    row[column] for row in rows
+                    if shards.shard_for(table, row[column]) != name
+                ]
+                deleted[name] += len(misplaced)
+                if misplaced and not dry_run:
+                    async with engine.begin() as connection:
+                        await connection.execute(
+                            table.delete().where(key.in_(misplaced))
+                        )
+    return deleted
+
+
+async def run(args: argparse.Namespace) -> Dict[str, int]:
+    """
+    Copy to the new map or prune the current one.
+    """
+    import src.models  # noqa: F401
+
+    from db.storage.postgres.shards import SHARDS
+    from db.storage.postgres.shards import SHARD_KEYS
+    from db.storage.postgres.shards import ShardMap
+    from db.storage.postgres.shards import create_shard_map
+
+    source = create_shard_map()
+    tables = [args.table] if args.table else list(SHARD_KEYS)
+    maps = [source]
+    try:
+        if args.prune:
+            return await prune(
+                source, tables, args.batch_size, args.dry_run
+            )
+        target_urls = parse_map(args.to)
+        target = ShardMap(target_urls, SHARD_KEYS, args.primary)
+        maps.append(target)
+        return await copy(
+            source, target, SHARDS, target_urls, tables,
+            args.batch_size, args.dry_run,
+        )
+    finally:
+        for shards in maps:
+            await shards.dispose()
+
+
+def main() -> None:
+    """
+    Parse arguments and reshard.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--to", help="New shard map, NAME=URL,...")
+    action.add_argument("--prune", action="store_true")
+    parser.add_argument("--primary", default=None)
+    parser.add_argument("--table", default=None)
+    parser.add_argument("--batch-size", type=int, default=RESHARD_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    counts = asyncio.run(run(args))
+    verb = "deleted" if args.prune else "copied"
+    if args.dry_run:
+        verb = f"would be {verb}"
+    for name, count in counts.items():
+        print(f"{name}: {count} rows {verb}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Production server launcher
+
+Usage:
+    python -m src.commands.serve [--bind HOST:PORT] [--workers N]
+                                 [--preload] [--reload]
+
+Runs gunicorn with uvicorn workers sized from the CPUs actually available
+to the process (scheduler affinity and cgroup CPU quota), using uvloop and
+httptools when they are installed. With `--preload` the app is imported
+once in the master and forked; every worker then drops the connection
+pools it inherited so no socket is shared between processes. Workers are
+recycled after WEB_MAX_REQUESTS requests, with jitter so they do not all
+restart at once. `--reload` runs a single uvicorn process for development.
+"""
+
+import os
+import re
+import math
+import atexit
+import shutil
+import argparse
+import tempfile
+import importlib.util
+
+from typing import Any
+from typing import Dict
+from typing import Optional
+
+from uvicorn.workers import UvicornWorker as BaseUvicornWorker
+
+from libs.environs import env
+
+
+APP = "src.main:app"
+
+WEB_BIND = env.str("WEB_BIND", default="0.0.0.0:8000")
+WEB_CONCURRENCY = env.int("WEB_CONCURRENCY", default=0)
+WEB_WORKERS_PER_CORE = env.float("WEB_WORKERS_PER_CORE", default=1.0)
+WEB_MAX_WORKERS = env.int("WEB_MAX_WORKERS", default=0)
+WEB_PRELOAD = env.bool("WEB_PRELOAD", default=False)
+WEB_TIMEOUT = env.int("WEB_TIMEOUT", default=60)
+WEB_GRACEFUL_TIMEOUT = env.int("WEB_GRACEFUL_TIMEOUT", default=30)
+WEB_KEEPALIVE = env.int("WEB_KEEPALIVE", default=5)
+WEB_MAX_REQUESTS = env.int("WEB_MAX_REQUESTS", default=10000)
+WEB_MAX_REQUESTS_JITTER = env.int("WEB_MAX_REQUESTS_JITTER", default=1000)
+
+LOOP = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+HTTP = "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+# Files written by utils.metrics.multiprocess: '<pid>.json', 'archive.json'
+# and their '.<name>.tmp' staging copies.
+SNAPSHOT_FILE = re.compile(r"^\.?(\d+|archive)\.json(\.tmp)?$")
+
+
+class UvicornWorker(BaseUvicornWorker):
+    """
+    Uvicorn worker pinned to the fastest installed loop and HTTP parser.
+    """
+
+    CONFIG_KWARGS = {"loop": LOOP, "http": HTTP}
+
+
+def _read(path: str) -> Optional[str]:
+    """
+    Read a small file, returning None if it does not exist.
+    """
+    try:
+        with open(path) as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_quota() -> Optional[float]:
+    """
+    Return the CPU quota imposed by the container's cgroup, in cores.
+
+    :return: Number of cores allowed, or None when unlimited.
+    """
+    cpu_max = _read("/sys/fs/cgroup/cpu.max")
+    if cpu_max:
+        quota, _, period = cpu_max.partition(" ")
+        if quota != "max" and period:
+            return int(quota) / int(period)
+        return None
+
+    quota = _read("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")
+    period = _read("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+
+def available_cpus() -> int:
+    """
+    Return the number of CPUs this process may actually use.
+
+    :return: CPU count limited by affinity and cgroup quota.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = cgroup_cpu_quota()
+    if quota:
+        cpus = min(cpus, math.ceil(quota))
+    return max(cpus, 1)
+
+
+def worker_count() -> int:
+    """
+    Return the number of workers to run.
+
+    WEB_CONCURRENCY wins when set; otherwise async workers are sized at
+    WEB_WORKERS_PER_CORE per available CPU, capped by WEB_MAX_WORKERS.
+
+    :return: Number of worker processes.
+    """
+    if WEB_CONCURRENCY > 0:
+        return WEB_CONCURRENCY
+    workers = max(int(available_cpus() * WEB_WORKERS_PER_CORE), 1)
+    if WEB_MAX_WORKERS > 0:
+        workers = min(workers, WEB_MAX_WORKERS)
+    return workers
+
+
+def post_fork(server: Any, worker: Any) -> None:
+    """
+    Gunicorn hook: discard connections inherited from the master.
+    """
+    from db.registry import registry
+
+    registry.after_fork()
+
+
+def prepare_metrics_dir(workers: int) -> None:
+    """
+    Give multiple workers a fresh shared directory for metrics snapshots.
+
+    Uses METRICS_MULTIPROC_DIR when set, removing a previous run's
+    snapshot files from it, otherwise a new temporary directory that is
+    deleted when the master exits. Runs in the master before the app is
+    imported so every worker sees the same setting.
+
+    :param workers: Number of worker processes.
+    :raises SystemExit: If METRICS_MULTIPROC_DIR holds other files.
+    """
+    directory = os.environ.get("METRICS_MULTIPROC_DIR")
+    if not directory:
+        if workers <= 1:
+            return
+        directory = tempfile.mkdtemp(prefix="metrics-")
+        os.environ["METRICS_MULTIPROC_DIR"] = directory
+        atexit.register(_remove_metrics_dir, directory, os.getpid())
+        return
+    os.makedirs(directory, exist_ok=True)
+    names = os.listdir(directory)
+    foreign = [name for name in names if not SNAPSHOT_FILE.match(name)]
+    if foreign:
+        raise SystemExit(
+            f"METRICS_MULTIPROC_DIR {directory} contains files that are not "
+            f"metrics snapshots ({', '.join(sorted(foreign)[:5])}); "
+            "point it at an empty directory"
+        )
+    for name in names:
+        os.remove(os.path.join(directory, name))
+
+
+def _remove_metrics_dir(directory: str, master_pid: int) -> None:
+    """
+    atexit hook deleting the temporary metrics directory, in the master
+    only: forked workers inherit the hook and exit earlier.
+    """
+    if os.getpid() == master_pid:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def gunicorn_options(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Build the gunicorn settings for the parsed arguments.
+
+    :param args: Parsed command line arguments.
+    :return: Gunicorn settings.
+    """
+    options = {
+        "bind": args.bind,
+        "workers": args.workers,
+        "worker_class": "src.commands.serve.UvicornWorker",
+        "preload_app": args.preload,
+        "timeout": WEB_TIMEOUT,
+        "graceful_timeout": WEB_GRACEFUL_TIMEOUT,
+        "keepalive": WEB_KEEPALIVE,
+        "max_requests": WEB_MAX_REQUESTS,
+        "max_requests_jitter": WEB_MAX_REQUESTS_JITTER,
+        "post_fork": post_fork,
+        "accesslog": "-",
+        "errorlog": "-",
+    }
+    if os.path.isdir("/dev/shm"):
+        options["worker_tmp_dir"] = "/dev/shm"
+    return options
+
+
+def run_gunicorn(options: Dict[str, Any]) -> None:
+    """
+    Run gunicorn in this process with the given settings.
+
+    :param options: Gunicorn settings.
+    """
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self) -> None:
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self) -> Any:
+            from src.main import app
+
+            return app
+
+    Application().run()
+
+
+def main() -> None:
+    """
+    Parse arguments and start the server.
+    """
+    parser = argparse.ArgumentParser(description="Run the API server")
+    parser.add_argument("--bind", default=WEB_BIND)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--preload", action="store_true", default=WEB_PRELOAD,
+        help="Import the app once in the master before forking workers",
+    )
+    parser.add_argument(
+        "--reload", action="store_true",
+        help="Single process with auto-reload, for development",
+    )
+    args = parser.parse_args()
+
+    if args.reload:
+        import uvicorn
+
+        host, _, port = args.bind.rpartition(":")
+        uvicorn.run(
+            APP, host=host, port=int(port), reload=True, loop=LOOP, http=HTTP
+        )
+        return
+
+    args.workers = args.workers or worker_count()
+    print(
+        f"Starting {args.workers} worker(s) on {args.bind} "
+        f"(cpus={available_cpus()}, loop={LOOP}, http={HTTP}, "
+        f"preload={args.preload})"
+    )
+    os.environ["WEB_WORKERS"] = str(args.workers)
+    prepare_metrics_dir(args.workers)
+    run_gunicorn(gunicorn_options(args))
+
+
+if __name__ == "__main__":
+    main()
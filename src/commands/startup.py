@@ -0,0 +1,183 @@
+"""
+Startup time report
+
+Usage:
+    python -m src.commands.startup [--top N] [--json] [--budget-ms MS]
+
+Imports the application in a fresh interpreter with `-X importtime`,
+reports the slowest modules and packages, then measures the time from
+interpreter start to the first request served through an in-process
+ASGI client. The app's lifespan startup runs, and is timed, before the
+request, as it would under a server. With `--budget-ms` the command
+exits non-zero when time to first request exceeds the budget, so
+regressions fail CI.
+"""
+
+import sys
+import json
+import argparse
+import subprocess
+
+from typing import Any
+from typing import Dict
+from typing import List
+from collections import defaultdict
+
+
+FIRST_REQUEST_SCRIPT = """
+import time
+start = time.perf_counter()
+import json
+import asyncio
+import importlib
+import httpx
+tooling = time.perf_counter() - start
+module_name, attribute = {target!r}.split(":")
+begin = time.perf_counter()
+app = getattr(importlib.import_module(module_name), attribute)
+imported = time.perf_counter()
+
+
+async def request():
+    # ASGITransport does not send lifespan events; run them around it.
+    async with app.router.lifespan_context(app):
+        started = time.perf_counter()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://startup"
+        ) as client:
+            status = (await client.get({path!r})).status_code
+        served = time.perf_counter()
+    return status, started, served
+
+
+status, started, served = asyncio.run(request())
+print(json.dumps({{
+    "status": status,
+    "import_ms": (imported - begin) * 1000,
+    "lifespan_ms": (started - imported) * 1000,
+    "first_request_ms": (served - started) * 1000,
+    "time_to_first_request_ms": (served - begin) * 1000,
+}}))
+"""
+
+
+def profile_imports(module: str) -> List[Dict[str, Any]]:
+    """
+    Import a module in a fresh interpreter and collect `-X importtime` data.
+
+    :param module: Dotted module name to import.
+    :return: One entry per imported module with self and cumulative
+        microseconds.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append({
+            "module": name.strip(),
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+        })
+    return entries
+
+
+def group_by_package(entries: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Sum self import time per top-level package.
+
+    :param entries: Entries returned by `profile_imports`.
+    :return: Mapping of package name to microseconds.
+    """
+    packages: Dict[str, int] = defaultdict(int)
+    for entry in entries:
+        packages[entry["module"].split(".")[0]] += entry["self_us"]
+    return dict(packages)
+
+
+def measure_first_request(target: str, path: str) -> Dict[str, Any]:
+    """
+    Measure import time and first-request latency in a fresh interpreter.
+
+    :param target: Application import path, 'module:attribute'.
+    :param path: URL path of the first request.
+    :return: Timings in milliseconds and the response status.
+    """
+    script = FIRST_REQUEST_SCRIPT.format(target=target, path=path)
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"First request failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    """
+    Run the startup report.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--app", default="src.main:app")
+    parser.add_argument("--path", default="/openapi.json")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--budget-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    entries = profile_imports(args.app.split(":")[0])
+    packages = group_by_package(entries)
+    timings = measure_first_request(args.app, args.path)
+
+    slowest = sorted(entries, key=lambda e: e["self_us"], reverse=True)
+    heaviest = sorted(packages.items(), key=lambda p: p[1], reverse=True)
+
+    if args.json:
+        print(json.dumps({
+            "modules": slowest[:args.top],
+            "packages": dict(heaviest[:args.top]),
+            "total_import_us": sum(e["self_us"] for e in entries),
+            **timings,
+        }, indent=2))
+    else:
+        print(f"{'self ms':>10}  {'cum ms':>10}  module")
+        for entry in slowest[:args.top]:
+            print(
+                f"{entry['self_us'] / 1000:>10.1f}  "
+                f"{entry['cumulative_us'] / 1000:>10.1f}  {entry['module']}"
+            )
+        print(f"\n{'self ms':>10}  package")
+        for package, self_us in heaviest[:args.top]:
+            print(f"{self_us / 1000:>10.1f}  {package}")
+        print(
+            f"\nmodules imported:         {len(entries)}"
+            f"\nimport time:              {timings['import_ms']:.1f} ms"
+            f"\nlifespan startup:         {timings['lifespan_ms']:.1f} ms"
+            f"\nfirst request ({args.path}): "
+            f"{timings['first_request_ms']:.1f} ms "
+            f"(status {timings['status']})"
+            f"\ntime to first request:    "
+            f"{timings['time_to_first_request_ms']:.1f} ms"
+        )
+
+    if args.budget_ms is not None:
+        if timings["time_to_first_request_ms"] > args.budget_ms:
+            print(
+                f"Startup budget exceeded: "
+                f"{timings['time_to_first_request_ms']:.1f} ms > "
+                f"{args.budget_ms:.1f} ms",
+                file=sys.stderr,
+            )
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Job queue worker
+
+Usage:
+    python -m src.commands.worker [--queue NAME] [--concurrency N]
+                                  [--tasks module[,module...]]
+
+Imports the task modules, then consumes the queue until SIGINT/SIGTERM,
+finishing the jobs already running before exiting.
+"""
+
+import signal
+import asyncio
+import logging
+import argparse
+import importlib
+
+from db.registry import registry
+from libs.environs import env
+from utils.queues.queue import QUEUE_NAME
+from utils.queues.queue import JobQueue
+from utils.queues.worker import Worker
+from utils.queues.worker import QUEUE_CONCURRENCY
+
+
+QUEUE_TASK_MODULES = env.str("QUEUE_TASK_MODULES", default="src.tasks")
+
+
+async def run(worker: Worker) -> None:
+    """
+    Run the worker with signal handlers installed, then close backends.
+
+    :param worker: Worker to run.
+    """
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    try:
+        await worker.run()
+    finally:
+        await registry.shutdown()
+
+
+def main() -> None:
+    """
+    Parse arguments and start the worker.
+    """
+    parser = argparse.ArgumentParser(description="Job queue worker")
+    parser.add_argument("--queue", default=QUEUE_NAME)
+    parser.add_argument("--concurrency", type=int, default=QUEUE_CONCURRENCY)
+    parser.add_argument("--tasks", default=QUEUE_TASK_MODULES)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    for module in filter(None, args.tasks.split(",")):
+        importlib.import_module(module.strip())
+
+    worker = Worker(JobQueue(args.queue), concurrency=args.concurrency)
+    asyncio.run(run(worker))
+
+
+if __name__ == "__main__":
+    main()
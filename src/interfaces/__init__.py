@@ -6,4 +6,5 @@ from .scheme import * # noqa
 from .service import * # noqa
 from .response import * # noqa
 from .interface import * # noqa
+from .mongo import * # noqa
 from .repository import * # noqa
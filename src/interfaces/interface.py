@@ -2,10 +2,15 @@
 Dynamic databae abstraction
 """
 
+from typing import Any
+from typing import Dict
 from typing import List
 from typing import TypeVar
 from typing import Generic
 from typing import Optional
+from typing import Sequence
+
+from datetime import datetime
 
 from abc import ABC
 from abc import abstractmethod
@@ -72,6 +77,8 @@ class IRepository(Generic[T], ABC):
         skip: int = 0,
         limit: int = 50,
         order_by: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
     ) -> List[T]:
         """
         Retrieve all entity instances with optional pagination and sorting.
@@ -79,6 +86,8 @@ class IRepository(Generic[T], ABC):
         :param skip: Number of records to skip (default 0).
         :param limit: Maximum number of records to return (default 50).
         :param order_by: Optional field name to order results by.
+        :param created_from: Only instances created at or after this time.
+        :param created_to: Only instances created before this time.
         :return: List of entity instances.
         """
         ...
@@ -104,6 +113,42 @@ class IRepository(Generic[T], ABC):
         """
         ...
 
+    @abstractmethod
+    async def upsert(
+        self,
+        values: Dict[str, Any],
+        index_elements: Sequence[str],
+        update_fields: Optional[Sequence[str]] = None,
+    ) -> T:
+        """
+        Atomically insert an entity or update the one with the same key.
+
+        :param values: Field values of the entity.
+        :param index_elements: Fields forming the unique key to match on.
+        :param update_fields: Fields to overwrite on conflict; defaults to
+            every field not in the key. An empty list leaves an existing
+            entity untouched.
+        :return: The inserted or updated entity instance.
+        """
+        ...
+
+    @abstractmethod
+    async def bulk_upsert(
+        self,
+        rows: Sequence[Dict[str, Any]],
+        index_elements: Sequence[str],
+        update_fields: Optional[Sequence[str]] = None,
+    ) -> List[T]:
+        """
+        Atomically insert or update many entities sharing the same key fields.
+
+        :param rows: Field values of each entity.
+        :param index_elements: Fields forming the unique key to match on.
+        :param update_fields: Fields to overwrite on conflict, as in `upsert`.
+        :return: The inserted or updated entity instances.
+        """
+        ...
+
     @abstractmethod
     async def exists(self, **kwargs) -> bool:
         """
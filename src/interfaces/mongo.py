@@ -0,0 +1,450 @@
+"""
+Mongo Repository
+"""
+
+import copy
+
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Type
+from typing import Tuple
+from typing import TypeVar
+from typing import Generic
+from typing import Optional
+from typing import Sequence
+from typing import TYPE_CHECKING
+
+from datetime import datetime
+
+from src.interfaces.interface import IRepository
+
+if TYPE_CHECKING:
+    from pymongo import IndexModel
+    from motor.motor_asyncio import AsyncIOMotorDatabase
+    from motor.motor_asyncio import AsyncIOMotorCollection
+
+
+T = TypeVar("T")
+
+
+class MongoRepository(IRepository[T], Generic[T]):
+    """
+    Repository implementation of IRepository interface for MongoDB via Motor.
+
+    Documents are returned as plain dicts unless a model class is given, in
+    which case each document is passed to it as keyword arguments. The `id`
+    filter key is accepted as an alias of `_id` so services written against
+    BaseRepository work unchanged.
+
+    Subclasses that set `collection_name` are registered for index
+    bootstrapping; `indexes` lists the IndexModel entries they require.
+
+    pymongo is imported inside the write methods so that importing the
+    interfaces package does not load the Mongo driver.
+    """
+
+    collection_name: Optional[str] = None
+    indexes: List["IndexModel"] = []
+
+    _registry: List[Type["MongoRepository"]] = []
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        """
+        Register concrete repositories for index bootstrapping.
+        """
+        super().__init_subclass__(**kwargs)
+        if cls.collection_name:
+            MongoRepository._registry.append(cls)
+
+    def __init__(
+        self,
+        collection: "AsyncIOMotorCollection",
+        model: Type[T] = dict,
+        projection: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        Initialize the repository with a Motor collection and model.
+
+        :param collection: Motor collection holding the documents.
+        :param model: Class documents are converted to (default: dict).
+        :param projection: Default projection applied to every read.
+        """
+        self.collection = collection
+        self.model = model
+        self.projection = projection
+
+    def project(
+        self, projection: Optional[Dict[str, Any]]
+    ) -> "MongoRepository[T]":
+        """
+        Return a copy of the repository that reads with another projection.
+
+        :param projection: Projection to apply, or None for whole documents.
+        :return: Repository sharing the collection with the new projection.
+        """
+        repository = copy.copy(self)
+        repository.projection = projection
+        return repository
+
+    async def ensure_indexes(self) -> List[str]:
+        """
+        Create the declared indexes if they do not exist yet.
+
+        :return: Names of the indexes on the collection.
+        """
+        if not self.indexes:
+            return []
+        return await self.collection.create_indexes(self.indexes)
+
+    @classmethod
+    async def bootstrap_indexes(cls, db: "AsyncIOMotorDatabase") -> None:
+        """
+        Create indexes for every registered repository. Meant for startup.
+
+        :param db: Motor database the repositories live in.
+        """
+        for repository_class in cls._registry:
+            repository = repository_class(db[repository_class.collection_name])
+            await repository.ensure_indexes()
+
+    def _to_model(self, document: Optional[Dict[str, Any]]) -> Optional[T]:
+        """
+        Convert a raw document into the repository model.
+
+        :param document: Document returned by the driver, or None.
+        :return: Model instance, or None.
+        """
+        if document is None or self.model is dict:
+            return document
+        return self.model(**document)
+
+    @staticmethod
+    def _to_document(obj_in: Any) -> Dict[str, Any]:
+        """
+        Convert input data into a document.
+
+        :param obj_in: Input data as dict, Pydantic model or plain object.
+        :return: Document dict.
+        """
+        if isinstance(obj_in, dict):
+            return dict(obj_in)
+        if hasattr(obj_in, "model_dump"):
+            return obj_in.model_dump(by_alias=True, exclude_unset=True)
+        return dict(obj_in.__dict__)
+
+    @staticmethod
+    def _filter(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build a query filter, mapping `id` to `_id`.
+
+        :param kwargs: Filtering criteria as key-value pairs.
+        :return: Mongo query filter.
+        """
+        query = dict(kwargs)
+        if "id" in query and "_id" not in query:
+            query["_id"] = query.pop("id")
+        return query
+
+    @staticmethod
+    def _parse_order_by(order_by: str) -> List[Tuple[str, int]]:
+        """
+        Parse 'field asc' / 'field desc' into a Mongo sort spec.
+
+        :param order_by: Sorting string.
+        :return: Sort specification for the driver.
+        """
+        parts = order_by.strip().split()
+        direction = parts[1].lower() if len(parts) > 1 else "asc"
+        return [(parts[0], -1 if direction == "desc" else 1)]
+
+    async def create(self, obj_in: Any, **kwargs: Any) -> T:
+        """
+        Insert a new document.
+
+        :param obj_in: Input data as dict or model instance.
+        :param kwargs: Additional fields to store on the document.
+        :return: The created model instance.
+        """
+        document = {**self._to_document(obj_in), **kwargs}
+        result = await self.collection.insert_one(document)
+        document["_id"] = result.inserted_id
+        return self._to_model(document)
+
+    async def bulk_create(self, objs_in: Sequence[Any]) -> List[T]:
+        """
+        Insert many documents in a single unordered bulk write.
+
+        :param objs_in: Input data as dicts or model instances.
+        :return: The created model instances.
+        """
+        from pymongo import InsertOne
+
+        documents = [self._to_document(obj) for obj in objs_in]
+        if not documents:
+            return []
+        await self.collection.bulk_write(
+            [InsertOne(document) for document in documents],
+            ordered=False,
+        )
+        return [self._to_model(document) for document in documents]
+
+    async def update(self, obj_current: T, obj_in: Any) -> T:
+        """
+        Update an existing document and return its new state.
+
+        :param obj_current: Current model instance or document to update.
+        :param obj_in: Input data as dict or model instance containing new
+            values.
+        :return: The updated model instance.
+        :raises ValueError: If the document no longer exists.
+        """
+        from pymongo import ReturnDocument
+
+        current = self._to_document(obj_current)
+        update_data = self._to_document(obj_in)
+        update_data.pop("_id", None)
+        document = await self.collection.find_one_and_update(
+            {"_id": current["_id"]},
+            {"$set": update_data},
+            projection=self.projection,
+            return_document=ReturnDocument.AFTER,
+        )
+        if document is None:
+            raise ValueError("Record not found")
+        return self._to_model(document)
+
+    async def bulk_update(
+        self,
+        updates: Sequence[Tuple[Dict[str, Any], Dict[str, Any]]],
+    ) -> int:
+        """
+        Apply many `$set` updates in a single unordered bulk write.
+
+        :param updates: Pairs of (filter criteria, fields to set).
+        :return: Number of modified documents.
+        """
+        from pymongo import UpdateOne
+
+        if not updates:
+            return 0
+        result = await self.collection.bulk_write(
+            [
+                UpdateOne(self._filter(criteria), {"$set": values})
+                for criteria, values in updates
+            ],
+            ordered=False,
+        )
+        return result.modified_count
+
+    async def get(self, **kwargs: Any) -> Optional[T]:
+        """
+        Retrieve a single document matching the filter criteria.
+
+        :param kwargs: Filtering criteria as key-value pairs.
+        :return: Model instance if found, else None.
+        """
+        document = await self.collection.find_one(
+            self._filter(kwargs), self.projection
+        )
+        return self._to_model(document)
+
+    async def delete(self, **kwargs: Any) -> None:
+        """
+        Delete a single document matching the filter criteria.
+
+        :param kwargs: Filtering criteria as key-value pairs.
+        :raises ValueError: If no document is found to delete.
+        """
+        result = await self.collection.delete_one(self._filter(kwargs))
+        if result.deleted_count == 0:
+            raise ValueError("Record not found")
+
+    async def all(
+        self,
+        skip: int = 0,
+        limit: int = 50,
+        order_by: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ) -> List[T]:
+        """
+        Retrieve all documents with pagination and optional sorting.
+
+        :param skip: Number of documents to skip.
+        :param limit: Maximum number of documents to return.
+        :param order_by: Optional sorting string, e.g., 'field_name asc' or
+            'field_name desc'.
+        :param created_from: Only documents created at or after this time.
+        :param created_to: Only documents created before this time.
+        :return: List of model instances.
+        """
+        query: Dict[str, Any] = {}
+        if created_from is not None:
+            query.setdefault("created_at", {})["$gte"] = created_from
+        if created_to is not None:
+            query.setdefault("created_at", {})["$lt"] = created_to
+        cursor = (
+            self.collection.find(query, self.projection)
+            .skip(skip).limit(limit)
+        )
+        if order_by:
+            cursor = cursor.sort(self._parse_order_by(order_by))
+        documents = await cursor.to_list(length=limit)
+        return [self._to_model(document) for document in documents]
+
+    async def filter(self, **kwargs: Any) -> List[T]:
+        """
+        Retrieve documents matching specific filter criteria.
+
+        :param kwargs: Filtering criteria as key-value pairs.
+        :return: List of matching model instances.
+        """
+        cursor = self.collection.find(self._filter(kwargs), self.projection)
+        documents = await cursor.to_list(length=None)
+        return [self._to_model(document) for document in documents]
+
+    async def get_or_create(self, obj_in: Any, **kwargs: Any) -> T:
+        """
+        Retrieve a document if it exists; otherwise, create a new one.
+
+        Runs as a single `$setOnInsert` upsert; a unique index on the
+        filter fields keeps concurrent callers from inserting duplicates.
+
+        :param obj_in: Input data to create if document does not exist.
+        :param kwargs: Filtering criteria to check existence.
+        :return: Existing or newly created model instance.
+        """
+        return await self.upsert(
+            {**self._to_document(obj_in), **kwargs},
+            index_elements=list(kwargs),
+            update_fields=[],
+        )
+
+    def _upsert_operation(
+        self,
+        values: Dict[str, Any],
+        index_elements: Sequence[str],
+        update_fields: Optional[Sequence[str]],
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Split values into the filter and update documents of an upsert.
+
+        :param values: Field values of the document.
+        :param index_elements: Fields forming the unique key.
+        :param update_fields: Fields to overwrite on conflict.
+        :return: Pair of (filter, update) documents.
+        """
+        criteria = self._filter({key: values[key] for key in index_elements})
+        document = self._filter(values)
+        if update_fields is None:
+            update_fields = [key for key in document if key not in criteria]
+        else:
+            update_fields = list(self._filter(dict.fromkeys(update_fields)))
+        update: Dict[str, Any] = {}
+        to_set = {
+            key: document[key] for key in update_fields if key in document
+        }
+        on_insert = {
+            key: value for key, value in document.items()
+            if key not in to_set and key not in criteria
+        }
+        if to_set:
+            update["$set"] = to_set
+        if on_insert:
+            update["$setOnInsert"] = on_insert
+        return criteria, update or {"$setOnInsert": criteria}
+
+    async def upsert(
+        self,
+        values: Dict[str, Any],
+        index_elements: Sequence[str],
+        update_fields: Optional[Sequence[str]] = None,
+    ) -> T:
+        """
+        Insert a document or update the existing one with `update_one`
+        semantics (`find_one_and_update(upsert=True)`).
+
+        :param values: Field values of the document.
+        :param index_elements: Fields forming the unique key to match on.
+        :param update_fields: Fields to overwrite on conflict; defaults to
+            every field not in the key. An empty list keeps the existing
+            document untouched.
+        :return: The inserted or updated model instance.
+        """
+        from pymongo import ReturnDocument
+
+        criteria, update = self._upsert_operation(
+            values, index_elements, update_fields
+        )
+        document = await self.collection.find_one_and_update(
+            criteria,
+            update,
+            projection=self.projection,
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return self._to_model(document)
+
+    async def bulk_upsert(
+        self,
+        rows: Sequence[Dict[str, Any]],
+        index_elements: Sequence[str],
+        update_fields: Optional[Sequence[str]] = None,
+    ) -> List[T]:
+        """
+        Upsert many documents in a single unordered bulk write, then read
+        them back in one query.
+
+        :param rows: Field values of each document.
+        :param index_elements: Fields forming the unique key to match on.
+        :param update_fields: Fields to overwrite on conflict, as in `upsert`.
+        :return: The inserted or updated model instances.
+        """
+        from pymongo import UpdateOne
+
+        if not rows:
+            return []
+        operations = [
+            self._upsert_operation(row, index_elements, update_fields)
+            for row in rows
+        ]
+        await self.collection.bulk_write(
+            [
+                UpdateOne(criteria, update, upsert=True)
+                for criteria, update in operations
+            ],
+            ordered=False,
+        )
+        cursor = self.collection.find(
+            {"$or": [criteria for criteria, _ in operations]},
+            self.projection,
+        )
+        documents = await cursor.to_list(length=None)
+        return [self._to_model(document) for document in documents]
+
+    async def exists(self, **kwargs: Any) -> bool:
+        """
+        Check if a document exists, reading only its `_id`.
+
+        :param kwargs: Filtering criteria as key-value pairs.
+        :return: True if a matching document exists, False otherwise.
+        """
+        document = await self.collection.find_one(
+            self._filter(kwargs), {"_id": 1}
+        )
+        return document is not None
+
+    async def count(self, **kwargs: Any) -> int:
+        """
+        Count documents matching specific filter criteria.
+
+        Without criteria the collection metadata estimate is used, which
+        avoids scanning the collection.
+
+        :param kwargs: Filtering criteria as key-value pairs.
+        :return: Number of matching documents.
+        """
+        if not kwargs:
+            return await self.collection.estimated_document_count()
+        return await self.collection.count_documents(self._filter(kwargs))
@@ -3,21 +3,43 @@ Base Repository
 """
 
 from typing import Any
+from typing import Dict
 from typing import Type
 from typing import List
 from typing import TypeVar
 from typing import Generic
 from typing import Optional
+from typing import Tuple
+from typing import Sequence
+from typing import AsyncIterator
 
+from datetime import datetime
+from contextlib import asynccontextmanager
+
+from sqlalchemy import func
+from sqlalchemy import inspect
+from sqlalchemy import tuple_
+from sqlalchemy import UniqueConstraint
+from sqlalchemy import PrimaryKeyConstraint
 from sqlalchemy.future import select
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from db.storage.postgres.shards import pinned
+from db.storage.postgres.shards import shard_map
+from db.storage.postgres.shards import merge_sorted
+from db.storage.postgres.shards import assign_shard_keys
 from src.interfaces.interface import IRepository
 
 
 T = TypeVar("T")
 
+UOW_DEPTH = "unit_of_work_depth"
+UOW_UPDATED = "unit_of_work_updated"
+
+# (operation, id, data) of a `batch` operation.
+Operation = Tuple[str, Optional[Any], Optional[Dict[str, Any]]]
+
 
 class BaseRepository(IRepository[T], Generic[T]):
     """
@@ -37,6 +59,150 @@ class BaseRepository(IRepository[T], Generic[T]):
         self.db_session = db_session
         self.model = model
 
+    @property
+    def in_unit_of_work(self) -> bool:
+        """
+        Whether the session is inside a `unit_of_work` block.
+        """
+        return self.db_session.info.get(UOW_DEPTH, 0) > 0
+
+    @asynccontextmanager
+    async def unit_of_work(self) -> AsyncIterator["BaseRepository[T]"]:
+        """
+        Group writes into a single transaction committed once at the end.
+
+        Inside the block `create`, `bulk_create`, `update` and `delete`
+        neither commit nor flush: changes stay pending in the session and
+        are sent in one flush when the block exits. SQLAlchemy batches the
+        inserts of a flush (with RETURNING for server defaults on
+        PostgreSQL) and the updates and deletes per statement shape.
+        Records created in the block get their ids at that point. Updated
+        records are re-read in one SELECT per model afterwards, so
+        server-side `updated_at` values are loaded. Statement-level writes
+        (`bulk_upsert`) execute right away but are not committed.
+
+        An exception leaving the block rolls back everything. The state is
+        kept on the session, so every repository sharing the session joins
+        the same unit of work, and nested blocks join the outermost one.
+
+        :return: Async context manager yielding the repository.
+        :raises SQLAlchemyError: If the final flush or commit fails.
+        """
+        info = self.db_session.info
+        depth = info.get(UOW_DEPTH, 0)
+        if depth == 0:
+            info[UOW_UPDATED] = []
+        info[UOW_DEPTH] = depth + 1
+        try:
+            yield self
+        except BaseException:
+            info[UOW_DEPTH] = depth
+            if depth == 0:
+                info.pop(UOW_UPDATED, None)
+                await self.db_session.rollback()
+            raise
+        info[UOW_DEPTH] = depth
+        if depth > 0:
+            return
+        try:
+            await self.db_session.flush()
+            await self._reload(info.pop(UOW_UPDATED, []))
+            await self.db_session.commit()
+        except SQLAlchemyError as e:
+            await self.db_session.rollback()
+            raise e
+
+    async def _commit(self) -> None:
+        """
+        Commit, unless a unit of work will commit later.
+        """
+        if not self.in_unit_of_work:
+            await self.db_session.commit()
+
+    async def _rollback(self) -> None:
+        """
+        Roll back, unless a unit of work will roll back when it exits.
+        """
+        if not self.in_unit_of_work:
+            await self.db_session.rollback()
+
+    async def _reload(self, records: Sequence[Any]) -> None:
+        """
+        Re-read the server-generated columns of flushed records, one
+        SELECT per model.
+
+        :param records: Records updated in a unit of work.
+        """
+        by_model: Dict[type, Dict[Any, Any]] = {}
+        for record in records:
+            state = inspect(record)
+            if state.persistent:
+                records_by_id = by_model.setdefault(type(record), {})
+                records_by_id[state.identity[0]] = record
+        for model, records_by_id in by_model.items():
+            await self.db_session.execute(
+                select(model)
+                .where(model.id.in_(list(records_by_id)))
+                .execution_options(populate_existing=True)
+            )
+
+    async def batch(
+        self,
+        operations: Sequence[Operation],
+    ) -> List[Optional[T]]:
+        """
+        Apply an ordered list of creates, updates and deletes atomically.
+
+        Records targeted by updates and deletes are loaded with one SELECT,
+        the operations are applied in order within a unit of work, and all
+        changes are sent in a single flush and commit, so the number of
+        round trips does not grow with the number of operations.
+
+        :param operations: (operation, id, data) tuples where operation is
+            'create' (id unused), 'update' or 'delete' (data unused).
+        :return: The created or updated record of each operation, None for
+            deletes.
+        :raises ValueError: If a record is missing, already deleted in the
+            batch, or an operation is unknown; nothing is applied.
+        :raises SQLAlchemyError: If database operation fails.
+        """
+        async with self.unit_of_work():
+            ids = {
+                record_id for op, record_id, _ in operations
+                if op != "create"
+            }
+            records: Dict[Any, T] = {}
+            if ids:
+                result = await self.db_session.execute(
+                    select(self.model).where(self.model.id.in_(list(ids)))
+                )
+                records = {
+                    record.id: record for record in result.scalars().all()
+                }
+
+            results: List[Optional[T]] = []
+            for index, (op, record_id, data) in enumerate(operations):
+                if op == "create":
+                    results.append(await self.create(data))
+                    continue
+                if op not in ("update", "delete"):
+                    raise ValueError(
+                        f"Operation {index}: unknown operation '{op}'"
+                    )
+                record = records.get(record_id)
+                if record is None:
+                    raise ValueError(
+                        f"Operation {index}: {self.model.__name__} "
+                        f"with id {record_id} not found"
+                    )
+                if op == "update":
+                    results.append(await self.update(record, data))
+                else:
+                    await self.db_session.delete(record)
+                    del records[record_id]
+                    results.append(None)
+        return results
+
     async def create(self, obj_in: Any, **kwargs: Any) -> T:
         """
         Create a new record in the database.
@@ -49,12 +215,36 @@ class BaseRepository(IRepository[T], Generic[T]):
         try:
             data = obj_in if isinstance(obj_in, dict) else obj_in.__dict__
             record = self.model(**data, **kwargs)
+            await assign_shard_keys(self.db_session, [record])
             self.db_session.add(record)
+            if self.in_unit_of_work:
+                return record
             await self.db_session.commit()
             await self.db_session.refresh(record)
             return record
         except SQLAlchemyError as e:
-            await self.db_session.rollback()
+            await self._rollback()
+            raise e
+
+    async def bulk_create(self, objs_in: Sequence[Any]) -> List[T]:
+        """
+        Create many records in a single transaction.
+
+        :param objs_in: Input data as dicts or model instances.
+        :return: The created and persisted model instances.
+        :raises SQLAlchemyError: If database operation fails.
+        """
+        try:
+            records = [
+                self.model(**(obj if isinstance(obj, dict) else obj.__dict__))
+                for obj in objs_in
+            ]
+            await assign_shard_keys(self.db_session, records)
+            self.db_session.add_all(records)
+            await self._commit()
+            return records
+        except SQLAlchemyError as e:
+            await self._rollback()
             raise e
 
     async def update(self, obj_current: T, obj_in: Any) -> T:
@@ -71,11 +261,14 @@ class BaseRepository(IRepository[T], Generic[T]):
             for key, value in update_data.items():
                 setattr(obj_current, key, value)
             self.db_session.add(obj_current)
+            if self.in_unit_of_work:
+                self.db_session.info[UOW_UPDATED].append(obj_current)
+                return obj_current
             await self.db_session.commit()
             await self.db_session.refresh(obj_current)
             return obj_current
         except SQLAlchemyError as e:
-            await self.db_session.rollback()
+            await self._rollback()
             raise e
 
     async def get(self, **kwargs: Any) -> Optional[T]:
@@ -107,9 +300,9 @@ class BaseRepository(IRepository[T], Generic[T]):
             if record is None:
                 raise ValueError("Record not found")
             await self.db_session.delete(record)
-            await self.db_session.commit()
+            await self._commit()
         except SQLAlchemyError as e:
-            await self.db_session.rollback()
+            await self._rollback()
             raise e
 
     async def all(
@@ -117,18 +310,32 @@ class BaseRepository(IRepository[T], Generic[T]):
         skip: int = 0,
         limit: int = 50,
         order_by: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
     ) -> List[T]:
         """
         Retrieve all records with pagination and optional sorting.
 
+        Bounds on `created_at` let PostgreSQL skip the partitions of a
+        table partitioned by it that are out of range.
+
         :param skip: Number of records to skip.
         :param limit: Maximum number of records to return.
         :param order_by: Optional sorting string, e.g., 'field_name asc' or 'field_name desc'.
+        :param created_from: Only records created at or after this time.
+        :param created_to: Only records created before this time.
         :return: List of model instances.
         :raises SQLAlchemyError: If database operation fails.
         """
         try:
-            query = select(self.model).offset(skip).limit(limit)
+            query = select(self.model)
+            if created_from is not None:
+                query = query.where(self.model.created_at >= created_from)
+            if created_to is not None:
+                query = query.where(self.model.created_at < created_to)
+            if shard_map(self.db_session) is not None:
+                return await self._all_sharded(query, skip, limit, order_by)
+            query = query.offset(skip).limit(limit)
             if order_by:
                 parts = order_by.strip().split()
                 column_name = parts[0]
@@ -142,6 +349,38 @@ class BaseRepository(IRepository[T], Generic[T]):
         except SQLAlchemyError as e:
             raise e
 
+    async def _all_sharded(
+        self, query: Any, skip: int, limit: int, order_by: Optional[str]
+    ) -> List[T]:
+        """
+        Page through a sharded table.
+
+        Every shard returns its first `skip + limit` records ordered by
+        the sort column and then the id, a key unique across shards; the
+        sorted runs are merged and the page is cut from the merge.
+        """
+        parts = (order_by or "id").strip().split()
+        column_name = parts[0]
+        if getattr(self.model, column_name, None) is None:
+            column_name = "id"
+        descending = len(parts) > 1 and parts[1].lower() == "desc"
+        columns = [getattr(self.model, column_name), self.model.id]
+        query = query.order_by(*(
+            column.desc() if descending else column.asc()
+            for column in columns
+        ))
+        result = await self.db_session.execute(query.limit(skip + limit))
+
+        def key(record: T) -> tuple:
+            value = getattr(record, column_name)
+            # PostgreSQL sorts NULLs last ascending, first descending.
+            return value is None, value, record.id
+
+        records = merge_sorted(
+            result.scalars().all(), key, skip + limit, reverse=descending
+        )
+        return records[skip:]
+
     async def filter(self, **kwargs: Any) -> List[T]:
         """
         Retrieve records matching specific filter criteria.
@@ -162,14 +401,268 @@ class BaseRepository(IRepository[T], Generic[T]):
         """
         Retrieve a record if it exists; otherwise, create a new one.
 
+        When the filter fields are exactly the columns of a unique
+        constraint or index, runs as `INSERT ... ON CONFLICT DO NOTHING`
+        (`INSERT IGNORE` on MySQL), so concurrent callers never insert
+        duplicates. Otherwise there is no conflict to detect, and the
+        record is looked up first and created if missing.
+
         :param obj_in: Input data to create if record does not exist.
         :param kwargs: Filtering criteria to check existence.
         :return: Existing or newly created model instance.
         """
-        record = await self.get(**kwargs)
-        if record:
-            return record
-        return await self.create(obj_in, **kwargs)
+        data = obj_in if isinstance(obj_in, dict) else obj_in.__dict__
+        if not self._is_unique_key(kwargs):
+            record = await self.get(**kwargs)
+            if record is not None:
+                return record
+            return await self.create({**data, **kwargs})
+        return await self.upsert(
+            {**data, **kwargs},
+            index_elements=list(kwargs),
+            update_fields=[],
+        )
+
+    def _is_unique_key(self, columns: Sequence[str]) -> bool:
+        """
+        Check whether `columns` are exactly the columns of a unique
+        constraint or a full (non-partial) unique index of the table.
+
+        :param columns: Column names.
+        :return: True if an upsert can use them as its conflict target.
+        """
+        table = inspect(self.model).local_table
+        wanted = set(columns)
+        keys = [
+            constraint.columns for constraint in table.constraints
+            if isinstance(constraint, (PrimaryKeyConstraint, UniqueConstraint))
+        ]
+        keys += [
+            index.columns for index in table.indexes
+            if index.unique and not any(
+                options.get("where") for options in
+                index.dialect_options.values()
+            )
+        ]
+        return any(
+            wanted == {column.name for column in key} for key in keys
+        )
+
+    async def upsert(
+        self,
+        values: Dict[str, Any],
+        index_elements: Sequence[str],
+        update_fields: Optional[Sequence[str]] = None,
+    ) -> T:
+        """
+        Insert a record or update the existing one in a single statement.
+
+        :param values: Column values of the record.
+        :param index_elements: Columns of the unique index to match on.
+        :param update_fields: Columns to overwrite on conflict; defaults to
+            every column not in the index. An empty list keeps the existing
+            record untouched.
+        :return: The inserted or updated model instance.
+        :raises SQLAlchemyError: If database operation fails.
+        """
+        records = await self.bulk_upsert(
+            [values], index_elements, update_fields
+        )
+        return records[0]
+
+    async def bulk_upsert(
+        self,
+        rows: Sequence[Dict[str, Any]],
+        index_elements: Sequence[str],
+        update_fields: Optional[Sequence[str]] = None,
+    ) -> List[T]:
+        """
+        Insert or update many records in a single statement.
+
+        Uses `INSERT ... ON CONFLICT ... RETURNING` on PostgreSQL and SQLite
+        and `INSERT ... ON DUPLICATE KEY UPDATE` on MySQL, which has no
+        RETURNING and so re-reads the affected rows by key. Keys must be
+        unique within `rows`; records are matched back to rows by key, so
+        they come back in row order.
+
+        :param rows: Column values of each record.
+        :param index_elements: Columns of the unique index to match on.
+        :param update_fields: Columns to overwrite on conflict, as in `upsert`.
+        :return: The inserted or updated model instances.
+        :raises NotImplementedError: If the dialect has no upsert support.
+        :raises SQLAlchemyError: If database operation fails.
+        """
+        if not rows:
+            return []
+        if update_fields is None:
+            update_fields = [
+                key for key in rows[0] if key not in index_elements
+            ]
+        dialect = self.db_session.get_bind().dialect.name
+        shards = shard_map(self.db_session)
+        if shards is not None:
+            return await self._bulk_upsert_sharded(
+                shards, dialect, rows, index_elements, update_fields
+            )
+        try:
+            if dialect in ("postgresql", "sqlite"):
+                records = await self._upsert_returning(
+                    dialect, rows, index_elements, update_fields
+                )
+            elif dialect == "mysql":
+                records = await self._upsert_mysql(
+                    rows, index_elements, update_fields
+                )
+            else:
+                raise NotImplementedError(
+                    f"Upsert is not supported for dialect '{dialect}'"
+                )
+            await self._commit()
+            return records
+        except SQLAlchemyError as e:
+            await self._rollback()
+            raise e
+
+    async def _bulk_upsert_sharded(
+        self,
+        shards: Any,
+        dialect: str,
+        rows: Sequence[Dict[str, Any]],
+        index_elements: Sequence[str],
+        update_fields: Sequence[str],
+    ) -> List[T]:
+        """
+        Upsert each shard's rows with one statement on that shard.
+
+        :raises ValueError: If a row lacks the shard key.
+        """
+        groups = shards.split(inspect(self.model).local_table, rows)
+        try:
+            records: List[T] = []
+            for shard, group in groups.items():
+                with pinned(self.db_session, shard):
+                    records += await self._upsert_returning(
+                        dialect, group, index_elements, update_fields
+                    )
+            await self._commit()
+        except SQLAlchemyError as e:
+            await self._rollback()
+            raise e
+        return self._match_keys(records, rows, index_elements)
+
+    def _update_set(
+        self, update_fields: Sequence[str], source: Any
+    ) -> Dict[str, Any]:
+        """
+        Build the SET clause for the conflict branch of an upsert.
+
+        :param update_fields: Columns to overwrite.
+        :param source: The statement's `excluded` / `inserted` namespace.
+        :return: Mapping of column name to new value.
+        """
+        values = {field: source[field] for field in update_fields}
+        if values and hasattr(self.model, "updated_at"):
+            values.setdefault("updated_at", func.now())
+        return values
+
+    async def _upsert_returning(
+        self,
+        dialect: str,
+        rows: Sequence[Dict[str, Any]],
+        index_elements: Sequence[str],
+        update_fields: Sequence[str],
+    ) -> List[T]:
+        """
+        Upsert with `ON CONFLICT ... RETURNING` (PostgreSQL, SQLite).
+        """
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+
+        stmt = insert(self.model).values(list(rows))
+        if update_fields:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=index_elements,
+                set_=self._update_set(update_fields, stmt.excluded),
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+
+        result = await self.db_session.scalars(
+            stmt.returning(self.model),
+            execution_options={"populate_existing": True},
+        )
+        # RETURNING order is not guaranteed to follow the VALUES order.
+        records = self._match_keys(result.all(), rows, index_elements)
+        if len(records) < len(rows):
+            records = await self._get_by_keys(rows, index_elements)
+        return records
+
+    async def _upsert_mysql(
+        self,
+        rows: Sequence[Dict[str, Any]],
+        index_elements: Sequence[str],
+        update_fields: Sequence[str],
+    ) -> List[T]:
+        """
+        Upsert with `ON DUPLICATE KEY UPDATE` / `INSERT IGNORE` (MySQL).
+        """
+        from sqlalchemy.dialects.mysql import insert
+
+        stmt = insert(self.model).values(list(rows))
+        if update_fields:
+            stmt = stmt.on_duplicate_key_update(
+                self._update_set(update_fields, stmt.inserted)
+            )
+        else:
+            stmt = stmt.prefix_with("IGNORE")
+        await self.db_session.execute(stmt)
+        return await self._get_by_keys(rows, index_elements)
+
+    async def _get_by_keys(
+        self,
+        rows: Sequence[Dict[str, Any]],
+        index_elements: Sequence[str],
+    ) -> List[T]:
+        """
+        Fetch the records matching each row's key, in row order.
+
+        :param rows: Column values containing the key columns.
+        :param index_elements: Key columns.
+        :return: Matching model instances.
+        """
+        columns = [getattr(self.model, name) for name in index_elements]
+        keys = [tuple(row[name] for name in index_elements) for row in rows]
+        result = await self.db_session.execute(
+            select(self.model)
+            .where(tuple_(*columns).in_(keys))
+            .execution_options(populate_existing=True)
+        )
+        return self._match_keys(
+            result.scalars().all(), rows, index_elements
+        )
+
+    @staticmethod
+    def _match_keys(
+        records: Sequence[T],
+        rows: Sequence[Dict[str, Any]],
+        index_elements: Sequence[str],
+    ) -> List[T]:
+        """
+        Order records like the rows with the same key values.
+
+        :param records: Model instances, in any order.
+        :param rows: Column values containing the key columns.
+        :param index_elements: Key columns.
+        :return: Records in row order; rows without a record are skipped.
+        """
+        by_key = {
+            tuple(getattr(record, name) for name in index_elements): record
+            for record in records
+        }
+        keys = [tuple(row[name] for name in index_elements) for row in rows]
+        return [by_key[key] for key in keys if key in by_key]
 
     async def exists(self, **kwargs: Any) -> bool:
         """
@@ -189,6 +682,11 @@ class BaseRepository(IRepository[T], Generic[T]):
         :return: Number of matching records.
         :raises SQLAlchemyError: If database operation fails.
         """
-        query = select(self.model).filter_by(**kwargs)
+        query = (
+            select(func.count())
+            .select_from(self.model)
+            .filter_by(**kwargs)
+        )
         result = await self.db_session.execute(query)
-        return len(result.scalars().all())
+        # A sharded session returns one count per shard queried.
+        return sum(result.scalars().all())
@@ -9,6 +9,7 @@ from typing import Generic
 from typing import TypeVar
 
 from src.interfaces.scheme import BaseScheme
+from utils.middlewares.timing import timed
 
 
 T = TypeVar("T")
@@ -41,6 +42,7 @@ class BaseResponse(Generic[T]):
             return record.dict()
         return record.__dict__
 
+    @timed("serialize")
     def _build_response(
         self,
         status: str,
@@ -61,6 +63,7 @@ class BaseResponse(Generic[T]):
             data=data
         )
 
+    @timed("serialize")
     def success(
         self,
         record: Union[T, List[T], None] = None,
@@ -84,6 +87,7 @@ class BaseResponse(Generic[T]):
             data = None
         return self._build_response("success", msg, data)
 
+    @timed("serialize")
     def error(self, message: str = None) -> "BaseScheme":
         """
         Generate a standardized error response.
@@ -2,20 +2,42 @@
 Base service class for interacting with repositories
 """
 
+from typing import Any
+from typing import Dict
 from typing import List
 from typing import Type
 from typing import TypeVar
 from typing import Generic
+from typing import Optional
+from typing import Iterable
+from typing import Sequence
+from typing import AsyncIterator
+
+from datetime import datetime
+from contextlib import asynccontextmanager
 
 from fastapi import Depends
 
+from sqlalchemy import inspect
+from sqlalchemy.orm.attributes import flag_modified
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.ext.asyncio import AsyncSession
+from src.interfaces.interface import IRepository
+from src.interfaces.repository import Operation
 from src.interfaces.repository import BaseRepository
 
 from db.storage.postgres import get_db
+from utils.buffers.write_behind import write_behind
+from utils.caches.near import near_cache
 
 T = TypeVar("T")
 
+# Session.info key of the ids to invalidate when a unit of work commits.
+NEAR_CACHE_PENDING = "near_cache_pending"
+# Session.info key of the write-behind changes dropped by direct writes of
+# a unit of work, put back if it rolls back.
+WRITE_BEHIND_DROPPED = "write_behind_dropped"
+
 
 class BaseService(Generic[T]):
     """
@@ -25,30 +47,168 @@ class BaseService(Generic[T]):
     Designed to be inherited by concrete service classes for specific entities.
     """
 
-    def __init__(self, db_session: AsyncSession, model: Type[T]):
+    def __init__(
+        self,
+        db_session: AsyncSession,
+        model: Type[T],
+        repository: Optional[IRepository[T]] = None,
+    ):
         """
         Initialize the BaseService with a database session and model.
 
         :param db_session: Async SQLAlchemy session for database access.
         :param model: SQLAlchemy model class representing the entity.
+        :param repository: Optional repository to use instead of the
+            default BaseRepository, e.g. a MongoRepository.
+        """
+        self.repository = repository or BaseRepository[T](db_session, model)
+        self.write_behind = None
+        self.near_cache = None
+        if isinstance(self.repository, BaseRepository):
+            self.write_behind = write_behind.buffer(model)
+            self.near_cache = near_cache.cache(model)
+
+    async def _invalidate(self, *record_ids: Any) -> None:
+        """
+        Drop written records from the near-cache of every worker, or once
+        the unit of work in progress commits.
+
+        :param record_ids: Primary keys of the written records.
+        """
+        if self.near_cache is None:
+            return
+        if self.repository.in_unit_of_work:
+            pending = self.repository.db_session.info.setdefault(
+                NEAR_CACHE_PENDING, {}
+            )
+            pending.setdefault(self.near_cache.table, set()).update(
+                record_ids
+            )
+            return
+        await near_cache.invalidate(self.near_cache.table, record_ids)
+
+    @asynccontextmanager
+    async def _superseding(
+        self, writes: Dict[Any, Iterable[str]], loaded: bool = True
+    ) -> AsyncIterator[None]:
+        """
+        Drop the buffered write-behind changes a direct write overwrites,
+        so a later flush cannot write their older values back over it.
+
+        The changes are put back if the write, or the unit of work it is
+        part of, fails.
+
+        :param writes: Columns about to be written, by primary key.
+        :param loaded: Whether the write sets attributes of records loaded
+            in the session, rather than running a statement.
+        """
+        if self.write_behind is None:
+            yield
+            return
+        dropped = await self.write_behind.discard(writes)
+        if dropped and loaded:
+            self._unmask(dropped)
+        try:
+            yield
+        except BaseException:
+            await self.write_behind.restore(dropped)
+            raise
+        if dropped and self.repository.in_unit_of_work:
+            self.repository.db_session.info.setdefault(
+                WRITE_BEHIND_DROPPED, []
+            ).append((self.write_behind, dropped))
+
+    def _unmask(self, dropped: Dict[Any, Dict[str, Any]]) -> None:
+        """
+        Mark the dropped columns of records loaded in the session as
+        modified. `get_by_id` applied the buffered values to them as if
+        committed, so setting the same value again would not be written.
+        """
+        key = self.write_behind.primary_key.name
+        for record in list(self.repository.db_session.identity_map.values()):
+            if not isinstance(record, self.repository.model):
+                continue
+            loaded = inspect(record).dict
+            for column in dropped.get(loaded.get(key), ()):
+                if column in loaded:
+                    flag_modified(record, column)
+
+    def _upsert_writes(
+        self, rows: Sequence[Dict[str, Any]], index_elements: Sequence[str]
+    ) -> Dict[Any, Iterable[str]]:
+        """
+        Return the columns an upsert overwrites, by primary key, for the
+        rows carrying their primary key.
+        """
+        if self.write_behind is None:
+            return {}
+        key = self.write_behind.primary_key.name
+        return {
+            row[key]: [c for c in row if c not in index_elements]
+            for row in rows if key in row
+        }
+
+    async def _discard_upserted(
+        self,
+        rows: Sequence[Dict[str, Any]],
+        index_elements: Sequence[str],
+        records: Sequence[T],
+    ) -> None:
+        """
+        Drop the buffered changes overwritten by upserted rows matched on
+        another key, whose ids are only known once written.
         """
-        self.repository = BaseRepository[T](db_session, model)
+        if self.write_behind is None:
+            return
+        key = self.write_behind.primary_key.name
+        await self.write_behind.discard({
+            getattr(record, key): [c for c in row if c not in index_elements]
+            for row, record in zip(rows, records) if key not in row
+        })
 
     async def get_by_id(self, record_id: int) -> T:
         """
         Retrieve a record by its primary key ID.
 
+        With NEAR_CACHE_ENABLED the record is served from the worker's
+        near-cache when present, without a query, except inside a unit of
+        work. Records with buffered write-behind changes are not cached.
+
         :param record_id: ID of the record to fetch.
         :return: Model instance if found.
         :raises ValueError: If the record is not found.
         """
-        record = await self.repository.get(id=record_id)
+        record = None
+        epoch = None
+        if (
+            self.near_cache is not None
+            and not self.repository.in_unit_of_work
+        ):
+            record = await self.near_cache.load(
+                self.repository.db_session, record_id
+            )
+            if record is None:
+                epoch = self.near_cache.epoch
+        if record is None:
+            record = await self.repository.get(id=record_id)
         if record is None:
             raise ValueError(f"{self.repository.model.__name__} with id {record_id} not found")
+        pending = {}
+        if self.write_behind is not None:
+            pending = await self.write_behind.pending(record_id)
+            for key, value in pending.items():
+                set_committed_value(record, key, value)
+        if epoch is not None and not pending:
+            self.near_cache.put(record, epoch)
         return record
 
     async def get_all(
-        self, skip: int = 0, limit: int = 50, order_by: str = None
+        self,
+        skip: int = 0,
+        limit: int = 50,
+        order_by: str = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
     ) -> List[T]:
         """
         Retrieve all records with optional pagination and sorting.
@@ -56,9 +216,17 @@ class BaseService(Generic[T]):
         :param skip: Number of records to skip (default 0).
         :param limit: Maximum number of records to return (default 50).
         :param order_by: Optional field name to order results by.
+        :param created_from: Only records created at or after this time.
+        :param created_to: Only records created before this time.
         :return: List of model instances.
         """
-        return await self.repository.all(skip=skip, limit=limit, order_by=order_by)
+        return await self.repository.all(
+            skip=skip,
+            limit=limit,
+            order_by=order_by,
+            created_from=created_from,
+            created_to=created_to,
+        )
 
     async def create(self, **kwargs) -> T:
         """
@@ -67,18 +235,107 @@ class BaseService(Generic[T]):
         :param kwargs: Data to create the new record.
         :return: Created model instance.
         """
-        return await self.repository.create(obj_in=kwargs)
+        record = await self.repository.create(obj_in=kwargs)
+        await self._invalidate(getattr(record, "id", None))
+        return record
+
+    async def bulk_create(self, rows: Sequence[Dict[str, Any]]) -> List[T]:
+        """
+        Create many records in a single transaction.
+
+        :param rows: Data of each record to create.
+        :return: Created model instances.
+        """
+        records = await self.repository.bulk_create(rows)
+        await self._invalidate(*(getattr(r, "id", None) for r in records))
+        return records
+
+    @asynccontextmanager
+    async def unit_of_work(self) -> AsyncIterator[Any]:
+        """
+        Group the service's writes into one transaction committed at the end.
+
+        Usage:
+            async with service.unit_of_work():
+                await service.create(name="a")
+                await service.update(1, name="b")
+
+        :return: Async context manager of the repository's unit of work.
+        """
+        info = self.repository.db_session.info
+        try:
+            async with self.repository.unit_of_work() as repository:
+                yield repository
+        except BaseException:
+            if not self.repository.in_unit_of_work:
+                for buffer, dropped in info.pop(WRITE_BEHIND_DROPPED, []):
+                    await buffer.restore(dropped)
+            raise
+        finally:
+            if not self.repository.in_unit_of_work:
+                info.pop(WRITE_BEHIND_DROPPED, None)
+            if (
+                self.near_cache is not None
+                and not self.repository.in_unit_of_work
+            ):
+                pending = info.pop(NEAR_CACHE_PENDING, {})
+                for table, record_ids in pending.items():
+                    await near_cache.invalidate(table, record_ids)
+
+    async def batch(
+        self,
+        operations: Sequence[Operation],
+    ) -> List[Optional[T]]:
+        """
+        Apply ordered create/update/delete operations in one transaction.
+
+        :param operations: (operation, id, data) tuples.
+        :return: The created or updated record of each operation, None
+            for deletes.
+        :raises ValueError: If an operation targets a missing record.
+        """
+        writes = {
+            record_id: data for op, record_id, data in operations
+            if op == "update"
+        }
+        async with self._superseding(writes):
+            results = await self.repository.batch(operations)
+        await self._invalidate(
+            *(record_id for op, record_id, _ in operations if op != "create"),
+            *(getattr(r, "id", None) for r in results if r is not None),
+        )
+        return results
 
     async def update(self, record_id: int, **kwargs) -> T:
         """
         Update an existing record by its ID.
 
+        Updates touching only columns designated in WRITE_BEHIND_FIELDS
+        are buffered and written later in coalesced batches, unless made
+        inside a unit of work; the returned record already carries them.
+        Other updates drop the buffered changes of the columns they write.
+
         :param record_id: ID of the record to update.
         :param kwargs: Fields and values to update.
         :return: Updated model instance.
         """
         record = await self.get_by_id(record_id)
-        return await self.repository.update(obj_current=record, obj_in=kwargs)
+        if (
+            self.write_behind is not None
+            and self.write_behind.accepts(kwargs)
+            and not self.repository.in_unit_of_work
+        ):
+            await self.write_behind.add(record_id, kwargs)
+            for key, value in kwargs.items():
+                set_committed_value(record, key, value)
+            await self._invalidate(record_id)
+            return record
+        async with self._superseding({record_id: kwargs}):
+            record = await self.repository.update(
+                obj_current=record, obj_in=kwargs
+            )
+        await self._invalidate(record_id)
+        return record
 
     async def delete(self, record_id: int) -> dict:
         """
@@ -88,6 +345,7 @@ class BaseService(Generic[T]):
         :return: Dictionary with a deletion success message.
         """
         await self.repository.delete(id=record_id)
+        await self._invalidate(record_id)
         return {"message": f"{self.repository.model.__name__} with id {record_id} deleted successfully"}
 
     async def get_or_create(self, **kwargs) -> T:
@@ -99,6 +357,42 @@ class BaseService(Generic[T]):
         """
         return await self.repository.get_or_create(obj_in=kwargs, **kwargs)
 
+    async def upsert(self, index_elements: Sequence[str], **kwargs) -> T:
+        """
+        Atomically create a record or update the one with the same key.
+
+        :param index_elements: Fields of the unique key to match on.
+        :param kwargs: Field values of the record.
+        :return: Created or updated model instance.
+        """
+        async with self._superseding(
+            self._upsert_writes([kwargs], index_elements), loaded=False
+        ):
+            record = await self.repository.upsert(kwargs, index_elements)
+        await self._discard_upserted([kwargs], index_elements, [record])
+        await self._invalidate(getattr(record, "id", None))
+        return record
+
+    async def bulk_upsert(
+        self,
+        rows: Sequence[Dict[str, Any]],
+        index_elements: Sequence[str],
+    ) -> List[T]:
+        """
+        Atomically create or update many records in one statement.
+
+        :param rows: Field values of each record.
+        :param index_elements: Fields of the unique key to match on.
+        :return: Created or updated model instances.
+        """
+        async with self._superseding(
+            self._upsert_writes(rows, index_elements), loaded=False
+        ):
+            records = await self.repository.bulk_upsert(rows, index_elements)
+        await self._discard_upserted(rows, index_elements, records)
+        await self._invalidate(*(getattr(r, "id", None) for r in records))
+        return records
+
     async def exists(self, **kwargs) -> bool:
         """
         Check if a record exists matching the given criteria.
@@ -0,0 +1,5 @@
+"""
+Initialize scheduled jobs
+"""
+
+from .partitions import * # noqa
@@ -0,0 +1,38 @@
+"""
+Partition maintenance jobs
+"""
+
+from db.registry import registry
+from db.storage.postgres.partitions import partitions
+from libs.environs import env
+from utils.schedulers.registry import jobs
+
+
+PARTITION_MAINTENANCE_ENABLED = env.bool(
+    "PARTITION_MAINTENANCE_ENABLED", default=True
+)
+PARTITION_MAINTENANCE_INTERVAL = env.float(
+    "PARTITION_MAINTENANCE_INTERVAL", default=3600.0
+)
+
+
+async def maintain_partitions() -> None:
+    """
+    Pre-create upcoming partitions and expire old ones of every
+    partitioned model, on every shard when sharding is enabled.
+    """
+    if registry.is_enabled("shards"):
+        for engine in registry.get("shards").engines.values():
+            await partitions.maintain(engine)
+        return
+    if not registry.is_enabled("postgres"):
+        return
+    await partitions.maintain(registry.get("postgres"))
+
+
+if PARTITION_MAINTENANCE_ENABLED:
+    jobs.job(
+        "interval",
+        name="partitions.maintain",
+        seconds=PARTITION_MAINTENANCE_INTERVAL,
+    )(maintain_partitions)
@@ -0,0 +1,261 @@
+"""
+Application lifespan
+
+Startup opens the datastore clients, warms their connection pools and
+starts the background services; shutdown drains in-flight requests, stops
+the background services and closes every pool.
+"""
+
+import time
+import signal
+import asyncio
+import logging
+import threading
+
+from typing import Any
+from typing import Dict
+from typing import AsyncIterator
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+
+from db.registry import registry
+from libs.environs import env
+from utils.probes.readiness import readiness
+from utils.buffers.write_behind import write_behind
+from utils.caches.near import near_cache
+from utils.middlewares.drain import tracker
+from utils.metrics.multiprocess import exporter
+from utils.schedulers.scheduler import scheduler
+
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = env.bool("WARMUP_ENABLED", default=True)
+WARMUP_CONNECTIONS = env.int("WARMUP_CONNECTIONS", default=2)
+# Per backend overrides, e.g. 'postgres=5,redis_async=4'.
+WARMUP_BACKEND_CONNECTIONS = env.dict(
+    "WARMUP_BACKEND_CONNECTIONS", default={}, subcast_values=int
+)
+WARMUP_TIMEOUT = env.float("WARMUP_TIMEOUT", default=10.0)
+DRAIN_DELAY = env.float("DRAIN_DELAY", default=0.0)
+DRAIN_TIMEOUT = env.float("DRAIN_TIMEOUT", default=20.0)
+
+
+async def warm_sql(name: str, count: int) -> None:
+    """
+    Open `count` pooled connections of a SQL backend at once and prime
+    them, then return them to the pool.
+
+    Each connection runs the statements of the hot repository reads of
+    every PostgreSQL model, so asyncpg's type introspection and its
+    per-connection prepared statement cache are done before traffic.
+    """
+    await warm_engine(registry.get(name), count, name)
+
+
+async def warm_engine(engine: Any, count: int, name: str) -> None:
+    """
+    Open and prime `count` pooled connections of an engine.
+    """
+    pool = engine.sync_engine.pool
+    if hasattr(pool, "size"):
+        count = min(count, pool.size())
+    connections = await asyncio.gather(
+        *(engine.connect() for _ in range(count)), return_exceptions=True
+    )
+    try:
+        errors = [c for c in connections if isinstance(c, BaseException)]
+        if errors:
+            raise errors[0]
+        await asyncio.gather(
+            *(prime(name, connection) for connection in connections)
+        )
+    finally:
+        for connection in connections:
+            if not isinstance(connection, BaseException):
+                await connection.close()
+
+
+async def prime(name: str, connection: Any) -> None:
+    """
+    Run the hot statements of every model on a connection.
+    """
+    await connection.exec_driver_sql("SELECT 1")
+    if name != "postgres":
+        return
+
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    from db.storage.postgres import Base
+    from src.interfaces.repository import BaseRepository
+
+    async with AsyncSession(bind=connection) as session:
+        for mapper in Base.registry.mappers:
+            if "id" not in mapper.columns:
+                continue
+            repository = BaseRepository(session, mapper.class_)
+            await repository.get(id=0)
+            await repository.all(skip=0, limit=1, order_by="id")
+
+
+async def warm_shards(name: str, count: int) -> None:
+    """
+    Warm the pool of every shard.
+    """
+    shards = registry.get(name)
+    await asyncio.gather(*(
+        warm_engine(engine, count, "postgres")
+        for engine in shards.engines.values()
+    ))
+
+
+async def warm_redis(name: str, count: int) -> None:
+    """
+    Open `count` connections of a Redis client with concurrent PINGs.
+    """
+    client = registry.get(name)
+    if name == "redis":
+        await asyncio.to_thread(client.ping)
+        return
+    await asyncio.gather(*(client.ping() for _ in range(count)))
+
+
+async def warm_mongo(name: str, count: int) -> None:
+    """
+    Connect the MongoDB client to its deployment.
+    """
+    await registry.get(name).client.admin.command("ping")
+
+
+WARMERS = {
+    "postgres": warm_sql,
+    "mysql": warm_sql,
+    "shards": warm_shards,
+    "redis": warm_redis,
+    "redis_async": warm_redis,
+    "mongo": warm_mongo,
+}
+
+
+async def warm_up() -> Dict[str, float]:
+    """
+    Warm every enabled backend concurrently, within WARMUP_TIMEOUT.
+
+    A backend failing to warm up is logged and left cold; it never
+    blocks the worker from starting.
+
+    :return: Seconds each backend took to warm up.
+    """
+    durations: Dict[str, float] = {}
+
+    async def warm(name: str) -> None:
+        count = WARMUP_BACKEND_CONNECTIONS.get(name, WARMUP_CONNECTIONS)
+        if count <= 0:
+            return
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(
+                WARMERS[name](name, count), WARMUP_TIMEOUT
+            )
+        except Exception as e:
+            logger.warning("Warmup of %s failed: %r", name, e)
+            return
+        durations[name] = time.perf_counter() - started
+
+    await asyncio.gather(*(
+        warm(backend.name) for backend in registry.enabled()
+        if backend.name in WARMERS
+    ))
+    return durations
+
+
+def start_draining() -> None:
+    """
+    Stop advertising readiness and ask clients to close their
+    connections.
+    """
+    if not tracker.draining:
+        logger.info("Draining: %d requests in flight", tracker.in_flight)
+    tracker.draining = True
+    readiness.draining = True
+
+
+def install_drain_handlers() -> None:
+    """
+    Chain SIGTERM and SIGINT to `start_draining`.
+
+    The server's own handler, which stops accepting connections, runs
+    DRAIN_DELAY seconds later, giving load balancers time to see /readyz
+    fail and route new traffic elsewhere. A second signal stops the
+    server at once.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            continue
+
+        def handler(signum, frame, previous=previous):
+            if tracker.draining or DRAIN_DELAY <= 0:
+                start_draining()
+                previous(signum, frame)
+                return
+            start_draining()
+            loop.call_later(DRAIN_DELAY, previous, signum, frame)
+
+        signal.signal(sig, handler)
+
+
+async def start(app: FastAPI) -> None:
+    """
+    Open clients, warm pools and start background services.
+    """
+    await registry.startup()
+    if WARMUP_ENABLED:
+        durations = await warm_up()
+        if durations:
+            logger.info("Warmed up %s", ", ".join(
+                f"{name} in {seconds * 1000:.0f} ms"
+                for name, seconds in durations.items()
+            ))
+    await exporter.start()
+    await scheduler.start()
+    await write_behind.start()
+    await near_cache.start()
+    if registry.is_enabled("mongo"):
+        from src.interfaces.mongo import MongoRepository
+
+        await MongoRepository.bootstrap_indexes(registry.get("mongo").db)
+    install_drain_handlers()
+
+
+async def stop(app: FastAPI) -> None:
+    """
+    Drain in-flight requests, stop background services, close pools.
+    """
+    start_draining()
+    if not await tracker.wait_idle(DRAIN_TIMEOUT):
+        logger.warning(
+            "Shutting down with %d requests still in flight",
+            tracker.in_flight,
+        )
+    await scheduler.shutdown()
+    await write_behind.shutdown()
+    await near_cache.shutdown()
+    await exporter.shutdown()
+    await registry.shutdown()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    FastAPI lifespan running `start` and `stop` around the app's life.
+    """
+    await start(app)
+    try:
+        yield
+    finally:
+        await stop(app)
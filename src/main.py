@@ -1,7 +1,16 @@
 """
 Main file for running the application
+
+Importing this module must stay cheap and free of per-process state
+(open connections, event loops, threads) so that it can be loaded once
+in the gunicorn master with `--preload` and shared by forked workers.
 """
 
+import os
+import json
+import hashlib
+import logging
+
 from fastapi import FastAPI
 from fastapi.exceptions import HTTPException
 from fastapi.responses import PlainTextResponse
@@ -9,23 +18,90 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 
 from starlette.requests import Request
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 from src.routers import routers
 from src.routers import home_router
+from src import jobs  # noqa: F401
+
+from src.lifespan import lifespan
 
 from db.storage.postgres import async_session
+from db.storage.postgres.slowlog import slow_queries
+from db.storage.postgres.slowlog import SLOW_QUERY_ENABLED
+
+from utils.middlewares.timing import ServerTimingMiddleware
+from utils.middlewares.timing import SERVER_TIMING_ENABLED
+from utils.middlewares.metrics import MetricsMiddleware
+from utils.middlewares.metrics import METRICS_ENABLED
+from utils.middlewares.profiler import ProfilerMiddleware
+from utils.middlewares.compression import CompressionMiddleware
+from utils.middlewares.compression import COMPRESSION_ENABLED
+from utils.middlewares.profiler import PROFILER_ENABLED
+from utils.middlewares.drain import DrainMiddleware
+
+from libs.environs import env
+
+
+logger = logging.getLogger(__name__)
+
+OPENAPI_SCHEMA_PATH = env.str("OPENAPI_SCHEMA_PATH", default="")
+OPENAPI_PRELOAD = env.bool("OPENAPI_PRELOAD", default=False)
 
 
 app = FastAPI(
     title="FastAPI",
     description="API documentation",
     version="1.0.1",
+    lifespan=lifespan,
 )
 
 app.include_router(routers)
 app.include_router(home_router)
 
+
+OPENAPI_KEY_FIELD = "x-schema-key"
+
+
+def openapi_key() -> str:
+    """
+    Fingerprint the app version and route set the schema is built from.
+    """
+    routes = sorted(
+        (route.path, sorted(getattr(route, "methods", None) or ()))
+        for route in app.routes
+    )
+    payload = json.dumps([app.version, routes]).encode()
+    return hashlib.sha256(payload).hexdigest()
+
+
+def openapi() -> dict:
+    """
+    Return the OpenAPI schema, loading a pre-generated copy if configured.
+
+    The schema is built at most once per process. Pre-generate it with
+    `python -m src.commands.openapi`; with OPENAPI_PRELOAD it is built at
+    import time so `--preload` workers inherit it from the master. A
+    pre-generated copy written for another app version or route set is
+    ignored and the schema is built from the routes.
+    """
+    if app.openapi_schema is None and OPENAPI_SCHEMA_PATH:
+        if os.path.exists(OPENAPI_SCHEMA_PATH):
+            with open(OPENAPI_SCHEMA_PATH) as schema_file:
+                schema = json.load(schema_file)
+            if schema.pop(OPENAPI_KEY_FIELD, None) == openapi_key():
+                app.openapi_schema = schema
+            else:
+                logger.warning(
+                    "Ignoring stale OpenAPI schema %s", OPENAPI_SCHEMA_PATH
+                )
+    return FastAPI.openapi(app)
+
+
+app.openapi = openapi
+
+if OPENAPI_PRELOAD:
+    app.openapi()
+
 origins = ["*"]
 
 app.add_middleware(
@@ -36,6 +112,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
 
 @app.middleware("http")
 async def db_session_middleware(request: Request, call_next):
@@ -45,6 +124,22 @@ async def db_session_middleware(request: Request, call_next):
     return response
 
 
+if SERVER_TIMING_ENABLED:
+    app.add_middleware(ServerTimingMiddleware)
+
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+if PROFILER_ENABLED:
+    app.add_middleware(ProfilerMiddleware)
+
+# Outermost, so a request counts as in flight until its response is sent.
+app.add_middleware(DrainMiddleware)
+
+if SLOW_QUERY_ENABLED:
+    slow_queries.install()
+
+
 @app.exception_handler(HTTPException)
 async def http_exception_handler(
     request: Request,
@@ -61,12 +156,7 @@ async def validation_exception_handler(
     return PlainTextResponse(str(exc), status_code=400)
 
 
-@app.on_event('startup')
-async def on_startup():
-    scheduler = AsyncIOScheduler()
-    scheduler.start()
-
-
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="127.0.0.1", port=8000)
+    from src.commands.serve import main
+
+    main()
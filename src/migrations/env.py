@@ -10,6 +10,7 @@ from sqlalchemy import pool
 from alembic import context
 
 from db.storage.postgres.connection import Base, db_url
+from db.storage.postgres.migrations import MIGRATION_LOCK_TIMEOUT_MS
 from src import models  # noqa
 
 sys.path = ['.', '..'] + sys.path[1:]
@@ -42,7 +43,15 @@ def run_migrations_offline() -> None:
 def do_run_migrations(connection):
     """
     Run actual migrations using the provided connection.
+
+    DDL waiting longer than MIGRATION_LOCK_TIMEOUT_MS for a lock fails
+    instead of queueing the table's traffic behind it.
     """
+    if MIGRATION_LOCK_TIMEOUT_MS:
+        connection.exec_driver_sql(
+            f"SET lock_timeout = {MIGRATION_LOCK_TIMEOUT_MS}"
+        )
+        connection.commit()
     context.configure(
         connection=connection,
         target_metadata=target_metadata,
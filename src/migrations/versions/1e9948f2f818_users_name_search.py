@@ -0,0 +1,41 @@
+"""users name search
+
+Revision ID: 1e9948f2f818
+Revises: 80c929ac964f
+Create Date: 2026-10-19 09:40:12.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1e9948f2f818'
+down_revision: Union[str, None] = '80c929ac964f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # pg_trgm ships with PostgreSQL contrib; creating it needs CREATE on
+    # the database. Indexes are built CONCURRENTLY so the table stays
+    # writable, which cannot run inside the migration transaction.
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_name_trgm "
+            "ON users USING gin (name gin_trgm_ops) "
+            "WHERE deleted_at IS NULL"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_name_prefix "
+            "ON users ((lower(name) COLLATE \"C\"), id) "
+            "WHERE deleted_at IS NULL"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_users_name_prefix")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_users_name_trgm")
@@ -0,0 +1,106 @@
+"""users partitioning
+
+Revision ID: a0cf4a98cb51
+Revises: 1e9948f2f818
+Create Date: 2026-10-19 10:12:36.402117
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+
+from db.storage.postgres.partitions import TimePartition
+from db.storage.postgres.partitions import create_partitions
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a0cf4a98cb51'
+down_revision: Union[str, None] = '1e9948f2f818'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PARTITION = TimePartition("created_at", interval="month", premake=3)
+
+NAME_INDEXES = (
+    "CREATE INDEX ix_users_name ON users (name)",
+    "CREATE INDEX ix_users_name_trgm ON users "
+    "USING gin (name gin_trgm_ops) WHERE deleted_at IS NULL",
+    "CREATE INDEX ix_users_name_prefix ON users "
+    "((lower(name) COLLATE \"C\"), id) WHERE deleted_at IS NULL",
+)
+
+
+def upgrade() -> None:
+    # The existing heap is not copied: it becomes the partition of every
+    # row created before `cutoff`, and monthly partitions follow. The
+    # cutoff leaves a spare month so rows inserted while this runs still
+    # fit the legacy range.
+    now = datetime.now(timezone.utc)
+    cutoff = PARTITION.shift(PARTITION.period_start(now), 2)
+
+    # Slow steps run outside the transaction without blocking writes: the
+    # (id, created_at) key is built CONCURRENTLY and the range CHECK is
+    # validated under a SHARE UPDATE EXCLUSIVE lock, which lets ATTACH
+    # PARTITION skip its own scan.
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "
+            "users_legacy_pkey ON users (id, created_at)"
+        )
+        op.execute(
+            "ALTER TABLE users ADD CONSTRAINT users_legacy_range "
+            f"CHECK (created_at < '{cutoff.isoformat()}') NOT VALID"
+        )
+        op.execute("ALTER TABLE users VALIDATE CONSTRAINT users_legacy_range")
+
+    # Catalog-only changes under a brief ACCESS EXCLUSIVE lock.
+    op.execute("ALTER TABLE users DROP CONSTRAINT users_pkey")
+    op.execute(
+        "ALTER TABLE users ADD CONSTRAINT users_legacy_pkey "
+        "PRIMARY KEY USING INDEX users_legacy_pkey"
+    )
+    op.execute("ALTER TABLE users RENAME TO users_legacy")
+    for suffix in ("name", "name_trgm", "name_prefix"):
+        op.execute(
+            f"ALTER INDEX ix_users_{suffix} RENAME TO ix_users_legacy_{suffix}"
+        )
+    op.execute(
+        "CREATE TABLE users ("
+        "name VARCHAR NOT NULL, "
+        "id INTEGER NOT NULL DEFAULT nextval('users_id_seq'), "
+        "created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL, "
+        "updated_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL, "
+        "deleted_at TIMESTAMP WITH TIME ZONE, "
+        "CONSTRAINT users_pkey PRIMARY KEY (id, created_at)"
+        ") PARTITION BY RANGE (created_at)"
+    )
+    op.execute("ALTER SEQUENCE users_id_seq OWNED BY users.id")
+    op.execute("ALTER TABLE users_legacy ALTER COLUMN id DROP DEFAULT")
+    op.execute(
+        "ALTER TABLE users ATTACH PARTITION users_legacy "
+        f"FOR VALUES FROM (MINVALUE) TO ('{cutoff.isoformat()}')"
+    )
+    op.execute("ALTER TABLE users_legacy DROP CONSTRAINT users_legacy_range")
+    # Matching indexes of users_legacy are attached, not rebuilt.
+    for statement in NAME_INDEXES:
+        op.execute(statement)
+    create_partitions(
+        op, "users", PARTITION, cutoff,
+        PARTITION.shift(cutoff, PARTITION.premake),
+    )
+
+
+def downgrade() -> None:
+    # Copies every row back into a single heap; run it during downtime.
+    op.execute(
+        "CREATE TABLE users_heap (LIKE users INCLUDING DEFAULTS)"
+    )
+    op.execute("INSERT INTO users_heap SELECT * FROM users")
+    op.execute("ALTER SEQUENCE users_id_seq OWNED BY NONE")
+    op.execute("DROP TABLE users")
+    op.execute("ALTER TABLE users_heap RENAME TO users")
+    op.execute("ALTER TABLE users ADD CONSTRAINT users_pkey PRIMARY KEY (id)")
+    op.execute("ALTER SEQUENCE users_id_seq OWNED BY users.id")
+    for statement in NAME_INDEXES:
+        op.execute(statement)
@@ -2,20 +2,41 @@
 User Table
 """
 
+from sqlalchemy import func
+from sqlalchemy import Index
 from sqlalchemy.orm import Mapped
 from sqlalchemy.orm import mapped_column
 
 from db.storage.postgres import Base
-from db.storage.postgres.mixins import IntIdPkMixin
 from db.storage.postgres.mixins import TimestampMixin
 from db.storage.postgres.mixins import SoftDeletionMixin
+from db.storage.postgres.mixins import TimePartitionMixin
+from db.storage.postgres.partitions import TimePartition
+from libs.environs import env
 
 
-class User(Base, IntIdPkMixin, TimestampMixin, SoftDeletionMixin):
+USERS_PARTITION_INTERVAL = env.str(
+    "USERS_PARTITION_INTERVAL", default="month"
+)
+USERS_PARTITION_PREMAKE = env.int("USERS_PARTITION_PREMAKE", default=3)
+USERS_PARTITION_RETENTION = env.int("USERS_PARTITION_RETENTION", default=0)
+USERS_PARTITION_EXPIRE = env.str("USERS_PARTITION_EXPIRE", default="detach")
+
+
+class User(Base, TimePartitionMixin, TimestampMixin, SoftDeletionMixin):
     """
     SQLAlchemy model representing a user.
+
+    The table is range-partitioned by `created_at`, see TimePartitionMixin.
     """
     __tablename__ = "users"
+    __partition__ = TimePartition(
+        "created_at",
+        interval=USERS_PARTITION_INTERVAL,
+        premake=USERS_PARTITION_PREMAKE,
+        retention=USERS_PARTITION_RETENTION,
+        expire=USERS_PARTITION_EXPIRE,
+    )
 
     name: Mapped[str] = mapped_column(index=True)
 
@@ -24,3 +45,19 @@ class User(Base, IntIdPkMixin, TimestampMixin, SoftDeletionMixin):
         Return a readable string representation of the User instance.
         """
         return f"<User id={self.id} name={self.name}>"
+
+
+Index(
+    "ix_users_name_trgm",
+    User.name,
+    postgresql_using="gin",
+    postgresql_ops={"name": "gin_trgm_ops"},
+    postgresql_where=User.deleted_at.is_(None),
+).ddl_if(dialect="postgresql")
+
+Index(
+    "ix_users_name_prefix",
+    func.lower(User.name).collate("C"),
+    User.id,
+    postgresql_where=User.deleted_at.is_(None),
+).ddl_if(dialect="postgresql")
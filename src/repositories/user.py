@@ -2,10 +2,33 @@
 Repository for User model.
 """
 
+from typing import Any
+from typing import List
+from typing import Tuple
+from typing import Optional
+from typing import Sequence
+
+from sqlalchemy import func
+from sqlalchemy import and_
+from sqlalchemy import or_
+from sqlalchemy import tuple_
+from sqlalchemy import literal
+from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.models.user import User
+from db.storage.postgres.shards import merge_sorted
 from src.interfaces.repository import BaseRepository
+from libs.environs import env
+
+
+SEARCH_SIMILARITY_THRESHOLD = env.float(
+    "SEARCH_SIMILARITY_THRESHOLD", default=0.3
+)
+
+# Trigrams of shorter terms match almost everything; search them by prefix.
+MIN_TRIGRAM_LENGTH = 3
+DEFAULT_SIMILARITY_THRESHOLD = 0.3
 
 
 class UserRepository(BaseRepository[User]):
@@ -27,3 +50,117 @@ class UserRepository(BaseRepository[User]):
         :param db_session: Async SQLAlchemy session for User model operations.
         """
         super().__init__(db_session, User)
+
+    async def search(
+        self,
+        term: str,
+        limit: int = 20,
+        prefix: bool = False,
+        after: Optional[Sequence[Any]] = None,
+    ) -> Tuple[List[Tuple[User, float]], Optional[List[Any]]]:
+        """
+        Search active users by name, PostgreSQL only.
+
+        The default mode matches names similar to `term` through the
+        `ix_users_name_trgm` GIN index (`name % term`) and ranks them by
+        trigram similarity. Prefix mode, used as well for terms shorter
+        than three characters, matches case-insensitive name prefixes as
+        a range scan of `ix_users_name_prefix`, which also yields the
+        order, so it stays fast however many names match.
+
+        Both modes page with a keyset: pass the returned key as `after`
+        to get the next page. On a sharded session every shard returns
+        its best matches and the pages are merged on the same keyset.
+
+        :param term: Text to search for.
+        :param limit: Maximum number of users to return.
+        :param prefix: Match name prefixes instead of similar names.
+        :param after: Key returned with the previous page.
+        :return: (user, score) pairs, best first, and the key of the next
+            page or None on the last page. Scores are 1.0 in prefix mode.
+        :raises NotImplementedError: If the dialect is not PostgreSQL.
+        """
+        dialect = self.db_session.get_bind().dialect.name
+        if dialect != "postgresql":
+            raise NotImplementedError(
+                f"Name search is not supported for dialect '{dialect}'"
+            )
+        term = " ".join(term.split())
+        if not term:
+            return [], None
+        if prefix or len(term) < MIN_TRIGRAM_LENGTH:
+            return await self._search_prefix(term, limit, after)
+        return await self._search_similar(term, limit, after)
+
+    async def _search_prefix(
+        self, term: str, limit: int, after: Optional[Sequence[Any]]
+    ) -> Tuple[List[Tuple[User, float]], Optional[List[Any]]]:
+        """
+        Match `lower(name)` prefixes ordered by (lower(name), id).
+
+        The prefix is expressed as a range rather than LIKE so the index is
+        used even with a generic prepared-statement plan.
+        """
+        key = func.lower(User.name).collate("C")
+        low = term.lower()
+        high = low[:-1] + chr(ord(low[-1]) + 1)
+        query = (
+            select(User, key)
+            .where(User.deleted_at.is_(None), key >= low, key < high)
+            .order_by(key, User.id)
+            .limit(limit + 1)
+        )
+        if after:
+            query = query.where(
+                tuple_(key, User.id)
+                > tuple_(literal(after[0]), literal(after[1]))
+            )
+        rows = merge_sorted(
+            (await self.db_session.execute(query)).all(),
+            key=lambda row: (row[1], row[0].id),
+            limit=limit + 1,
+        )
+        page = [(user, 1.0) for user, _ in rows[:limit]]
+        next_key = None
+        if len(rows) > limit:
+            user, name_key = rows[limit - 1]
+            next_key = [name_key, user.id]
+        return page, next_key
+
+    async def _search_similar(
+        self, term: str, limit: int, after: Optional[Sequence[Any]]
+    ) -> Tuple[List[Tuple[User, float]], Optional[List[Any]]]:
+        """
+        Match names by trigram similarity ordered by (similarity desc, id).
+        """
+        if SEARCH_SIMILARITY_THRESHOLD != DEFAULT_SIMILARITY_THRESHOLD:
+            await self.db_session.execute(
+                select(func.set_config(
+                    "pg_trgm.similarity_threshold",
+                    str(SEARCH_SIMILARITY_THRESHOLD),
+                    True,
+                ))
+            )
+        score = func.similarity(User.name, term)
+        query = (
+            select(User, score)
+            .where(User.deleted_at.is_(None), User.name.op("%")(term))
+            .order_by(score.desc(), User.id)
+            .limit(limit + 1)
+        )
+        if after:
+            query = query.where(or_(
+                score < after[0],
+                and_(score == after[0], User.id > after[1]),
+            ))
+        rows = merge_sorted(
+            (await self.db_session.execute(query)).all(),
+            key=lambda row: (-row[1], row[0].id),
+            limit=limit + 1,
+        )
+        page = [(user, float(value)) for user, value in rows[:limit]]
+        next_key = None
+        if len(rows) > limit:
+            user, value = rows[limit - 1]
+            next_key = [float(value), user.id]
+        return page, next_key
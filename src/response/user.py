@@ -2,12 +2,16 @@
 User Response
 """
 
+from typing import Any
 from typing import List
+from typing import Tuple
+from typing import Optional
 
 from src.models.user import User
 from src.schemas.user import UserRead
 from src.interfaces.response import BaseResponse
 from src.interfaces.scheme import BaseScheme
+from utils.middlewares.timing import timed
 
 
 class UserResponse(BaseResponse[User]):
@@ -25,6 +29,9 @@ class UserResponse(BaseResponse[User]):
         - update: Return a success response after updating a user.
         - delete: Return a success response after deleting a user.
         - get_all: Return a success response with a list of users.
+        - search: Return a success response with a page of search results.
+        - batch: Return a success response with each batch operation's result.
+        - bulk_queued: Return a success response with a background job id.
     """
 
     def __init__(self):
@@ -33,6 +40,7 @@ class UserResponse(BaseResponse[User]):
         """
         super().__init__(model=User)
 
+    @timed("serialize")
     def _to_schema(self, user: User) -> UserRead:
         """
         Convert a User model instance to a UserRead Pydantic schema.
@@ -93,3 +101,71 @@ class UserResponse(BaseResponse[User]):
         :return: BaseScheme with list of user data.
         """
         return self.success(record=[self._to_schema(u) for u in users])
+
+    def search(
+        self,
+        results: List[Tuple[User, float]],
+        next_cursor: Optional[str],
+    ) -> BaseScheme:
+        """
+        Generate a success response containing a page of search results.
+
+        :param results: (user, score) pairs, best first.
+        :param next_cursor: Cursor of the next page, or None on the last page.
+        :return: BaseScheme with the matching users and the next cursor.
+        """
+        return self._build_response(
+            status="success",
+            message="Users searched successfully",
+            data={
+                "items": [
+                    {
+                        **self._to_schema(user).model_dump(),
+                        "score": round(score, 4),
+                    }
+                    for user, score in results
+                ],
+                "next_cursor": next_cursor,
+            },
+        )
+
+    def batch(
+        self,
+        operations: List[Any],
+        records: List[Optional[User]],
+    ) -> BaseScheme:
+        """
+        Generate a success response after applying a batch of operations.
+
+        :param operations: The batch operations, in order.
+        :param records: Created or updated user of each operation, None
+            for deletes.
+        :return: BaseScheme with one result per operation.
+        """
+        return self._build_response(
+            status="success",
+            message="User batch applied successfully",
+            data=[
+                {
+                    "op": operation.op,
+                    "id": record.id if record is not None else operation.id,
+                    "record": (
+                        self._to_schema(record) if record is not None else None
+                    ),
+                }
+                for operation, record in zip(operations, records)
+            ],
+        )
+
+    def bulk_queued(self, job_id: str) -> BaseScheme:
+        """
+        Generate a success response after queueing a bulk create job.
+
+        :param job_id: Id of the queued job, to poll at /jobs/{job_id}.
+        :return: BaseScheme with the job id.
+        """
+        return self._build_response(
+            status="success",
+            message="User bulk create queued successfully",
+            data={"job_id": job_id},
+        )
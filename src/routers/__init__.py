@@ -2,15 +2,32 @@
 Initialize routers
 """
 
+from functools import lru_cache
+
 from fastapi import Request
 from fastapi import APIRouter
-from fastapi.templating import Jinja2Templates
+
+from db.registry import registry
+from db.storage.postgres.slowlog import SLOW_QUERY_ENABLED
+from utils.middlewares.metrics import METRICS_ENABLED
 
 from src.routers import user
+from src.routers import health
 
 routers = APIRouter()
 home_router = APIRouter()
-templates = Jinja2Templates(directory="templates")
+
+
+@lru_cache(maxsize=1)
+def get_templates():
+    """
+    Create the Jinja2 environment on first use instead of at import time.
+
+    :return: Jinja2Templates instance for the templates directory.
+    """
+    from fastapi.templating import Jinja2Templates
+
+    return Jinja2Templates(directory="templates")
 
 
 @routers.get(
@@ -25,10 +42,33 @@ async def home(request: Request):
     :param request: FastAPI Request object.
     :return: HTML response for the homepage.
     """
-    return templates.TemplateResponse(
+    return get_templates().TemplateResponse(
         name="index.html",
         context={"request": request, "github_username": "ummataliyev"}
     )
 
 
 routers.include_router(user.router, prefix="/users", tags=["Users"])
+routers.include_router(health.router, tags=["Health"])
+
+if METRICS_ENABLED:
+    from src.routers import metrics
+
+    routers.include_router(metrics.router, tags=["Metrics"])
+
+if SLOW_QUERY_ENABLED and registry.is_enabled("postgres"):
+    from src.routers import admin
+
+    routers.include_router(admin.router, prefix="/admin", tags=["Admin"])
+
+if registry.is_enabled("redis_async"):
+    from src.routers import jobs
+
+    routers.include_router(jobs.router, prefix="/jobs", tags=["Jobs"])
+
+if registry.is_enabled("s3"):
+    from src.routers import storage
+
+    routers.include_router(
+        storage.router, prefix="/storage", tags=["Storage"]
+    )
@@ -0,0 +1,63 @@
+"""
+Admin Routers
+"""
+
+import os
+
+from typing import Literal
+
+from fastapi import Query
+from fastapi import Depends
+from fastapi import APIRouter
+
+from db.storage.postgres.slowlog import slow_queries
+from db.storage.postgres.slowlog import SLOW_QUERY_TOP_N
+from src.interfaces.scheme import BaseScheme
+from utils.helpers.auth import require_admin
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.get(
+    path="/slow-queries",
+    response_model=BaseScheme
+)
+async def get_slow_queries(
+    limit: int = Query(default=SLOW_QUERY_TOP_N, ge=1, le=500),
+    order_by: Literal["total", "max", "count", "mean"] = "total",
+):
+    """
+    Report the slowest statement fingerprints seen by this worker.
+
+    The log is kept per worker process; with several workers, repeated
+    calls may be answered by different workers, identified by `pid`.
+
+    :param limit: Number of fingerprints to return.
+    :param order_by: Ranking: total time, slowest run, count or mean.
+    :return: Standardized BaseScheme response with the report.
+    """
+    return BaseScheme(
+        status="success",
+        message="Slow queries fetched successfully",
+        data={
+            "pid": os.getpid(),
+            "threshold_ms": slow_queries.threshold * 1000,
+            "window_seconds": slow_queries.window,
+            "queries": slow_queries.top(limit, order_by),
+        },
+    )
+
+
+@router.delete(
+    path="/slow-queries",
+    response_model=BaseScheme
+)
+async def reset_slow_queries():
+    """
+    Clear the slow query log of this worker.
+
+    :return: Standardized BaseScheme response.
+    """
+    slow_queries.reset()
+    return BaseScheme(status="success", message="Slow queries cleared")
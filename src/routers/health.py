@@ -0,0 +1,53 @@
+"""
+Health Routers
+"""
+
+from fastapi import status
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from src.interfaces.scheme import BaseScheme
+from utils.probes.readiness import readiness
+
+
+router = APIRouter()
+
+
+@router.get(
+    path="/healthz",
+    response_model=BaseScheme,
+    include_in_schema=False
+)
+async def healthz():
+    """
+    Liveness probe: answers as long as the worker's event loop runs,
+    without touching any dependency.
+
+    :return: Standardized BaseScheme response.
+    """
+    return BaseScheme(status="success", message="alive")
+
+
+@router.get(
+    path="/readyz",
+    response_model=BaseScheme,
+    include_in_schema=False
+)
+async def readyz():
+    """
+    Readiness probe: checks the enabled datastores and, for PostgreSQL,
+    that no migration is pending. Results are cached for
+    READINESS_CACHE_TTL seconds.
+
+    :return: BaseScheme response with each check's result, 503 when a
+        check fails.
+    """
+    ready, checks = await readiness.check()
+    if ready:
+        return BaseScheme(status="success", message="ready", data=checks)
+    return JSONResponse(
+        BaseScheme(
+            status="error", message="not ready", data=checks
+        ).model_dump(),
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
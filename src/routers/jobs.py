@@ -0,0 +1,35 @@
+"""
+Job Routers
+"""
+
+from fastapi import APIRouter
+
+from utils.queues.queue import queue
+from src.interfaces.scheme import BaseScheme
+
+
+router = APIRouter()
+
+
+@router.get(
+    path="/{job_id}",
+    response_model=BaseScheme
+)
+async def get_job_status(job_id: str):
+    """
+    Return the status of a background job so clients can poll it.
+
+    :param job_id: Id returned when the job was queued.
+    :return: Standardized BaseScheme response with the job status or error.
+    """
+    try:
+        job = await queue.status(job_id)
+        if job is None:
+            return BaseScheme(status="error", message="Job not found")
+        return BaseScheme(
+            status="success",
+            message="Job fetched successfully",
+            data=job,
+        )
+    except Exception as e:
+        return BaseScheme(status="error", message=f"An error occurred: {e}")
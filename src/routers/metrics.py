@@ -0,0 +1,31 @@
+"""
+Metrics Routers
+"""
+
+import asyncio
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from utils.metrics.multiprocess import exporter
+
+
+router = APIRouter()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get(
+    path="/metrics",
+    response_class=PlainTextResponse,
+    include_in_schema=False
+)
+async def get_metrics():
+    """
+    Expose metrics in the Prometheus text format, merged across workers
+    when METRICS_MULTIPROC_DIR is set.
+
+    :return: PlainTextResponse with the exposition.
+    """
+    text = await asyncio.to_thread(exporter.render)
+    return PlainTextResponse(text, media_type=CONTENT_TYPE)
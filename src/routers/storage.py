@@ -0,0 +1,149 @@
+"""
+Storage Routers
+"""
+
+from typing import Literal
+from typing import NoReturn
+
+from fastapi import status
+from fastapi import Depends
+from fastapi import Request
+from fastapi import APIRouter
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from db.aws.storage import storage
+from src.interfaces.scheme import BaseScheme
+from utils.helpers.auth import require_admin
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+def raise_storage_error(error: Exception) -> NoReturn:
+    """
+    Translate an S3 failure into an HTTP error.
+
+    :param error: Exception raised by the S3 client.
+    :raises HTTPException: 404 for a missing object, 416 for an
+        unsatisfiable range, 502 for any other storage failure.
+    """
+    code = getattr(error, "response", {}).get("Error", {}).get("Code")
+    if code in ("NoSuchKey", "404"):
+        raise HTTPException(status_code=404, detail="Object not found")
+    if code == "InvalidRange":
+        raise HTTPException(status_code=416, detail="Invalid range")
+    raise HTTPException(
+        status_code=status.HTTP_502_BAD_GATEWAY,
+        detail=f"Storage error: {code or type(error).__name__}",
+    )
+
+
+@router.get(
+    path="/presign/{key:path}",
+    response_model=BaseScheme
+)
+async def presign_object(
+    key: str, method: Literal["get_object", "put_object"] = "get_object"
+):
+    """
+    Return a (cached) presigned URL for an object.
+
+    :param key: Object key.
+    :param method: S3 method the URL grants: get_object or put_object.
+    :return: Standardized BaseScheme response containing the URL.
+    """
+    try:
+        url = await storage.presigned_url(key, method)
+    except Exception as e:
+        raise_storage_error(e)
+    return BaseScheme(
+        status="success",
+        message="Presigned URL generated successfully",
+        data={"key": key, "url": url, "expires_in": storage.url_ttl},
+    )
+
+
+@router.put(
+    path="/{key:path}",
+    response_model=BaseScheme,
+    status_code=status.HTTP_201_CREATED
+)
+async def upload_object(key: str, request: Request):
+    """
+    Stream the request body into S3 without buffering the whole object.
+
+    :param key: Object key.
+    :param request: Incoming request whose body is the object content.
+    :return: Standardized BaseScheme response with the stored object.
+    """
+    try:
+        stored = await storage.upload_stream(
+            key,
+            request.stream(),
+            content_type=request.headers.get("content-type"),
+        )
+    except Exception as e:
+        raise_storage_error(e)
+    return BaseScheme(
+        status="success",
+        message="Object uploaded successfully",
+        data=stored,
+    )
+
+
+@router.get(
+    path="/{key:path}",
+    response_class=StreamingResponse
+)
+async def download_object(key: str, request: Request):
+    """
+    Stream an object from S3, honouring an HTTP Range header.
+
+    :param key: Object key.
+    :param request: Incoming request, possibly carrying a Range header.
+    :return: Streaming response with the object (or range) content.
+    """
+    byte_range = request.headers.get("range")
+    try:
+        chunks, metadata = await storage.download_stream(key, byte_range)
+    except Exception as e:
+        raise_storage_error(e)
+
+    headers = {"Accept-Ranges": "bytes"}
+    if metadata["ContentLength"] is not None:
+        headers["Content-Length"] = str(metadata["ContentLength"])
+    if metadata["ETag"]:
+        headers["ETag"] = metadata["ETag"]
+    if metadata["ContentRange"]:
+        headers["Content-Range"] = metadata["ContentRange"]
+
+    return StreamingResponse(
+        chunks,
+        status_code=(
+            status.HTTP_206_PARTIAL_CONTENT
+            if metadata["ContentRange"] else status.HTTP_200_OK
+        ),
+        media_type=metadata["ContentType"] or "application/octet-stream",
+        headers=headers,
+    )
+
+
+@router.delete(
+    path="/{key:path}",
+    response_model=BaseScheme
+)
+async def delete_object(key: str):
+    """
+    Delete an object.
+
+    :param key: Object key.
+    :return: Standardized BaseScheme response confirming deletion.
+    """
+    try:
+        await storage.delete(key)
+    except Exception as e:
+        raise_storage_error(e)
+    return BaseScheme(
+        status="success", message="Object deleted successfully"
+    )
@@ -2,22 +2,62 @@
 User Routers
 """
 
+from typing import Optional
+
+from datetime import datetime
+
+from fastapi import Query
 from fastapi import status
 from fastapi import Depends
 from fastapi import APIRouter
 
 from src.schemas.user import UserCreate
 from src.schemas.user import UserUpdate
+from src.schemas.user import UserBatch
+from src.schemas.user import UserBulkCreate
 
 from src.services.user import UserService
 from src.response.user import UserResponse
 from src.interfaces.scheme import BaseScheme
+from db.registry import registry
 
 
 router = APIRouter()
 response = UserResponse()
 
 
+@router.get(
+    path="/search",
+    response_model=BaseScheme
+)
+async def search_users(
+    q: str = Query(min_length=1, max_length=200),
+    prefix: bool = Query(default=False),
+    cursor: Optional[str] = Query(default=None),
+    limit: int = Query(default=20, ge=1, le=100),
+    service: UserService = Depends(UserService.get_service)
+):
+    """
+    Search users by name, ranked by trigram similarity.
+
+    :param q: Text to search for.
+    :param prefix: Only match name prefixes; faster, no fuzzy matching.
+    :param cursor: Cursor returned with the previous page.
+    :param limit: Maximum number of users to return.
+    :param service: UserService instance injected by FastAPI Depends.
+    :return: Standardized BaseScheme response with matching users or error.
+    """
+    try:
+        results, next_cursor = await service.search(
+            q, limit=limit, prefix=prefix, cursor=cursor
+        )
+        return response.search(results, next_cursor)
+    except ValueError as e:
+        return response.error(str(e))
+    except Exception as e:
+        return response.error(f"An error occurred: {e}")
+
+
 @router.get(
     path="/{id}",
     response_model=BaseScheme
@@ -47,16 +87,32 @@ async def get_user_by_id(
     response_model=BaseScheme
 )
 async def get_all_users(
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=50, ge=1, le=500),
+    created_from: Optional[datetime] = Query(default=None),
+    created_to: Optional[datetime] = Query(default=None),
     service: UserService = Depends(UserService.get_service)
 ):
     """
-    Retrieve all users.
+    Retrieve users page by page, ordered by id.
+
+    Creation time bounds restrict the scan to the matching partitions.
 
+    :param skip: Number of users to skip.
+    :param limit: Maximum number of users to return.
+    :param created_from: Only users created at or after this time.
+    :param created_to: Only users created before this time.
     :param service: UserService instance injected by FastAPI Depends.
     :return: Standardized BaseScheme response containing list of users or error.
     """
     try:
-        users = await service.get_all()
+        users = await service.get_all(
+            skip=skip,
+            limit=limit,
+            order_by="id",
+            created_from=created_from,
+            created_to=created_to,
+        )
         return response.get_all(users)
     except Exception as e:
         return response.error(f"An error occurred: {e}")
@@ -85,6 +141,74 @@ async def create_user(
         return response.get_error_response(f"An error occurred: {e}")
 
 
+async def bulk_create_users(
+    users_in: UserBulkCreate,
+    service: UserService = Depends(UserService.get_service)
+):
+    """
+    Queue the creation of many users as a background job.
+
+    Only mounted when Redis is enabled, as the job queue lives there.
+
+    :param users_in: UserBulkCreate schema containing the users to create.
+    :param service: UserService instance injected by FastAPI Depends.
+    :return: Standardized BaseScheme response with the job id or error.
+    """
+    try:
+        job_id = await service.queue_bulk_create(
+            [user.model_dump() for user in users_in.users]
+        )
+        return response.bulk_queued(job_id)
+    except Exception as e:
+        return response.error(f"An error occurred: {e}")
+
+
+if registry.is_enabled("redis_async"):
+    router.add_api_route(
+        path="/bulk",
+        endpoint=bulk_create_users,
+        methods=["POST"],
+        response_model=BaseScheme,
+        status_code=status.HTTP_202_ACCEPTED,
+    )
+
+
+@router.post(
+    path="/batch",
+    response_model=BaseScheme
+)
+async def batch_users(
+    batch_in: UserBatch,
+    service: UserService = Depends(UserService.get_service)
+):
+    """
+    Apply an ordered list of user creates, updates and deletes atomically.
+
+    Either every operation is applied, in a single transaction, or none is.
+
+    :param batch_in: UserBatch schema containing the operations.
+    :param service: UserService instance injected by FastAPI Depends.
+    :return: Standardized BaseScheme response with each operation's result
+        or error.
+    """
+    operations = [
+        (
+            operation.op,
+            getattr(operation, "id", None),
+            operation.data.model_dump(exclude_unset=True)
+            if hasattr(operation, "data") else None,
+        )
+        for operation in batch_in.operations
+    ]
+    try:
+        records = await service.batch(operations)
+        return response.batch(batch_in.operations, records)
+    except ValueError as e:
+        return response.error(str(e))
+    except Exception as e:
+        return response.error(f"An error occurred: {e}")
+
+
 @router.patch(
     path="/{id}",
     response_model=BaseScheme
@@ -2,11 +2,16 @@
 User Scheme
 """
 
+from typing import List
+from typing import Union
+from typing import Literal
 from typing import Optional
+from typing import Annotated
 
 from datetime import datetime
 
 from pydantic import BaseModel
+from pydantic import Field
 from pydantic import ConfigDict
 
 
@@ -35,6 +40,16 @@ class UserCreate(UserBase):
     pass
 
 
+class UserBulkCreate(BaseModel):
+    """
+    Schema for creating many users in a background job.
+
+    Attributes:
+        users (List[UserCreate]): Users to create.
+    """
+    users: List[UserCreate]
+
+
 class UserUpdate(BaseModel):
     """
     Schema for updating an existing user.
@@ -61,3 +76,57 @@ class UserRead(UserBase):
     id: int
     created_at: datetime
     updated_at: datetime
+
+
+class UserBatchCreate(BaseModel):
+    """
+    Batch operation creating a user.
+
+    Attributes:
+        op (str): Always "create".
+        data (UserCreate): Fields of the new user.
+    """
+    op: Literal["create"]
+    data: UserCreate
+
+
+class UserBatchUpdate(BaseModel):
+    """
+    Batch operation updating a user.
+
+    Attributes:
+        op (str): Always "update".
+        id (int): ID of the user to update.
+        data (UserUpdate): Fields to update.
+    """
+    op: Literal["update"]
+    id: int
+    data: UserUpdate
+
+
+class UserBatchDelete(BaseModel):
+    """
+    Batch operation deleting a user.
+
+    Attributes:
+        op (str): Always "delete".
+        id (int): ID of the user to delete.
+    """
+    op: Literal["delete"]
+    id: int
+
+
+UserBatchOperation = Annotated[
+    Union[UserBatchCreate, UserBatchUpdate, UserBatchDelete],
+    Field(discriminator="op"),
+]
+
+
+class UserBatch(BaseModel):
+    """
+    Schema for applying many user changes in one transaction.
+
+    Attributes:
+        operations (List[UserBatchOperation]): Operations, applied in order.
+    """
+    operations: List[UserBatchOperation] = Field(min_length=1, max_length=1000)
@@ -2,12 +2,22 @@
 User Service
 """
 
+from typing import Any
+from typing import Dict
+from typing import List
 from typing import Type
+from typing import Tuple
+from typing import Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.models.user import User
 from src.interfaces.service import BaseService
+from src.repositories.user import UserRepository
+from src.repositories.user import MIN_TRIGRAM_LENGTH
+from utils.helpers.pagination import decode_cursor
+from utils.helpers.pagination import encode_cursor
+from utils.queues.queue import queue
 
 
 class UserService(BaseService[User]):
@@ -33,4 +43,46 @@ class UserService(BaseService[User]):
         :param db: Async SQLAlchemy session.
         :param model: User model class (default: User).
         """
-        super().__init__(db, model)
+        super().__init__(db, model, repository=UserRepository(db))
+
+    async def queue_bulk_create(self, rows: List[Dict[str, Any]]) -> str:
+        """
+        Queue the creation of many users as a background job; the worker
+        runs it through `bulk_create`.
+
+        :param rows: Field values of each user.
+        :return: Id of the queued job, to poll at /jobs/{job_id}.
+        """
+        return await queue.enqueue("users.bulk_create", rows=rows)
+
+    async def search(
+        self,
+        term: str,
+        limit: int = 20,
+        prefix: bool = False,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Tuple[User, float]], Optional[str]]:
+        """
+        Search users by name, ranked by similarity or by prefix.
+
+        :param term: Text to search for.
+        :param limit: Maximum number of users to return.
+        :param prefix: Match name prefixes only (faster, no fuzzy matching).
+        :param cursor: Cursor returned with the previous page.
+        :return: (user, score) pairs and the next page's cursor, if any.
+        :raises ValueError: If the cursor is malformed or from another mode.
+        """
+        prefix = prefix or len(" ".join(term.split())) < MIN_TRIGRAM_LENGTH
+        after = None
+        if cursor:
+            mode, *after = decode_cursor(cursor)
+            if mode != ("prefix" if prefix else "similar") or len(after) != 2:
+                raise ValueError("Invalid cursor")
+        users, next_key = await self.repository.search(
+            term, limit=limit, prefix=prefix, after=after
+        )
+        next_cursor = None
+        if next_key is not None:
+            mode = "prefix" if prefix else "similar"
+            next_cursor = encode_cursor([mode, *next_key])
+        return users, next_cursor
@@ -0,0 +1,5 @@
+"""
+Initialize background tasks
+"""
+
+from .user import * # noqa
@@ -0,0 +1,24 @@
+"""
+User background tasks
+"""
+
+from typing import Any
+from typing import Dict
+from typing import List
+
+from db.storage.postgres import async_session
+from src.services.user import UserService
+from utils.queues.tasks import tasks
+
+
+@tasks.task("users.bulk_create", max_retries=3)
+async def bulk_create_users(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Create many users in one transaction outside the request cycle.
+
+    :param rows: Field values of each user.
+    :return: Number and ids of the created users.
+    """
+    async with async_session() as session:
+        users = await UserService(session).bulk_create(rows)
+    return {"created": len(users), "ids": [user.id for user in users]}
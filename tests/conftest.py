@@ -0,0 +1,16 @@
+"""
+Test configuration
+"""
+
+import os
+
+# Settings required at import time; tests use their own engines.
+for name, value in {
+    "DB_TYPE": "postgres",
+    "DB_USER": "postgres",
+    "DB_NAME": "fastapi_db",
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_PASSWORD": "password",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,169 @@
+"""
+Tests of the write-behind buffer
+"""
+
+import sys
+import asyncio
+
+from sqlalchemy import String
+from sqlalchemy import select
+from sqlalchemy.orm import Mapped
+from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.orm import mapped_column
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from src.interfaces.service import BaseService
+from utils.caches.near import NearCache
+from utils.buffers.write_behind import MemoryStore
+from utils.buffers.write_behind import WriteBehindBuffer
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Item(Base):
+    __tablename__ = "items"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str] = mapped_column(String(50))
+    email: Mapped[str] = mapped_column(String(50), unique=True)
+
+
+def run(test):
+    """
+    Run a test coroutine against a fresh SQLite database holding one item,
+    with a service whose `name` updates are buffered.
+    """
+    async def main():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        try:
+            async with engine.begin() as connection:
+                await connection.run_sync(Base.metadata.create_all)
+                await connection.execute(
+                    Item.__table__.insert(),
+                    {"id": 1, "name": "initial", "email": "e0"},
+                )
+            factory = async_sessionmaker(engine, expire_on_commit=False)
+            async with factory() as session:
+                service = BaseService(session, Item)
+                service.write_behind = WriteBehindBuffer(
+                    Item, frozenset({"name"}), MemoryStore(), factory
+                )
+                await test(service, factory)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(main())
+
+
+async def stored(factory, column):
+    async with factory() as session:
+        return (await session.execute(
+            select(getattr(Item, column)).where(Item.id == 1)
+        )).scalar_one()
+
+
+def test_update_is_buffered_until_flush():
+    async def test(service, factory):
+        record = await service.update(1, name="A")
+        assert record.name == "A"
+        assert await stored(factory, "name") == "initial"
+        assert await service.write_behind.flush() == 1
+        assert await stored(factory, "name") == "A"
+
+    run(test)
+
+
+def test_flush_invalidates_near_cache(monkeypatch):
+    cache = NearCache(enabled=True, tables=["items"], transport="none")
+    module = sys.modules[WriteBehindBuffer.__module__]
+    monkeypatch.setattr(module, "near_cache", cache)
+
+    async def test(service, factory):
+        await service.update(1, name="A")
+        async with factory() as session:
+            record = await session.get(Item, 1)
+        cache.cache(Item).put(record, cache.cache(Item).epoch)
+        assert len(cache.cache(Item)) == 1
+        await service.write_behind.flush()
+        assert len(cache.cache(Item)) == 0
+
+    run(test)
+
+
+def test_direct_update_drops_older_buffered_change():
+    async def test(service, factory):
+        await service.update(1, name="A")
+        await service.update(1, name="B", email="e1")
+        await service.write_behind.flush()
+        assert await stored(factory, "name") == "B"
+        assert await stored(factory, "email") == "e1"
+
+    run(test)
+
+
+def test_direct_update_of_buffered_value_is_written():
+    async def test(service, factory):
+        await service.update(1, name="A")
+        await service.update(1, name="A", email="e1")
+        assert await service.write_behind.pending(1) == {}
+        assert await stored(factory, "name") == "A"
+
+    run(test)
+
+
+def test_newer_buffered_change_survives_direct_update():
+    async def test(service, factory):
+        await service.update(1, name="A", email="e1")
+        await service.update(1, name="B")
+        await service.write_behind.flush()
+        assert await stored(factory, "name") == "B"
+
+    run(test)
+
+
+def test_upsert_drops_older_buffered_change():
+    async def test(service, factory):
+        await service.update(1, name="A")
+        await service.upsert(["id"], id=1, name="B", email="e0")
+        await service.write_behind.flush()
+        assert await stored(factory, "name") == "B"
+
+    run(test)
+
+
+def test_upsert_on_other_key_drops_older_buffered_change():
+    async def test(service, factory):
+        await service.update(1, name="A")
+        await service.upsert(["email"], name="B", email="e0")
+        await service.write_behind.flush()
+        assert await stored(factory, "name") == "B"
+
+    run(test)
+
+
+def test_batch_drops_older_buffered_change():
+    async def test(service, factory):
+        await service.update(1, name="A")
+        await service.batch([("update", 1, {"name": "B", "email": "e1"})])
+        await service.write_behind.flush()
+        assert await stored(factory, "name") == "B"
+
+    run(test)
+
+
+def test_failed_direct_update_restores_buffered_change():
+    async def test(service, factory):
+        await service.update(1, name="A")
+        await service.upsert(["id"], id=2, name="other", email="e2")
+        try:
+            await service.update(1, name="B", email="e2")
+        except Exception:
+            pass
+        else:
+            raise AssertionError("duplicate email was written")
+        assert await service.write_behind.pending(1) == {"name": "A"}
+
+    run(test)
@@ -3,4 +3,8 @@ Initialize utils
 """
 from .helpers import * # noqa
 from .limiters import * # noqa
+from .metrics import * # noqa
+from .middlewares import * # noqa
 from .paginations import * # noqa
+from .queues import * # noqa
+from .schedulers import * # noqa
@@ -0,0 +1,5 @@
+"""
+Initialize buffers
+"""
+
+from .write_behind import * # noqa
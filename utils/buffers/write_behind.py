@@ -0,0 +1,638 @@
+"""
+Write-behind buffer coalescing hot-row updates
+"""
+
+import json
+import time
+import uuid
+import asyncio
+import logging
+
+from typing import Any
+from typing import Set
+from typing import Dict
+from typing import List
+from typing import Tuple
+from typing import Callable
+from typing import Iterable
+from typing import Optional
+from typing import FrozenSet
+
+from sqlalchemy import update
+from sqlalchemy import inspect
+from sqlalchemy import bindparam
+
+from db.registry import registry
+from libs.environs import env
+from utils.caches.near import near_cache
+from utils.metrics.collectors import WRITE_BEHIND_UPDATES
+from utils.metrics.collectors import WRITE_BEHIND_FLUSHED
+
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_ENABLED = env.bool("WRITE_BEHIND_ENABLED", default=False)
+# Designated columns, as '<table>.<column>' entries, e.g. 'users.name'.
+WRITE_BEHIND_FIELDS = env.list("WRITE_BEHIND_FIELDS", default=[])
+WRITE_BEHIND_DURABILITY = env.str("WRITE_BEHIND_DURABILITY", default="memory")
+WRITE_BEHIND_FLUSH_SIZE = env.int("WRITE_BEHIND_FLUSH_SIZE", default=500)
+WRITE_BEHIND_FLUSH_INTERVAL = env.float(
+    "WRITE_BEHIND_FLUSH_INTERVAL", default=1.0
+)
+WRITE_BEHIND_MAX_PENDING = env.int("WRITE_BEHIND_MAX_PENDING", default=10000)
+WRITE_BEHIND_LOCK_TTL = env.float("WRITE_BEHIND_LOCK_TTL", default=30.0)
+# Number of server processes; set by `python -m src.commands.serve`.
+WEB_WORKERS = env.int("WEB_WORKERS", default=1)
+
+DURABILITY_LEVELS = ("memory", "redis")
+
+TAKE_SCRIPT = """
+local ids = redis.call('spop', KEYS[1], ARGV[2])
+local rows = {}
+for _, id in ipairs(ids) do
+    local key = ARGV[1] .. id
+    rows[#rows + 1] = id
+    rows[#rows + 1] = redis.call('hgetall', key)
+    redis.call('del', key)
+end
+return rows
+"""
+
+RESTORE_SCRIPT = """
+for i = 2, #ARGV, 3 do
+    local key = ARGV[1] .. ARGV[i]
+    if redis.call('hsetnx', key, ARGV[i + 1], ARGV[i + 2]) == 1 then
+        redis.call('sadd', KEYS[1], ARGV[i])
+    end
+end
+return 1
+"""
+
+DISCARD_SCRIPT = """
+local key = ARGV[1] .. ARGV[2]
+local values = {}
+for i = 3, #ARGV do
+    local value = redis.call('hget', key, ARGV[i])
+    if value then
+        values[#values + 1] = ARGV[i]
+        values[#values + 1] = value
+        redis.call('hdel', key, ARGV[i])
+    end
+end
+if redis.call('exists', key) == 0 then
+    redis.call('srem', KEYS[1], ARGV[2])
+end
+return values
+"""
+
+UNLOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+Changes = Dict[Any, Dict[str, Any]]
+
+
+def _decode(value: Any) -> Any:
+    """
+    Decode bytes returned by Redis into str.
+    """
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class MemoryStore:
+    """
+    Pending changes held in the worker process.
+
+    Fastest, but changes not yet flushed are lost if the process dies
+    without a clean shutdown, and each worker coalesces on its own.
+    """
+
+    def __init__(self):
+        self._pending: Changes = {}
+
+    async def put(self, record_id: Any, values: Dict[str, Any]) -> int:
+        """
+        Merge changes of a row; return the number of pending rows.
+        """
+        self._pending.setdefault(record_id, {}).update(values)
+        return len(self._pending)
+
+    async def get(self, record_id: Any) -> Dict[str, Any]:
+        """
+        Return the pending changes of a row.
+        """
+        return dict(self._pending.get(record_id, {}))
+
+    async def take(self, limit: int) -> Changes:
+        """
+        Remove and return the changes of up to `limit` rows.
+        """
+        ids = list(self._pending)[:limit]
+        return {record_id: self._pending.pop(record_id) for record_id in ids}
+
+    async def restore(self, changes: Changes) -> None:
+        """
+        Put back changes that could not be written, without overwriting
+        newer changes made since they were taken.
+        """
+        for record_id, values in changes.items():
+            pending = self._pending.setdefault(record_id, {})
+            for field, value in values.items():
+                pending.setdefault(field, value)
+
+    async def discard(
+        self, record_id: Any, columns: Iterable[str]
+    ) -> Dict[str, Any]:
+        """
+        Remove and return the pending changes of a row to `columns`.
+        """
+        pending = self._pending.get(record_id)
+        if not pending:
+            return {}
+        values = {c: pending.pop(c) for c in columns if c in pending}
+        if not pending:
+            del self._pending[record_id]
+        return values
+
+    async def size(self) -> int:
+        """
+        Return the number of pending rows.
+        """
+        return len(self._pending)
+
+
+class RedisStore:
+    """
+    Pending changes held in Redis, shared by every worker.
+
+    Each row's changes live in a `write-behind:<table>:<id>` hash, and
+    the ids of rows with changes in the `write-behind:<table>` set, so
+    updates of a row coalesce across workers and survive a worker crash,
+    as far as Redis persistence allows. Values are stored as JSON.
+    """
+
+    def __init__(self, table: str, client: Any = None):
+        """
+        Initialize the store of a table.
+
+        :param table: Table name, used in the Redis keys.
+        :param client: redis.asyncio client; defaults to the registry's.
+        """
+        self.dirty = f"write-behind:{table}"
+        self.prefix = f"write-behind:{table}:"
+        self._client = client
+
+    @property
+    def client(self) -> Any:
+        """
+        The asyncio Redis client given to the constructor, or else the
+        registry's, looked up on every access.
+        """
+        if self._client is not None:
+            return self._client
+        return registry.get("redis_async")
+
+    async def put(self, record_id: Any, values: Dict[str, Any]) -> int:
+        """
+        Merge changes of a row; return the number of pending rows.
+        """
+        mapping = {field: json.dumps(value) for field, value in values.items()}
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(f"{self.prefix}{record_id}", mapping=mapping)
+            pipe.sadd(self.dirty, str(record_id))
+            pipe.scard(self.dirty)
+            *_, size = await pipe.execute()
+        return size
+
+    async def get(self, record_id: Any) -> Dict[str, Any]:
+        """
+        Return the pending changes of a row.
+        """
+        values = await self.client.hgetall(f"{self.prefix}{record_id}")
+        return {
+            _decode(field): json.loads(value)
+            for field, value in values.items()
+        }
+
+    async def take(self, limit: int) -> Changes:
+        """
+        Atomically remove and return the changes of up to `limit` rows.
+        """
+        rows = await self.client.eval(
+            TAKE_SCRIPT, 1, self.dirty, self.prefix, limit
+        )
+        changes: Changes = {}
+        for record_id, flat in zip(rows[::2], rows[1::2]):
+            changes[_decode(record_id)] = {
+                _decode(flat[i]): json.loads(flat[i + 1])
+                for i in range(0, len(flat), 2)
+            }
+        return changes
+
+    async def restore(self, changes: Changes) -> None:
+        """
+        Put back changes that could not be written, without overwriting
+        newer changes made since they were taken.
+        """
+        args: List[Any] = [self.prefix]
+        for record_id, values in changes.items():
+            for field, value in values.items():
+                args += [str(record_id), field, json.dumps(value)]
+        if len(args) > 1:
+            await self.client.eval(RESTORE_SCRIPT, 1, self.dirty, *args)
+
+    async def discard(
+        self, record_id: Any, columns: Iterable[str]
+    ) -> Dict[str, Any]:
+        """
+        Atomically remove and return the pending changes of a row to
+        `columns`.
+        """
+        flat = await self.client.eval(
+            DISCARD_SCRIPT, 1, self.dirty, self.prefix, str(record_id),
+            *columns,
+        )
+        return {
+            _decode(flat[i]): json.loads(flat[i + 1])
+            for i in range(0, len(flat), 2)
+        }
+
+    async def size(self) -> int:
+        """
+        Return the number of pending rows.
+        """
+        return await self.client.scard(self.dirty)
+
+
+class WriteBehindBuffer:
+    """
+    Coalesces updates of designated columns of a table and writes them
+    in batches.
+
+    `add` merges the changes of a row into the store instead of running
+    an UPDATE, so a row patched many times between two flushes is written
+    once, with its latest values. Changes are flushed every
+    `flush_interval` seconds and as soon as `flush_size` rows are pending,
+    with one executemany UPDATE per set of changed columns in a single
+    transaction. Writers wait for a flush only when `max_pending` rows are
+    pending. A failed flush puts its changes back for the next one.
+
+    With the Redis store, flushes of all workers are serialized by a
+    Redis lock, so two batches of the same row cannot commit out of
+    order.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        fields: FrozenSet[str],
+        store: Any,
+        session_factory: Callable[[], Any],
+        flush_size: int = WRITE_BEHIND_FLUSH_SIZE,
+        flush_interval: float = WRITE_BEHIND_FLUSH_INTERVAL,
+        max_pending: int = WRITE_BEHIND_MAX_PENDING,
+    ):
+        """
+        Initialize the buffer of a model.
+
+        :param model: SQLAlchemy model of the table.
+        :param fields: Columns whose updates are buffered.
+        :param store: MemoryStore or RedisStore holding pending changes.
+        :param session_factory: Creates the AsyncSession of a flush.
+        :param flush_size: Pending rows triggering a flush.
+        :param flush_interval: Seconds between periodic flushes.
+        :param max_pending: Pending rows at which writers flush inline.
+        """
+        self.model = model
+        self.table = model.__table__
+        self.primary_key = inspect(model).primary_key[0]
+        self.fields = fields
+        self.store = store
+        self.session_factory = session_factory
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._flushes: Set[asyncio.Task] = set()
+
+    def accepts(self, values: Dict[str, Any]) -> bool:
+        """
+        Check whether an update only touches designated columns.
+        """
+        return bool(values) and set(values) <= self.fields
+
+    async def add(self, record_id: Any, values: Dict[str, Any]) -> None:
+        """
+        Buffer changes of a row.
+
+        :param record_id: Primary key of the row.
+        :param values: New values of designated columns.
+        """
+        pending = await self.store.put(record_id, values)
+        WRITE_BEHIND_UPDATES.inc((self.table.name,))
+        if pending >= self.max_pending:
+            await self.flush()
+        elif pending >= self.flush_size and not self._flushes:
+            task = asyncio.get_running_loop().create_task(self.flush())
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def pending(self, record_id: Any) -> Dict[str, Any]:
+        """
+        Return the changes of a row not yet written.
+        """
+        return await self.store.get(record_id)
+
+    async def discard(self, writes: Dict[Any, Iterable[str]]) -> Changes:
+        """
+        Drop pending changes that direct writes are about to overwrite.
+
+        An UPDATE or upsert that bypasses the buffer commits at once, so
+        older pending values of the columns it writes would otherwise be
+        flushed over its newer ones. Flushes of this worker, and with the
+        Redis store of every worker, are waited for first, so a batch
+        already taken cannot commit after the direct write either.
+
+        :param writes: Columns about to be written, by primary key.
+        :return: The dropped changes, to `restore` if the write fails.
+        """
+        writes = {
+            record_id: self.fields.intersection(columns)
+            for record_id, columns in writes.items()
+        }
+        writes = {k: columns for k, columns in writes.items() if columns}
+        if not writes:
+            return {}
+        dropped: Changes = {}
+        async with self._lock:
+            token = await self._wait_acquire()
+            try:
+                for record_id, columns in writes.items():
+                    values = await self.store.discard(record_id, columns)
+                    if values:
+                        dropped[record_id] = values
+            finally:
+                await self._release(token)
+        return dropped
+
+    async def restore(self, changes: Changes) -> None:
+        """
+        Put back dropped changes whose direct write failed, without
+        overwriting newer ones.
+        """
+        if changes:
+            await self.store.restore(changes)
+
+    async def flush(self) -> int:
+        """
+        Write every pending change.
+
+        :return: Number of rows written.
+        """
+        written = 0
+        async with self._lock:
+            while True:
+                count = await self._flush_batch()
+                written += count
+                if count < self.flush_size:
+                    return written
+
+    async def _flush_batch(self) -> int:
+        """
+        Write up to `flush_size` pending rows in one transaction.
+
+        The rows are dropped from the near-caches once committed: a read
+        between `take` and the commit sees neither the pending changes
+        nor the new values and may have cached the old row.
+        """
+        token = await self._acquire()
+        if token is None:
+            return 0
+        try:
+            changes = await self.store.take(self.flush_size)
+            if not changes:
+                return 0
+            try:
+                await self._write(changes)
+            except Exception:
+                await self.store.restore(changes)
+                raise
+        finally:
+            await self._release(token)
+        await near_cache.invalidate(self.table.name, changes)
+        WRITE_BEHIND_FLUSHED.inc((self.table.name,), len(changes))
+        return len(changes)
+
+    async def _write(self, changes: Changes) -> None:
+        """
+        Run one executemany UPDATE per set of changed columns.
+        """
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for record_id, values in changes.items():
+            columns = tuple(sorted(values))
+            groups.setdefault(columns, []).append({
+                "_id": self._cast_id(record_id),
+                **{f"_{column}": values[column] for column in columns},
+            })
+        async with self.session_factory() as session:
+            for columns, rows in groups.items():
+                statement = (
+                    update(self.table)
+                    .where(self.primary_key == bindparam("_id"))
+                    .values({c: bindparam(f"_{c}") for c in columns})
+                )
+                await session.execute(statement, rows)
+            await session.commit()
+
+    def _cast_id(self, record_id: Any) -> Any:
+        """
+        Convert an id read back from Redis to the primary key's type.
+        """
+        try:
+            python_type = self.primary_key.type.python_type
+        except NotImplementedError:
+            return record_id
+        return record_id if isinstance(record_id, python_type) else (
+            python_type(record_id)
+        )
+
+    async def _acquire(self) -> Optional[str]:
+        """
+        Take the cross-worker flush lock of a Redis store.
+
+        :return: Lock token, '' without a Redis store, or None when
+            another worker is flushing.
+        """
+        if not isinstance(self.store, RedisStore):
+            return ""
+        token = uuid.uuid4().hex
+        acquired = await self.store.client.set(
+            f"{self.store.dirty}:lock", token,
+            nx=True, px=int(WRITE_BEHIND_LOCK_TTL * 1000),
+        )
+        return token if acquired else None
+
+    async def _wait_acquire(self) -> str:
+        """
+        Take the cross-worker flush lock, waiting for another worker's
+        flush to end, at most until its lock expires.
+        """
+        deadline = time.monotonic() + WRITE_BEHIND_LOCK_TTL
+        while True:
+            token = await self._acquire()
+            if token is not None:
+                return token
+            if time.monotonic() >= deadline:
+                return ""
+            await asyncio.sleep(0.01)
+
+    async def _release(self, token: str) -> None:
+        if token:
+            await self.store.client.eval(
+                UNLOCK_SCRIPT, 1, f"{self.store.dirty}:lock", token
+            )
+
+    def start(self) -> None:
+        """
+        Start the periodic flush on the running event loop.
+        """
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            started = time.perf_counter()
+            try:
+                count = await self.flush()
+            except Exception as e:
+                logger.warning(
+                    "Write-behind flush of %s failed: %s", self.table.name, e
+                )
+                continue
+            if count:
+                logger.debug(
+                    "Flushed %d %s rows in %.1f ms", count, self.table.name,
+                    (time.perf_counter() - started) * 1000,
+                )
+
+    async def shutdown(self) -> None:
+        """
+        Stop the periodic flush and write what is still pending.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+        await self.flush()
+        if await self.store.size():
+            logger.warning(
+                "Write-behind changes of %s left pending at shutdown",
+                self.table.name,
+            )
+
+
+class WriteBehind:
+    """
+    Write-behind buffers of the tables listed in WRITE_BEHIND_FIELDS.
+
+    Durability is chosen with WRITE_BEHIND_DURABILITY: 'memory' keeps
+    pending changes in each worker and loses them if a worker dies
+    without a clean shutdown; 'redis' keeps them in Redis, shared by the
+    workers. With several workers, 'memory' may also reorder updates of
+    a row sent to different workers, so 'redis' should be preferred.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = WRITE_BEHIND_ENABLED,
+        fields: Optional[List[str]] = None,
+        durability: str = WRITE_BEHIND_DURABILITY,
+    ):
+        """
+        Initialize the buffers' configuration.
+
+        :param enabled: Whether updates are buffered at all.
+        :param fields: '<table>.<column>' entries of designated columns.
+        :param durability: 'memory' or 'redis'.
+        :raises ValueError: If the durability level is unknown.
+        """
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(
+                f"Unknown write-behind durability '{durability}'"
+            )
+        self.enabled = enabled
+        self.durability = durability
+        self.fields: Dict[str, FrozenSet[str]] = {}
+        for entry in WRITE_BEHIND_FIELDS if fields is None else fields:
+            table, _, column = entry.partition(".")
+            self.fields[table] = self.fields.get(table, frozenset()) | {column}
+        self._buffers: Dict[str, WriteBehindBuffer] = {}
+
+    def buffer(self, model: Any) -> Optional[WriteBehindBuffer]:
+        """
+        Return the buffer of a model, or None if none of its columns are
+        designated.
+
+        :param model: SQLAlchemy model.
+        """
+        table = getattr(model, "__tablename__", None)
+        if not self.enabled or table not in self.fields:
+            return None
+        buffer = self._buffers.get(table)
+        if buffer is None:
+            from db.storage.postgres import async_session
+
+            if self.durability == "redis":
+                store = RedisStore(table)
+            else:
+                store = MemoryStore()
+            buffer = self._buffers[table] = WriteBehindBuffer(
+                model, self.fields[table], store, async_session
+            )
+        return buffer
+
+    async def start(self) -> None:
+        """
+        Start the periodic flush of the buffer of every mapped model
+        with designated columns.
+        """
+        if not self.enabled:
+            return
+        if self.durability == "memory" and WEB_WORKERS > 1:
+            logger.warning(
+                "Write-behind buffers are per worker with %d workers; "
+                "set WRITE_BEHIND_DURABILITY=redis to coalesce across them",
+                WEB_WORKERS,
+            )
+        from db.storage.postgres import Base
+
+        for mapper in Base.registry.mappers:
+            buffer = self.buffer(mapper.class_)
+            if buffer is not None:
+                buffer.start()
+
+    async def shutdown(self) -> None:
+        """
+        Flush every buffer and stop the periodic flushes.
+        """
+        for buffer in list(self._buffers.values()):
+            try:
+                await buffer.shutdown()
+            except Exception as e:
+                logger.error(
+                    "Write-behind flush of %s failed at shutdown: %s",
+                    buffer.table.name, e,
+                )
+
+
+write_behind = WriteBehind()
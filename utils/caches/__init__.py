@@ -0,0 +1,5 @@
+"""
+Initialize caches
+"""
+
+from .near import * # noqa
@@ -0,0 +1,481 @@
+"""
+In-process near-cache of records with cross-worker invalidation
+"""
+
+import sys
+import copy
+import json
+import time
+import uuid
+import asyncio
+import logging
+
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Callable
+from typing import Iterable
+from typing import Optional
+from collections import OrderedDict
+
+from sqlalchemy import text
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from db.registry import registry
+from libs.environs import env
+from utils.metrics.collectors import NEAR_CACHE_BYTES
+from utils.metrics.collectors import NEAR_CACHE_REQUESTS
+from utils.metrics.collectors import NEAR_CACHE_INVALIDATIONS
+
+
+logger = logging.getLogger(__name__)
+
+NEAR_CACHE_ENABLED = env.bool("NEAR_CACHE_ENABLED", default=False)
+# Cached tables, e.g. 'users'; every mapped table when empty.
+NEAR_CACHE_TABLES = env.list("NEAR_CACHE_TABLES", default=[])
+NEAR_CACHE_MAX_ENTRIES = env.int("NEAR_CACHE_MAX_ENTRIES", default=10000)
+NEAR_CACHE_MAX_BYTES = env.int(
+    "NEAR_CACHE_MAX_BYTES", default=64 * 1024 * 1024
+)
+NEAR_CACHE_TTL = env.float("NEAR_CACHE_TTL", default=30.0)
+NEAR_CACHE_TRANSPORT = env.str("NEAR_CACHE_TRANSPORT", default="redis")
+NEAR_CACHE_CHANNEL = env.str("NEAR_CACHE_CHANNEL", default="near_cache")
+
+TRANSPORTS = ("redis", "postgres", "none")
+# Ids per message; PostgreSQL NOTIFY payloads are limited to 8000 bytes.
+MESSAGE_IDS = 500
+RECONNECT_DELAY = 1.0
+MUTABLE_TYPES = (dict, list, set)
+
+
+def _copy(value: Any) -> Any:
+    """
+    Copy mutable column values, so callers cannot alter cached ones.
+    """
+    return copy.deepcopy(value) if isinstance(value, MUTABLE_TYPES) else value
+
+
+def _size(values: Dict[str, Any]) -> int:
+    """
+    Estimate the memory held by a record's column values.
+    """
+    return sys.getsizeof(values) + sum(
+        sys.getsizeof(key) + sys.getsizeof(value)
+        for key, value in values.items()
+    )
+
+
+class ModelCache:
+    """
+    Bounded LRU cache of the column values of one model's records.
+
+    Entries expire `ttl` seconds after they were stored, which bounds how
+    stale a record can be if an invalidation is lost. Least recently used
+    entries are evicted once there are more than `max_entries` of them or
+    their estimated size exceeds `max_bytes`.
+
+    An inactive cache, e.g. of a worker whose invalidation subscription
+    is down, neither serves nor stores records.
+
+    Each invalidation bumps `epoch`. A read records the epoch before
+    going to the database and `put` drops the result if the epoch moved
+    meanwhile, so a value loaded before a concurrent write is never
+    cached after that write's invalidation.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        max_entries: int = NEAR_CACHE_MAX_ENTRIES,
+        max_bytes: int = NEAR_CACHE_MAX_BYTES,
+        ttl: float = NEAR_CACHE_TTL,
+    ):
+        """
+        Initialize an empty cache.
+
+        :param model: SQLAlchemy model.
+        :param max_entries: Maximum number of records.
+        :param max_bytes: Maximum estimated size of the records.
+        :param ttl: Seconds a record stays cached.
+        """
+        self.model = model
+        self.table = inspect(model).local_table.name
+        self.columns = [attr.key for attr in inspect(model).column_attrs]
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.active = True
+        self.epoch = 0
+        self.bytes = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, record_id: Any) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached column values of a record.
+
+        :param record_id: Primary key of the record.
+        :return: Column values, or None on a miss.
+        """
+        entry = self._lookup(record_id)
+        if entry is None:
+            return None
+        return {name: _copy(value) for name, value in entry[1].items()}
+
+    async def load(self, session: Any, record_id: Any) -> Optional[Any]:
+        """
+        Return a cached record attached to a session, without a query.
+
+        The record is persistent and clean, as if just loaded, so it can
+        be updated or deleted through the session as usual. Its identity
+        token, the shard it was loaded from with sharding, is restored.
+
+        :param session: Async SQLAlchemy session.
+        :param record_id: Primary key of the record.
+        :return: Model instance, or None on a miss.
+        """
+        entry = self._lookup(record_id)
+        if entry is None:
+            return None
+        record = inspect(self.model).class_manager.new_instance()
+        for name, value in entry[1].items():
+            set_committed_value(record, name, _copy(value))
+        make_transient_to_detached(record)
+        state = inspect(record)
+        state.key = (*state.key[:2], entry[3])
+        return await session.merge(record, load=False)
+
+    def _lookup(self, record_id: Any) -> Optional[tuple]:
+        """
+        Return the live entry of a record, counting the hit or miss.
+        """
+        if not self.active:
+            return None
+        key = str(record_id)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] < time.monotonic():
+            self._evict(key)
+            entry = None
+        if entry is None:
+            NEAR_CACHE_REQUESTS.inc((self.table, "miss"))
+            return None
+        self._entries.move_to_end(key)
+        NEAR_CACHE_REQUESTS.inc((self.table, "hit"))
+        return entry
+
+    def put(self, record: Any, epoch: int) -> None:
+        """
+        Cache a record's column values.
+
+        :param record: Model instance loaded from the database.
+        :param epoch: `epoch` read before the record was loaded.
+        """
+        if not self.active or epoch != self.epoch:
+            return
+        values = {
+            name: _copy(getattr(record, name)) for name in self.columns
+        }
+        state = inspect(record)
+        key = str(state.identity[0])
+        self._evict(key)
+        size = _size(values)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (
+            time.monotonic() + self.ttl, values, size, state.identity_token
+        )
+        self.bytes += size
+        while (
+            len(self._entries) > self.max_entries
+            or self.bytes > self.max_bytes
+        ):
+            self._evict(next(iter(self._entries)))
+        NEAR_CACHE_BYTES.set(self.bytes, (self.table,))
+
+    def invalidate(self, record_ids: Iterable[Any]) -> None:
+        """
+        Drop records from the cache.
+
+        :param record_ids: Primary keys of the records.
+        """
+        self.epoch += 1
+        for record_id in record_ids:
+            self._evict(str(record_id))
+        NEAR_CACHE_BYTES.set(self.bytes, (self.table,))
+
+    def clear(self) -> None:
+        """
+        Drop every record.
+        """
+        self.epoch += 1
+        self._entries.clear()
+        self.bytes = 0
+        NEAR_CACHE_BYTES.set(0, (self.table,))
+
+    def _evict(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+
+class RedisTransport:
+    """
+    Invalidation messages over Redis pub/sub.
+    """
+
+    def __init__(self, channel: str = NEAR_CACHE_CHANNEL):
+        """
+        :param channel: Pub/sub channel.
+        """
+        self.channel = channel
+
+    async def publish(self, payload: str) -> None:
+        await registry.get("redis_async").publish(self.channel, payload)
+
+    async def listen(
+        self,
+        on_message: Callable[[str], None],
+        on_state: Callable[[bool], None],
+    ) -> None:
+        """
+        Deliver messages until cancelled, resubscribing after errors.
+
+        :param on_message: Called with each payload.
+        :param on_state: Called with True once subscribed and with False
+            when the subscription is lost.
+        """
+        while True:
+            pubsub = registry.get("redis_async").pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                on_state(True)
+                while True:
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=1.0
+                    )
+                    if message is not None:
+                        on_message(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                on_state(False)
+                logger.warning("Near-cache subscription lost: %s", e)
+                await asyncio.sleep(RECONNECT_DELAY)
+            finally:
+                await pubsub.aclose()
+
+
+class PostgresTransport:
+    """
+    Invalidation messages over PostgreSQL LISTEN/NOTIFY.
+
+    The listener holds a dedicated asyncpg connection per worker, outside
+    the engine's pool.
+    """
+
+    def __init__(self, channel: str = NEAR_CACHE_CHANNEL):
+        """
+        :param channel: Notification channel.
+        """
+        self.channel = channel
+
+    async def publish(self, payload: str) -> None:
+        async with registry.get("postgres").connect() as connection:
+            await connection.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": self.channel, "payload": payload},
+            )
+            await connection.commit()
+
+    async def listen(
+        self,
+        on_message: Callable[[str], None],
+        on_state: Callable[[bool], None],
+    ) -> None:
+        """
+        Deliver notifications until cancelled, reconnecting after errors.
+
+        :param on_message: Called with each payload.
+        :param on_state: Called with True once listening and with False
+            when the connection is lost.
+        """
+        import asyncpg
+
+        from db.storage.postgres.connection import db_url
+
+        dsn = db_url.replace("+asyncpg", "")
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(dsn)
+                await connection.add_listener(
+                    self.channel,
+                    lambda _c, _pid, _channel, payload: on_message(payload),
+                )
+                on_state(True)
+                while not connection.is_closed():
+                    await asyncio.sleep(RECONNECT_DELAY)
+                on_state(False)
+                logger.warning("Near-cache listener connection closed")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                on_state(False)
+                logger.warning("Near-cache listener lost: %s", e)
+                await asyncio.sleep(RECONNECT_DELAY)
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+
+
+class NearCache:
+    """
+    Per-worker near-caches of the records read by id through the service
+    layer, kept coherent across workers by invalidation messages.
+
+    Writes invalidate the local cache at once and publish the ids to the
+    other workers over NEAR_CACHE_TRANSPORT: 'redis' (pub/sub), 'postgres'
+    (LISTEN/NOTIFY) or 'none' for a single worker. Another worker's cache
+    is stale for at most the message delivery delay. Caches stay inactive
+    until the worker is subscribed and are emptied whenever the
+    subscription drops, so no record is served that an invalidation may
+    have missed; NEAR_CACHE_TTL bounds staleness in any case.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = NEAR_CACHE_ENABLED,
+        tables: Optional[List[str]] = None,
+        transport: str = NEAR_CACHE_TRANSPORT,
+    ):
+        """
+        Initialize the caches' configuration.
+
+        :param enabled: Whether reads are cached at all.
+        :param tables: Cached tables; every table when empty.
+        :param transport: 'redis', 'postgres' or 'none'.
+        :raises ValueError: If the transport is unknown.
+        """
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Unknown near-cache transport '{transport}'")
+        self.enabled = enabled
+        self.tables = set(NEAR_CACHE_TABLES if tables is None else tables)
+        self.transport = None
+        if transport == "redis":
+            self.transport = RedisTransport()
+        elif transport == "postgres":
+            self.transport = PostgresTransport()
+        self.connected = self.transport is None
+        self.origin = uuid.uuid4().hex
+        self._caches: Dict[str, ModelCache] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def cache(self, model: Any) -> Optional[ModelCache]:
+        """
+        Return the cache of a model, or None if it is not cached.
+
+        :param model: SQLAlchemy model.
+        """
+        table = getattr(model, "__tablename__", None)
+        if not self.enabled or table is None:
+            return None
+        if self.tables and table not in self.tables:
+            return None
+        cache = self._caches.get(table)
+        if cache is None:
+            cache = self._caches[table] = ModelCache(model)
+            cache.active = self.connected
+        return cache
+
+    async def invalidate(self, table: str, record_ids: Iterable[Any]) -> None:
+        """
+        Drop records from this worker's cache and the other workers'.
+
+        :param table: Table name.
+        :param record_ids: Primary keys of the written records.
+        """
+        record_ids = [
+            record_id for record_id in record_ids if record_id is not None
+        ]
+        if not record_ids:
+            return
+        cache = self._caches.get(table)
+        if cache is not None:
+            cache.invalidate(record_ids)
+        NEAR_CACHE_INVALIDATIONS.inc((table, "local"), len(record_ids))
+        if self.transport is None:
+            return
+        for start in range(0, len(record_ids), MESSAGE_IDS):
+            payload = json.dumps({
+                "origin": self.origin,
+                "table": table,
+                "ids": record_ids[start:start + MESSAGE_IDS],
+            }, default=str)
+            try:
+                await self.transport.publish(payload)
+            except Exception as e:
+                logger.warning("Near-cache invalidation not sent: %s", e)
+
+    def _receive(self, payload: Any) -> None:
+        """
+        Apply an invalidation message from another worker.
+        """
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        if message.get("origin") == self.origin:
+            return
+        cache = self._caches.get(message.get("table"))
+        if cache is not None:
+            cache.invalidate(message.get("ids", ()))
+            NEAR_CACHE_INVALIDATIONS.inc(
+                (cache.table, "remote"), len(message.get("ids", ()))
+            )
+
+    def clear(self) -> None:
+        """
+        Drop every cached record of this worker.
+        """
+        for cache in self._caches.values():
+            cache.clear()
+
+    def _set_connected(self, connected: bool) -> None:
+        """
+        Activate the caches once subscribed, empty and deactivate them
+        when the subscription drops.
+        """
+        self.connected = connected
+        for cache in self._caches.values():
+            cache.clear()
+            cache.active = connected
+
+    async def start(self) -> None:
+        """
+        Start listening for other workers' invalidations.
+        """
+        if not self.enabled or self.transport is None or self._task:
+            return
+        self._task = asyncio.get_running_loop().create_task(
+            self.transport.listen(self._receive, self._set_connected)
+        )
+
+    async def shutdown(self) -> None:
+        """
+        Stop listening and drop the cached records.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.clear()
+
+
+near_cache = NearCache()
@@ -3,3 +3,4 @@ Initialize helpers
 """
 
 from .pagination import * # noqa
+from .auth import * # noqa
@@ -0,0 +1,46 @@
+"""
+Admin authentication
+"""
+
+import hmac
+
+from fastapi import Header
+from fastapi import HTTPException
+
+from libs.environs import env
+
+
+ADMIN_TOKEN = env.str("ADMIN_TOKEN", default="")
+
+
+def token_matches(given: str, expected: str) -> bool:
+    """
+    Compare a secret in constant time.
+
+    Compares the UTF-8 bytes: `hmac.compare_digest` raises TypeError for
+    str holding non-ASCII characters, which a client can send at will.
+
+    Args:
+        given (str): Token sent by the client.
+        expected (str): Configured token.
+
+    Returns:
+        bool: True if the tokens are equal.
+    """
+    return hmac.compare_digest(given.encode(), expected.encode())
+
+
+async def require_admin(x_admin_token: str = Header(default="")):
+    """
+    Allow the request only with the configured X-Admin-Token header.
+
+    Admin endpoints stay closed while ADMIN_TOKEN is empty.
+
+    Args:
+        x_admin_token (str): Value of the X-Admin-Token header.
+
+    Raises:
+        HTTPException: 403 if the token is missing or wrong.
+    """
+    if not ADMIN_TOKEN or not token_matches(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Forbidden")
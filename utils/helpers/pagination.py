@@ -2,15 +2,31 @@
 Pagination and ID encoding/decoding utilities.
 """
 
-from sqlalchemy import func
+import json
+import base64
+
+from typing import Any
+from typing import List
 
-from cryptography import fernet
+from functools import lru_cache
+
+from sqlalchemy import func
 
 from libs.environs import env
 
 
-FERNET_KEY = env.str("FERNET_KEY")
-f = fernet.Fernet(FERNET_KEY)
+@lru_cache(maxsize=1)
+def get_fernet():
+    """
+    Build the Fernet cipher on first use, so importing this module does
+    not load cryptography or require FERNET_KEY.
+
+    Returns:
+        fernet.Fernet: Cipher keyed with FERNET_KEY.
+    """
+    from cryptography import fernet
+
+    return fernet.Fernet(env.str("FERNET_KEY"))
 
 
 async def get_count(db, q, model):
@@ -40,7 +56,7 @@ async def encode_id(identifier: int) -> str:
     Returns:
         str: The encoded identifier as a string.
     """
-    encoded_identifier = f.encrypt(str(identifier).encode())
+    encoded_identifier = get_fernet().encrypt(str(identifier).encode())
     return encoded_identifier.decode()
 
 
@@ -54,5 +70,45 @@ async def decode_id(token: str) -> int:
     Returns:
         int: The decoded identifier as an integer.
     """
-    encoded_identifier = f.decrypt(token.encode())
+    encoded_identifier = get_fernet().decrypt(token.encode())
     return int(encoded_identifier.decode())
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """
+    Encode keyset pagination values into an opaque URL-safe cursor.
+
+    Unlike `encode_id` the cursor is not encrypted: it only holds the sort
+    key of the last row served, which the client has already seen.
+
+    Args:
+        values (List[Any]): JSON-serializable sort key of the last row.
+
+    Returns:
+        str: The cursor string.
+    """
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """
+    Decode a cursor produced by `encode_cursor`.
+
+    Args:
+        cursor (str): The cursor string.
+
+    Returns:
+        List[Any]: The sort key values.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
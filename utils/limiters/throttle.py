@@ -9,7 +9,8 @@ from functools import wraps
 
 from fastapi import HTTPException
 
-from db.redis.broker import redis_client
+from db.registry import registry
+from utils.metrics.collectors import THROTTLE_DECISIONS
 
 
 class RequestLimiter:
@@ -20,16 +21,17 @@ class RequestLimiter:
 
     def __init__(self):
         """
-        Initialize with rate limit settings from environment variables.
+        Initialize with rate limit settings from environment variables,
+        falling back to 100 GETs and 30 writes per 60 seconds when unset.
         - LIMIT_GET: Maximum allowed requests for GET requests.
         - LIMIT_PPD: Maximum allowed requests for PATCH, POST, DELETE requests.
         - TIME_GET: Time window (in seconds) for GET requests.
         - TIME_PPD: Time window (in seconds) for PATCH, POST, DELETE requests.
         """
-        self.LIMIT_GET = int(os.getenv("LIMIT_GET"))
-        self.LIMIT_PPD = int(os.getenv("LIMIT_PPD"))
-        self.TIME_GET = int(os.getenv("TIME_GET"))
-        self.TIME_PPD = int(os.getenv("TIME_PPD"))
+        self.LIMIT_GET = int(os.getenv("LIMIT_GET") or 100)
+        self.LIMIT_PPD = int(os.getenv("LIMIT_PPD") or 30)
+        self.TIME_GET = int(os.getenv("TIME_GET") or 60)
+        self.TIME_PPD = int(os.getenv("TIME_PPD") or 60)
 
     def limiter(self, max_requests: int, period: int):
         """
@@ -56,9 +58,11 @@ class RequestLimiter:
                 current_time = int(time.time() // period)
                 action = func.__name__
                 redis_key = f"throttle:{client_ip}:{action}:{current_time}"
+                redis_client = registry.get("redis")
                 request_count = redis_client.get(redis_key)
 
                 if request_count and int(request_count) >= max_requests:
+                    THROTTLE_DECISIONS.inc((action, "rejected"))
                     raise HTTPException(
                         status_code=429,
                         detail="Too many requests. Please try again later"
@@ -66,6 +70,7 @@ class RequestLimiter:
 
                 redis_client.incr(redis_key)
                 redis_client.expire(redis_key, period)
+                THROTTLE_DECISIONS.inc((action, "accepted"))
 
                 return await func(*args, **kwargs)
 
@@ -0,0 +1,7 @@
+"""
+Initialize metrics
+"""
+
+from .registry import * # noqa
+from .multiprocess import * # noqa
+from .collectors import * # noqa
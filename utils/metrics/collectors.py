@@ -0,0 +1,268 @@
+"""
+Application metrics and datastore instrumentation
+"""
+
+import time
+import inspect
+import threading
+
+from typing import Any
+from typing import Dict
+from typing import Callable
+
+from weakref import WeakKeyDictionary
+
+from sqlalchemy import event
+
+from db.registry import registry
+from utils.metrics.registry import Labels
+from utils.metrics.registry import metrics
+
+
+HTTP_REQUEST_DURATION = metrics.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template and status.",
+    ["method", "route", "status"],
+)
+HTTP_REQUESTS_IN_FLIGHT = metrics.gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being handled.",
+)
+DB_POOL_CHECKOUT_WAIT = metrics.histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled SQL connection.",
+    ["backend"],
+)
+REDIS_COMMAND_DURATION = metrics.histogram(
+    "redis_command_duration_seconds",
+    "Redis command latency.",
+    ["backend", "command"],
+)
+MONGO_POOL_CONNECTIONS = metrics.gauge(
+    "mongo_pool_connections",
+    "MongoDB pool connections by state.",
+    ["state"],
+)
+MONGO_POOL_CHECKOUT_WAIT = metrics.histogram(
+    "mongo_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled MongoDB connection.",
+)
+MONGO_POOL_CHECKOUT_FAILURES = metrics.counter(
+    "mongo_pool_checkout_failures_total",
+    "Failed MongoDB connection checkouts by reason.",
+    ["reason"],
+)
+THROTTLE_DECISIONS = metrics.counter(
+    "throttle_decisions_total",
+    "RequestLimiter decisions by action and result.",
+    ["action", "result"],
+)
+SCHEDULER_JOB_DURATION = metrics.histogram(
+    "scheduler_job_duration_seconds",
+    "Scheduled job run time.",
+    ["job"],
+    buckets=(0.01, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0),
+)
+SCHEDULER_JOB_FAILURES = metrics.counter(
+    "scheduler_job_failures_total",
+    "Scheduled job runs that raised.",
+    ["job"],
+)
+WRITE_BEHIND_UPDATES = metrics.counter(
+    "write_behind_updates_total",
+    "Row updates buffered by the write-behind buffer.",
+    ["table"],
+)
+WRITE_BEHIND_FLUSHED = metrics.counter(
+    "write_behind_flushed_rows_total",
+    "Coalesced rows written by write-behind flushes.",
+    ["table"],
+)
+NEAR_CACHE_REQUESTS = metrics.counter(
+    "near_cache_requests_total",
+    "Near-cache lookups by result.",
+    ["table", "result"],
+)
+NEAR_CACHE_INVALIDATIONS = metrics.counter(
+    "near_cache_invalidations_total",
+    "Near-cache keys invalidated, by where the write happened.",
+    ["table", "origin"],
+)
+NEAR_CACHE_BYTES = metrics.gauge(
+    "near_cache_bytes",
+    "Estimated memory held by the near-cache.",
+    ["table"],
+)
+
+SQL_BACKENDS = ("postgres", "mysql")
+REDIS_BACKENDS = ("redis", "redis_async")
+
+# Checkout listener attached to each instrumented engine.
+_checkout_listeners: "WeakKeyDictionary[Any, Callable]" = WeakKeyDictionary()
+
+
+def sql_pool_usage() -> Dict[Labels, float]:
+    """
+    Sample connection usage of every SQL pool that has been created.
+    """
+    values = {}
+    for name in SQL_BACKENDS:
+        backend = registry.backend(name)
+        if not backend.loaded:
+            continue
+        pool = backend.get().sync_engine.pool
+        for state, method in (
+            ("size", "size"),
+            ("checked_out", "checkedout"),
+            ("idle", "checkedin"),
+            ("overflow", "overflow"),
+        ):
+            if hasattr(pool, method):
+                values[(name, state)] = float(getattr(pool, method)())
+    return values
+
+
+DB_POOL_CONNECTIONS = metrics.gauge(
+    "db_pool_connections",
+    "SQL pool connections by backend and state.",
+    ["backend", "state"],
+    function=sql_pool_usage,
+)
+
+
+def instrument_engine(name: str, engine: Any) -> None:
+    """
+    Observe pool checkout waits of a SQL engine using TimedAsyncQueuePool.
+
+    :param name: Backend name used as the label.
+    :param engine: Async SQLAlchemy engine.
+    """
+    sync_engine = engine.sync_engine
+    listener = _checkout_listeners.get(sync_engine)
+    if listener and event.contains(sync_engine, "checkout", listener):
+        return
+    labels = (name,)
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        wait = connection_record.info.get("checkout_wait")
+        if wait is not None:
+            DB_POOL_CHECKOUT_WAIT.observe(wait, labels)
+
+    event.listen(sync_engine, "checkout", on_checkout)
+    _checkout_listeners[sync_engine] = on_checkout
+
+
+def instrument_redis(name: str, client: Any) -> None:
+    """
+    Observe the latency of every command sent through a Redis client.
+
+    :param name: Backend name used as the label.
+    :param client: redis.Redis or redis.asyncio.Redis instance.
+    """
+    if getattr(client, "metered", False):
+        return
+    execute_command = client.execute_command
+
+    if inspect.iscoroutinefunction(execute_command):
+        async def metered_command(*args, **options):
+            started = time.perf_counter()
+            try:
+                return await execute_command(*args, **options)
+            finally:
+                REDIS_COMMAND_DURATION.observe(
+                    time.perf_counter() - started,
+                    (name, str(args[0]).upper()),
+                )
+    else:
+        def metered_command(*args, **options):
+            started = time.perf_counter()
+            try:
+                return execute_command(*args, **options)
+            finally:
+                REDIS_COMMAND_DURATION.observe(
+                    time.perf_counter() - started,
+                    (name, str(args[0]).upper()),
+                )
+
+    client.execute_command = metered_command
+    client.metered = True
+
+
+def register_mongo_listener() -> None:
+    """
+    Register a pymongo connection pool listener feeding the Mongo metrics.
+
+    pymongo only attaches listeners to clients created afterwards, so this
+    runs from `install`, before the registry creates the Mongo client.
+    pymongo calls the listener from its own threads, hence the lock.
+    """
+    from pymongo import monitoring
+
+    lock = threading.Lock()
+
+    class MongoPoolListener(monitoring.ConnectionPoolListener):
+        def pool_created(self, event):
+            pass
+
+        def pool_ready(self, event):
+            pass
+
+        def pool_cleared(self, event):
+            pass
+
+        def pool_closed(self, event):
+            pass
+
+        def connection_ready(self, event):
+            pass
+
+        def connection_check_out_started(self, event):
+            pass
+
+        def connection_created(self, event):
+            with lock:
+                MONGO_POOL_CONNECTIONS.inc(("open",))
+
+        def connection_closed(self, event):
+            with lock:
+                MONGO_POOL_CONNECTIONS.dec(("open",))
+
+        def connection_checked_out(self, event):
+            duration = getattr(event, "duration", None)
+            with lock:
+                MONGO_POOL_CONNECTIONS.inc(("checked_out",))
+                if duration is not None:
+                    MONGO_POOL_CHECKOUT_WAIT.observe(duration)
+
+        def connection_checked_in(self, event):
+            with lock:
+                MONGO_POOL_CONNECTIONS.dec(("checked_out",))
+
+        def connection_check_out_failed(self, event):
+            with lock:
+                MONGO_POOL_CHECKOUT_FAILURES.inc((str(event.reason),))
+
+    monitoring.register(MongoPoolListener())
+
+
+_installed = False
+
+
+def install() -> None:
+    """
+    Instrument every datastore backend as soon as its client exists.
+    """
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    for name in SQL_BACKENDS:
+        registry.backend(name).on_load(
+            lambda engine, name=name: instrument_engine(name, engine)
+        )
+    for name in REDIS_BACKENDS:
+        registry.backend(name).on_load(
+            lambda client, name=name: instrument_redis(name, client)
+        )
+    if registry.is_enabled("mongo"):
+        register_mongo_listener()
@@ -0,0 +1,220 @@
+"""
+Metrics aggregation across worker processes
+"""
+
+import os
+import json
+import asyncio
+import logging
+import contextlib
+
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from libs.environs import env
+from utils.metrics.registry import render
+from utils.metrics.registry import metrics
+from utils.metrics.registry import MetricsRegistry
+
+
+logger = logging.getLogger(__name__)
+
+METRICS_MULTIPROC_DIR = env.str("METRICS_MULTIPROC_DIR", default="")
+METRICS_FLUSH_INTERVAL = env.float("METRICS_FLUSH_INTERVAL", default=5.0)
+
+ARCHIVE = "archive.json"
+
+
+def _alive(pid: int) -> bool:
+    """
+    Check whether a process is still running.
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def merge(
+    snapshots: List[Dict[str, Any]],
+    live: Optional[set] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Merge per-process snapshots into one set of metrics.
+
+    Counters and histograms are summed over every snapshot, so totals
+    survive worker restarts; gauges are summed over live processes only.
+
+    :param snapshots: Snapshots as produced by `MetricsRegistry.collect`.
+    :param live: Pids whose gauges count; every snapshot when None.
+    :return: Merged metric descriptions, ready for `render`.
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for snapshot in snapshots:
+        for metric in snapshot["metrics"]:
+            if metric["kind"] == "gauge" and live is not None:
+                if snapshot.get("pid") not in live:
+                    continue
+            target = merged.setdefault(
+                metric["name"], {**metric, "samples": {}}
+            )
+            samples = target["samples"]
+            for labels, value in metric["samples"]:
+                key = tuple(labels)
+                if key not in samples:
+                    samples[key] = (
+                        list(value) if isinstance(value, list) else value
+                    )
+                elif isinstance(value, list):
+                    samples[key] = [a + b for a, b in zip(samples[key], value)]
+                else:
+                    samples[key] += value
+    return [
+        {
+            **metric,
+            "samples": [[list(k), v] for k, v in metric["samples"].items()],
+        }
+        for metric in merged.values()
+    ]
+
+
+class MetricsExporter:
+    """
+    Serves the metrics of one process or of every gunicorn worker.
+
+    Without METRICS_MULTIPROC_DIR the exposition is this process's
+    registry. With it, each worker writes its snapshot to `<pid>.json` in
+    the directory every METRICS_FLUSH_INTERVAL seconds and on scrape, and
+    the worker answering a scrape merges all of them. Snapshots of exited
+    workers are folded into an archive so their counters are not lost.
+    """
+
+    def __init__(
+        self,
+        registry_: MetricsRegistry = metrics,
+        directory: str = METRICS_MULTIPROC_DIR,
+        interval: float = METRICS_FLUSH_INTERVAL,
+    ):
+        """
+        Initialize the exporter.
+
+        :param registry_: Registry of this process.
+        :param directory: Shared snapshot directory; empty for single process.
+        :param interval: Seconds between snapshot writes.
+        """
+        self.registry = registry_
+        self.directory = directory
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _write(self, name: str, snapshot: Dict[str, Any]) -> None:
+        """
+        Atomically replace a snapshot file.
+        """
+        temporary = self._path(f".{name}.tmp")
+        with open(temporary, "w") as snapshot_file:
+            json.dump(snapshot, snapshot_file, separators=(",", ":"))
+        os.replace(temporary, self._path(name))
+
+    def _read(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Read a snapshot file, or None if it vanished or is incomplete.
+        """
+        try:
+            with open(self._path(name)) as snapshot_file:
+                return json.load(snapshot_file)
+        except (OSError, ValueError):
+            return None
+
+    def flush(self) -> None:
+        """
+        Write this process's snapshot to the shared directory.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self._write(f"{os.getpid()}.json", self.registry.collect())
+
+    def _gather(self) -> List[Dict[str, Any]]:
+        """
+        Merge every worker's snapshot, folding exited workers into the
+        archive under an exclusive lock.
+        """
+        import fcntl
+
+        with open(self._path(".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            archive = self._read(ARCHIVE)
+            live, dead, snapshots = set(), [], []
+            for name in os.listdir(self.directory):
+                if not name.endswith(".json") or name == ARCHIVE:
+                    continue
+                snapshot = self._read(name)
+                if snapshot is None:
+                    continue
+                if _alive(snapshot["pid"]):
+                    live.add(snapshot["pid"])
+                    snapshots.append(snapshot)
+                else:
+                    dead.append((name, snapshot))
+
+            if dead:
+                folded = merge(
+                    ([archive] if archive else []) + [s for _, s in dead],
+                    live=set(),
+                )
+                archive = {"pid": None, "metrics": folded}
+                self._write(ARCHIVE, archive)
+                for name, _ in dead:
+                    with contextlib.suppress(OSError):
+                        os.remove(self._path(name))
+
+        if archive:
+            snapshots.append(archive)
+        return merge(snapshots, live=live)
+
+    def render(self) -> str:
+        """
+        Return the exposition text for a scrape.
+        """
+        if not self.directory:
+            return render(self.registry.collect()["metrics"])
+        self.flush()
+        return render(self._gather())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.flush()
+            except OSError as e:
+                logger.warning("Failed to write metrics snapshot: %s", e)
+
+    async def start(self) -> None:
+        """
+        Start writing snapshots periodically when in multiprocess mode.
+        """
+        if self.directory and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def shutdown(self) -> None:
+        """
+        Stop the periodic writer and write a final snapshot.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        with contextlib.suppress(OSError):
+            self.flush()
+
+
+exporter = MetricsExporter()
@@ -0,0 +1,335 @@
+"""
+In-process metrics with Prometheus text exposition
+"""
+
+import os
+
+from bisect import bisect_left
+
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Tuple
+from typing import Callable
+from typing import Optional
+from typing import Sequence
+
+
+Labels = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+    10.0,
+)
+
+
+class Metric:
+    """
+    Base class of a labelled metric.
+
+    Label values are passed positionally as a tuple matching `labelnames`,
+    which keeps each update to a dict lookup and an addition. Updates are
+    not locked, so they stay well under a microsecond: every recording
+    site runs on the event loop thread, and code updating metrics from
+    other threads must serialize its own updates.
+
+    Attributes:
+        name (str): Metric name.
+        description (str): Help text shown in the exposition.
+        labelnames (Tuple[str, ...]): Names of the labels, in order.
+    """
+
+    kind = "untyped"
+
+    def __init__(
+        self, name: str, description: str, labelnames: Sequence[str] = ()
+    ):
+        """
+        Declare a metric.
+
+        :param name: Metric name.
+        :param description: Help text shown in the exposition.
+        :param labelnames: Names of the labels, in order.
+        """
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, Any] = {}
+
+    def samples(self) -> List[Tuple[Labels, Any]]:
+        """
+        Return a copy of the current values.
+        """
+        items = list(self._values.items())
+        return [
+            (labels, list(value) if isinstance(value, list) else value)
+            for labels, value in items
+        ]
+
+    def describe(self) -> Dict[str, Any]:
+        """
+        Return the metric's values in snapshot form.
+        """
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "help": self.description,
+            "labelnames": list(self.labelnames),
+            "samples": [
+                [list(labels), value] for labels, value in self.samples()
+            ],
+        }
+
+
+class Counter(Metric):
+    """
+    Monotonically increasing count.
+    """
+
+    kind = "counter"
+
+    def inc(self, labels: Labels = (), amount: float = 1.0) -> None:
+        """
+        Increase the counter.
+
+        :param labels: Label values.
+        :param amount: Non-negative increment.
+        """
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Gauge(Metric):
+    """
+    Value that can go up and down, or be sampled by a callback on collect.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: Sequence[str] = (),
+        function: Optional[Callable[[], Dict[Labels, float]]] = None,
+    ):
+        """
+        Declare a gauge.
+
+        :param name: Metric name.
+        :param description: Help text shown in the exposition.
+        :param labelnames: Names of the labels, in order.
+        :param function: Callback returning {labels: value}, sampled on
+            collect.
+        """
+        super().__init__(name, description, labelnames)
+        self.function = function
+
+    def set(self, value: float, labels: Labels = ()) -> None:
+        """
+        Set the gauge.
+        """
+        self._values[labels] = value
+
+    def inc(self, labels: Labels = (), amount: float = 1.0) -> None:
+        """
+        Increase the gauge.
+        """
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, labels: Labels = (), amount: float = 1.0) -> None:
+        """
+        Decrease the gauge.
+        """
+        self._values[labels] = self._values.get(labels, 0.0) - amount
+
+    def samples(self) -> List[Tuple[Labels, Any]]:
+        """
+        Return the current values, calling the callback if there is one.
+        """
+        if self.function is not None:
+            return list(self.function().items())
+        return super().samples()
+
+
+class Histogram(Metric):
+    """
+    Distribution of observations over fixed buckets.
+
+    Each label set holds per-bucket counts (not cumulative) followed by
+    the sum and the count of observations.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        """
+        Declare a histogram.
+
+        :param name: Metric name.
+        :param description: Help text shown in the exposition.
+        :param labelnames: Names of the labels, in order.
+        :param buckets: Sorted upper bounds; +Inf is implied.
+        """
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(buckets)
+        self._width = len(self.buckets) + 1
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        """
+        Record an observation.
+
+        :param value: Observed value, e.g. a duration in seconds.
+        :param labels: Label values.
+        """
+        data = self._values.get(labels)
+        if data is None:
+            data = self._values.setdefault(
+                labels, [0] * self._width + [0.0, 0]
+            )
+        data[bisect_left(self.buckets, value)] += 1
+        data[-2] += value
+        data[-1] += 1
+
+    def describe(self) -> Dict[str, Any]:
+        """
+        Return the metric's values in snapshot form, with its buckets.
+        """
+        return {**super().describe(), "buckets": list(self.buckets)}
+
+
+class MetricsRegistry:
+    """
+    Registry of the metrics recorded by this process.
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty registry.
+        """
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        """
+        Add a metric, returning the existing one if the name is taken.
+
+        :param metric: Metric to add.
+        :return: The registered metric.
+        """
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(
+        self, name: str, description: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        """
+        Declare a counter.
+        """
+        return self.register(Counter(name, description, labelnames))
+
+    def gauge(
+        self,
+        name: str,
+        description: str,
+        labelnames: Sequence[str] = (),
+        function: Optional[Callable[[], Dict[Labels, float]]] = None,
+    ) -> Gauge:
+        """
+        Declare a gauge, optionally sampled by a callback.
+        """
+        return self.register(Gauge(name, description, labelnames, function))
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """
+        Declare a histogram.
+        """
+        return self.register(Histogram(name, description, labelnames, buckets))
+
+    def collect(self) -> Dict[str, Any]:
+        """
+        Return a snapshot of every metric.
+
+        :return: Snapshot with the process id and each metric's values.
+        """
+        return {
+            "pid": os.getpid(),
+            "metrics": [
+                metric.describe() for metric in self._metrics.values()
+            ],
+        }
+
+
+def _escape(value: Any) -> str:
+    """
+    Escape a label value for the text exposition format.
+    """
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\n", "\\n")
+        .replace('"', '\\"')
+    )
+
+
+def _labels(names: Sequence[str], values: Sequence[Any]) -> str:
+    """
+    Format a label set, e.g. '{method="GET",status="200"}'.
+    """
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _number(value: float) -> str:
+    """
+    Format a sample value.
+    """
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+def render(metrics: List[Dict[str, Any]]) -> str:
+    """
+    Render snapshot metrics in the Prometheus text exposition format.
+
+    :param metrics: Metric descriptions as produced by `Metric.describe`.
+    :return: Exposition text.
+    """
+    lines = []
+    for metric in metrics:
+        name, names = metric["name"], metric["labelnames"]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        for labels, value in metric["samples"]:
+            label_text = _labels(names, labels)
+            if metric["kind"] != "histogram":
+                lines.append(f"{name}{label_text} {_number(value)}")
+                continue
+            bounds = list(metric["buckets"]) + [float("inf")]
+            cumulative = 0
+            for bound, count in zip(bounds, value[:len(bounds)]):
+                cumulative += count
+                bucket_labels = _labels(
+                    names + ["le"], list(labels) + [_number(bound)]
+                )
+                lines.append(
+                    f"{name}_bucket{bucket_labels} {_number(cumulative)}"
+                )
+            lines.append(f"{name}_sum{label_text} {_number(value[-2])}")
+            lines.append(f"{name}_count{label_text} {_number(value[-1])}")
+    return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
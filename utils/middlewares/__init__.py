@@ -0,0 +1,9 @@
+"""
+Initialize middlewares
+"""
+
+from .timing import * # noqa
+from .metrics import * # noqa
+from .profiler import * # noqa
+from .compression import * # noqa
+from .drain import * # noqa
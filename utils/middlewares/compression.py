@@ -0,0 +1,379 @@
+"""
+Negotiated response compression
+"""
+
+import zlib
+import importlib
+import importlib.util
+
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Tuple
+from typing import Callable
+from typing import Optional
+
+from libs.environs import env
+
+
+COMPRESSION_ENABLED = env.bool("COMPRESSION_ENABLED", default=True)
+COMPRESSION_MINIMUM_SIZE = env.int("COMPRESSION_MINIMUM_SIZE", default=1024)
+COMPRESSION_GZIP_LEVEL = env.int("COMPRESSION_GZIP_LEVEL", default=6)
+COMPRESSION_BROTLI_QUALITY = env.int("COMPRESSION_BROTLI_QUALITY", default=4)
+COMPRESSION_ZSTD_LEVEL = env.int("COMPRESSION_ZSTD_LEVEL", default=3)
+COMPRESSION_LEVELS = env.dict(
+    "COMPRESSION_LEVELS", default={}, subcast_values=int
+)
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "application/x-ndjson",
+    "image/svg+xml",
+)
+COMPRESSIBLE_SUFFIXES = ("+json", "+xml")
+# Compressing server-sent events would hold events back in the encoder.
+EXCLUDED_TYPES = ("text/event-stream",)
+
+
+def _optional(*names: str) -> Optional[Any]:
+    """
+    Import the first installed module of `names`, or return None.
+    """
+    for name in names:
+        if importlib.util.find_spec(name):
+            return importlib.import_module(name)
+    return None
+
+
+brotli = _optional("brotli", "brotlicffi")
+zstandard = _optional("zstandard")
+
+
+class GzipEncoder:
+    """
+    Incremental gzip stream.
+    """
+
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(
+            level, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+        )
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+    """
+    Incremental brotli stream, when brotli or brotlicffi is installed.
+    """
+
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdEncoder:
+    """
+    Incremental zstd stream, when zstandard is installed.
+    """
+
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+# Server preference, best ratio for the CPU first.
+ENCODERS: Dict[str, Tuple[Callable[[int], Any], int]] = {}
+if zstandard is not None:
+    ENCODERS["zstd"] = (ZstdEncoder, COMPRESSION_ZSTD_LEVEL)
+if brotli is not None:
+    ENCODERS["br"] = (BrotliEncoder, COMPRESSION_BROTLI_QUALITY)
+ENCODERS["gzip"] = (GzipEncoder, COMPRESSION_GZIP_LEVEL)
+
+
+def negotiate(
+    accept_encoding: str, available: Tuple[str, ...]
+) -> Optional[str]:
+    """
+    Pick a content coding from an Accept-Encoding header.
+
+    :param accept_encoding: Header value, e.g. 'gzip, br;q=0.9, *;q=0'.
+    :param available: Codings the server supports, in preference order.
+    :return: The chosen coding, or None to send the body as is.
+    """
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params[:2].lower() == "q=":
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding] = weight
+    best, best_weight = None, 0.0
+    for coding in available:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    """
+    Check whether a media type is worth compressing.
+    """
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    if not media_type or media_type.startswith(EXCLUDED_TYPES):
+        return False
+    return media_type.startswith(COMPRESSIBLE_TYPES) or media_type.endswith(
+        COMPRESSIBLE_SUFFIXES
+    )
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses with the best coding the client
+    accepts: zstd and brotli when their packages are installed, and gzip.
+
+    Only text-like media types are compressed, and bodies under
+    `minimum_size` bytes are sent as is. Partial responses (206, or any
+    response with a Content-Range) are never compressed: their range
+    refers to the uncompressed representation. Streaming responses are buffered
+    until they reach `minimum_size`; from then on every chunk is
+    compressed and flushed as it arrives, so clients still receive data
+    incrementally. `Vary: Accept-Encoding` is set on every compressible
+    response, compressed or not, so caches keep the variants apart.
+
+    Levels come from COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY and
+    COMPRESSION_ZSTD_LEVEL, and can be overridden per media type with
+    COMPRESSION_LEVELS entries such as 'gzip:application/json=5'.
+    """
+
+    def __init__(
+        self,
+        app: Any,
+        minimum_size: int = COMPRESSION_MINIMUM_SIZE,
+        levels: Optional[Dict[str, int]] = None,
+    ):
+        """
+        Wrap an ASGI app.
+
+        :param app: ASGI application.
+        :param minimum_size: Smallest body in bytes worth compressing.
+        :param levels: Per media type levels, '<coding>:<media type>' keys.
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = COMPRESSION_LEVELS if levels is None else levels
+        self.available = tuple(ENCODERS)
+
+    async def __call__(
+        self, scope: Dict, receive: Callable, send: Callable
+    ) -> None:
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        accept = b""
+        for name, value in scope.get("headers") or ():
+            if name == b"accept-encoding":
+                accept = value
+                break
+        coding = negotiate(accept.decode("latin-1"), self.available)
+        responder = _CompressionResponder(self, send, coding)
+        await self.app(scope, receive, responder.send)
+
+    def encoder(self, coding: str, content_type: str) -> Any:
+        """
+        Create an encoder for a coding, at the level for the media type.
+        """
+        factory, level = ENCODERS[coding]
+        media_type = content_type.split(";", 1)[0].strip().lower()
+        return factory(self.levels.get(f"{coding}:{media_type}", level))
+
+
+class _CompressionResponder:
+    """
+    Send wrapper of one response.
+    """
+
+    def __init__(
+        self,
+        middleware: CompressionMiddleware,
+        send: Callable,
+        coding: Optional[str],
+    ):
+        self.middleware = middleware
+        self._send = send
+        self.coding = coding
+        self.start: Optional[Dict[str, Any]] = None
+        self.content_type = ""
+        self.buffer: List[bytes] = []
+        self.buffered = 0
+        self.encoder: Any = None
+        self.passthrough = False
+
+    async def send(self, message: Dict[str, Any]) -> None:
+        if self.passthrough:
+            await self._send(message)
+            return
+        if message["type"] == "http.response.start":
+            self._prepare(message)
+            if self.passthrough:
+                await self._send(self.start)
+            return
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+        if self.encoder is not None:
+            await self._stream(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if body:
+            self.buffer.append(body)
+            self.buffered += len(body)
+        if self.buffered < self.middleware.minimum_size:
+            if more_body:
+                return
+            await self._send_uncompressed(more_body=False)
+            return
+        await self._begin(more_body)
+
+    def _prepare(self, message: Dict[str, Any]) -> None:
+        """
+        Decide from the response headers whether compression may apply.
+        """
+        headers = list(message.get("headers", []))
+        content_type, encoded, partial = "", False, False
+        for name, value in headers:
+            if name == b"content-type":
+                content_type = value.decode("latin-1")
+            elif name == b"content-encoding":
+                encoded = True
+            elif name == b"content-range":
+                partial = True
+        status = message["status"]
+        partial = partial or status == 206
+        compressible = (
+            is_compressible(content_type)
+            and status not in (204, 304)
+            and not partial
+        )
+        if compressible:
+            headers = _add_vary(headers)
+        self.start = {**message, "headers": headers}
+        self.content_type = content_type
+        if encoded or not compressible or self.coding is None:
+            self.passthrough = True
+
+    async def _send_uncompressed(self, more_body: bool) -> None:
+        """
+        Send the held response unchanged.
+        """
+        self.passthrough = True
+        await self._send(self.start)
+        await self._send({
+            "type": "http.response.body",
+            "body": b"".join(self.buffer),
+            "more_body": more_body,
+        })
+        self.buffer = []
+
+    async def _begin(self, more_body: bool) -> None:
+        """
+        Start compressing once the body is known to be large enough.
+        """
+        self.encoder = self.middleware.encoder(self.coding, self.content_type)
+        data = self.encoder.compress(b"".join(self.buffer))
+        self.buffer = []
+        headers = [
+            (name, value) for name, value in self.start["headers"]
+            if name != b"content-length"
+        ]
+        headers = [
+            (name, _weaken(value) if name == b"etag" else value)
+            for name, value in headers
+        ]
+        headers.append((b"content-encoding", self.coding.encode()))
+        if more_body:
+            data += self.encoder.flush()
+        else:
+            data += self.encoder.finish()
+            headers.append((b"content-length", str(len(data)).encode()))
+        await self._send({**self.start, "headers": headers})
+        self.start = None
+        await self._send({
+            "type": "http.response.body", "body": data, "more_body": more_body
+        })
+
+    async def _stream(self, message: Dict[str, Any]) -> None:
+        """
+        Compress and flush a chunk of a streaming response.
+        """
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        data = self.encoder.compress(body) if body else b""
+        data += self.encoder.flush() if more_body else self.encoder.finish()
+        if data or not more_body:
+            await self._send({
+                "type": "http.response.body",
+                "body": data,
+                "more_body": more_body,
+            })
+
+
+def _weaken(etag: bytes) -> bytes:
+    """
+    Turn an ETag into a weak one: the compressed bytes differ from the
+    representation it was computed for.
+    """
+    return etag if etag.startswith(b"W/") else b"W/" + etag
+
+
+def _add_vary(
+    headers: List[Tuple[bytes, bytes]]
+) -> List[Tuple[bytes, bytes]]:
+    """
+    Add Accept-Encoding to the Vary header, keeping existing values.
+    """
+    for index, (name, value) in enumerate(headers):
+        if name == b"vary":
+            values = [v.strip().lower() for v in value.split(b",")]
+            if b"accept-encoding" in values or b"*" in values:
+                return headers
+            headers[index] = (name, value + b", Accept-Encoding")
+            return headers
+    headers.append((b"vary", b"Accept-Encoding"))
+    return headers
@@ -0,0 +1,84 @@
+"""
+In-flight request tracking for graceful shutdown
+"""
+
+import time
+import asyncio
+
+from typing import Any
+from typing import Dict
+from typing import Callable
+
+
+class RequestTracker:
+    """
+    Counts the HTTP requests a worker is handling and whether it is
+    draining, i.e. shutting down and no longer wanting new traffic.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self.draining = False
+
+    async def wait_idle(self, timeout: float, interval: float = 0.05) -> bool:
+        """
+        Wait until no request is in flight.
+
+        :param timeout: Seconds to wait at most.
+        :param interval: Seconds between checks.
+        :return: True if idle, False if requests were still running.
+        """
+        deadline = time.monotonic() + timeout
+        while self.in_flight and time.monotonic() < deadline:
+            await asyncio.sleep(interval)
+        return not self.in_flight
+
+
+tracker = RequestTracker()
+
+
+class DrainMiddleware:
+    """
+    ASGI middleware counting in-flight requests in `tracker`.
+
+    While the worker drains, responses carry `Connection: close` so
+    keep-alive clients reconnect, through the load balancer, to a worker
+    that is staying up.
+    """
+
+    def __init__(self, app: Any, tracker_: RequestTracker = tracker):
+        """
+        Wrap an ASGI app.
+
+        :param app: ASGI application.
+        :param tracker_: Tracker to count requests in.
+        """
+        self.app = app
+        self.tracker = tracker_
+
+    async def __call__(
+        self, scope: Dict, receive: Callable, send: Callable
+    ) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if (
+                message["type"] == "http.response.start"
+                and self.tracker.draining
+            ):
+                headers = [
+                    (name, value)
+                    for name, value in message.get("headers", [])
+                    if name != b"connection"
+                ]
+                headers.append((b"connection", b"close"))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        self.tracker.in_flight += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.tracker.in_flight -= 1
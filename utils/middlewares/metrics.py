@@ -0,0 +1,79 @@
+"""
+HTTP request metrics
+"""
+
+import time
+
+from typing import Any
+from typing import Dict
+from typing import Callable
+
+from libs.environs import env
+from utils.metrics.collectors import install
+from utils.metrics.collectors import HTTP_REQUEST_DURATION
+from utils.metrics.collectors import HTTP_REQUESTS_IN_FLIGHT
+
+
+METRICS_ENABLED = env.bool("METRICS_ENABLED", default=True)
+METRICS_PATH = "/metrics"
+
+
+def route_template(scope: Dict) -> str:
+    """
+    Return the path template of the route that handled a request.
+
+    FastAPI routes record themselves in the scope; plain Starlette routes
+    such as /openapi.json only set the endpoint, and their path is static.
+    """
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if "endpoint" in scope:
+        return scope["path"]
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request latency and in-flight requests.
+
+    Latency is labelled with the matched route template (e.g.
+    '/users/{id}') rather than the raw path, so label cardinality stays
+    bounded; unmatched paths share the 'unmatched' label. Scrapes of
+    /metrics itself are not recorded.
+    """
+
+    def __init__(self, app: Any):
+        """
+        Wrap an ASGI app and instrument the datastore backends.
+
+        :param app: ASGI application.
+        """
+        self.app = app
+        install()
+
+    async def __call__(
+        self, scope: Dict, receive: Callable, send: Callable
+    ) -> None:
+        if scope["type"] != "http" or scope["path"] == METRICS_PATH:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - started,
+                (scope["method"], route_template(scope), str(status)),
+            )
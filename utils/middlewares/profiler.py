@@ -0,0 +1,415 @@
+"""
+On-demand sampling profiler for single requests
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import inspect
+import logging
+import threading
+
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Tuple
+from typing import Callable
+from typing import Optional
+
+from db.registry import registry
+from libs.environs import env
+from utils.helpers.auth import token_matches
+
+
+logger = logging.getLogger(__name__)
+
+PROFILER_ENABLED = env.bool("PROFILER_ENABLED", default=False)
+PROFILER_TOKEN = env.str("PROFILER_TOKEN", default="")
+PROFILER_INTERVAL_MS = env.float("PROFILER_INTERVAL_MS", default=1.0)
+PROFILER_MAX_DURATION = env.float("PROFILER_MAX_DURATION", default=30.0)
+PROFILER_MAX_PER_MINUTE = env.int("PROFILER_MAX_PER_MINUTE", default=6)
+PROFILER_DIR = env.str("PROFILER_DIR", default="")
+
+PROFILE_HEADER = b"x-profile"
+FORMAT_HEADER = b"x-profile-format"
+FORMATS = ("speedscope", "collapsed")
+
+_COROUTINE_FLAGS = (
+    inspect.CO_COROUTINE
+    | inspect.CO_ITERABLE_COROUTINE
+    | inspect.CO_ASYNC_GENERATOR
+)
+_IDLE_FUNCTIONS = {"select", "run_forever", "run_until_complete", "run"}
+
+Frame = Tuple[str, str, int]
+
+
+class StackSampler:
+    """
+    Samples the Python stack of one thread from a background thread.
+
+    Only frames from the outermost coroutine up are kept, which drops the
+    event loop machinery underneath. Samples taken while the loop waits
+    for I/O are reported as '(idle)', and callbacks outside any coroutine,
+    such as protocol parsing, are kept whole under '(event loop)'.
+
+    The stack is that of the whole event loop thread, so coroutines of
+    other requests served concurrently by the worker appear as well. The
+    sampler needs the GIL to take a sample, so while the loop thread runs
+    pure Python the effective interval is bounded by the interpreter's
+    switch interval (5 ms by default).
+    """
+
+    def __init__(
+        self, thread_id: int, interval: float, max_duration: float
+    ):
+        """
+        Prepare a sampler; nothing runs until `start`.
+
+        :param thread_id: Ident of the thread to sample.
+        :param interval: Seconds between samples.
+        :param max_duration: Seconds after which sampling stops on its own.
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_duration = max_duration
+        self.frames: List[Frame] = []
+        self.samples: List[List[int]] = []
+        self.weights: List[float] = []
+        self.started = 0.0
+        self.stopped = 0.0
+        self.truncated = False
+        self._index: Dict[Frame, int] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        Start sampling in a daemon thread.
+        """
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(
+            target=self._run, name="request-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop sampling and wait for the sampler thread.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.stopped = time.perf_counter()
+
+    def _run(self) -> None:
+        last = self.started
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            if now - self.started > self.max_duration:
+                self.truncated = True
+                return
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None or self._stop.is_set():
+                return
+            self.samples.append([self._intern(f) for f in self._stack(frame)])
+            self.weights.append(now - last)
+            last = now
+
+    def _intern(self, frame: Frame) -> int:
+        index = self._index.get(frame)
+        if index is None:
+            index = self._index[frame] = len(self.frames)
+            self.frames.append(frame)
+        return index
+
+    @staticmethod
+    def _stack(frame: Any) -> List[Frame]:
+        """
+        Return a sampled stack, outermost frame first.
+        """
+        stack, outermost_coroutine = [], None
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+            if code.co_flags & _COROUTINE_FLAGS:
+                outermost_coroutine = len(stack)
+            frame = frame.f_back
+        stack.reverse()
+        if outermost_coroutine is not None:
+            return stack[len(stack) - outermost_coroutine:]
+        name, filename, _ = stack[-1]
+        if filename.endswith("selectors.py") or name in _IDLE_FUNCTIONS:
+            return [("(idle)", "", 0)]
+        return [("(event loop)", "", 0)] + stack
+
+    def speedscope(self, name: str) -> Dict[str, Any]:
+        """
+        Return the profile in the speedscope file format.
+
+        :param name: Profile name, e.g. 'GET /users/'.
+        """
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "request-profiler",
+            "shared": {
+                "frames": [
+                    {"name": n, "file": f, "line": line} if f else {"name": n}
+                    for n, f, line in self.frames
+                ],
+            },
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(self.weights),
+                "samples": self.samples,
+                "weights": self.weights,
+            }],
+        }
+
+    def collapsed(self) -> str:
+        """
+        Return the profile as collapsed stacks, the flamegraph.pl input.
+        """
+        labels = [
+            f"{name} ({os.path.basename(filename)}:{line})"
+            if filename else name
+            for name, filename, line in self.frames
+        ]
+        counts: Dict[str, int] = {}
+        for sample in self.samples:
+            key = ";".join(labels[i] for i in sample)
+            counts[key] = counts.get(key, 0) + 1
+        return "".join(f"{key} {count}\n" for key, count in counts.items())
+
+
+class ProfileBudget:
+    """
+    Limits how often requests may be profiled.
+
+    Allows one profile at a time per worker and at most `per_minute`
+    profiles per minute, counted in Redis across workers when Redis is
+    enabled and per worker otherwise.
+    """
+
+    def __init__(self, per_minute: int = PROFILER_MAX_PER_MINUTE):
+        """
+        Initialize the budget.
+
+        :param per_minute: Profiles allowed per minute.
+        """
+        self.per_minute = per_minute
+        self._busy = False
+        self._window = 0
+        self._used = 0
+
+    async def acquire(self) -> bool:
+        """
+        Take a profiling slot; return False if over budget.
+        """
+        if self._busy:
+            return False
+        self._busy = True
+        try:
+            allowed = await self._spend()
+        except Exception as e:
+            logger.warning("Profiler budget check failed: %s", e)
+            allowed = False
+        if not allowed:
+            self._busy = False
+        return allowed
+
+    def release(self) -> None:
+        """
+        Give the slot back once the profiled request is done.
+        """
+        self._busy = False
+
+    async def _spend(self) -> bool:
+        window = int(time.time() // 60)
+        if registry.is_enabled("redis_async"):
+            client = registry.get("redis_async")
+            key = f"profiler:{window}"
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.incr(key)
+                pipe.expire(key, 60)
+                used, _ = await pipe.execute()
+            return used <= self.per_minute
+        if window != self._window:
+            self._window, self._used = window, 0
+        self._used += 1
+        return self._used <= self.per_minute
+
+
+class ProfilerMiddleware:
+    """
+    ASGI middleware profiling single requests on demand.
+
+    A request is profiled when it carries PROFILER_TOKEN in the
+    `X-Profile` header; anything else, including a wrong token, is served
+    untouched. The token is never read from the query string, where it
+    would end up in access logs and browser history. The profile format
+    is chosen with `X-Profile-Format`: 'speedscope' (default) or
+    'collapsed'.
+
+    With PROFILER_DIR set, the response is sent as usual and the profile
+    is written to that directory, named in the `X-Profile` response
+    header. Otherwise the profile replaces the response body, and the
+    original status is returned in `X-Profiled-Status`. Requests over the
+    `ProfileBudget` are served unprofiled with `X-Profile: rate-limited`.
+    """
+
+    def __init__(
+        self,
+        app: Any,
+        token: str = PROFILER_TOKEN,
+        interval_ms: float = PROFILER_INTERVAL_MS,
+        max_duration: float = PROFILER_MAX_DURATION,
+        directory: str = PROFILER_DIR,
+        budget: Optional[ProfileBudget] = None,
+    ):
+        """
+        Wrap an ASGI app.
+
+        :param app: ASGI application.
+        :param token: Secret enabling profiling; profiling is off when empty.
+        :param interval_ms: Milliseconds between stack samples.
+        :param max_duration: Seconds after which a profile is cut off.
+        :param directory: Where to store profiles; empty to return them.
+        :param budget: Profiling rate limit.
+        """
+        self.app = app
+        self.token = token
+        self.interval = interval_ms / 1000
+        self.max_duration = max_duration
+        self.directory = directory
+        self.budget = budget or ProfileBudget()
+
+    def _requested(self, scope: Dict) -> Optional[str]:
+        """
+        Return the requested profile format if the request is authorized.
+        """
+        headers = dict(scope.get("headers") or ())
+        token = headers.get(PROFILE_HEADER, b"").decode("latin-1")
+        fmt = headers.get(FORMAT_HEADER, b"").decode("latin-1")
+        if not token or not token_matches(token, self.token):
+            return None
+        return fmt if fmt in FORMATS else FORMATS[0]
+
+    async def __call__(
+        self, scope: Dict, receive: Callable, send: Callable
+    ) -> None:
+        if scope["type"] != "http" or not self.token:
+            await self.app(scope, receive, send)
+            return
+        fmt = self._requested(scope)
+        if fmt is None:
+            await self.app(scope, receive, send)
+            return
+        if not await self.budget.acquire():
+            await self.app(
+                scope, receive, self._with_header(send, b"rate-limited")
+            )
+            return
+        try:
+            await self._profile(scope, receive, send, fmt)
+        finally:
+            self.budget.release()
+
+    @staticmethod
+    def _with_header(send: Callable, value: bytes) -> Callable:
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((PROFILE_HEADER, value))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        return send_wrapper
+
+    async def _profile(
+        self, scope: Dict, receive: Callable, send: Callable, fmt: str
+    ) -> None:
+        name = f"{scope['method']} {scope['path']}"
+        sampler = StackSampler(
+            threading.get_ident(), self.interval, self.max_duration
+        )
+
+        if self.directory:
+            filename = "{}{:03d}-{}-{}.{}".format(
+                time.strftime("%Y%m%dT%H%M%S"),
+                int(time.time() * 1000) % 1000,
+                os.getpid(),
+                scope["method"].lower(),
+                "speedscope.json" if fmt == "speedscope" else "collapsed.txt",
+            )
+            sampler.start()
+            try:
+                await self.app(
+                    scope, receive, self._with_header(send, filename.encode())
+                )
+            finally:
+                sampler.stop()
+                await asyncio.to_thread(
+                    self._store, sampler, name, fmt, filename
+                )
+            return
+
+        status = 500
+
+        async def discard(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        sampler.start()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            sampler.stop()
+
+        body, content_type = self._render(sampler, name, fmt)
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", content_type),
+                (b"content-length", str(len(body)).encode()),
+                (b"x-profiled-status", str(status).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    def _render(
+        sampler: StackSampler, name: str, fmt: str
+    ) -> Tuple[bytes, bytes]:
+        """
+        Serialize a profile; return the body and its content type.
+        """
+        if sampler.truncated:
+            logger.warning(
+                "Profile of %s cut off after %.0fs", name, sampler.max_duration
+            )
+        if fmt == "collapsed":
+            return sampler.collapsed().encode(), b"text/plain; charset=utf-8"
+        body = json.dumps(sampler.speedscope(name), separators=(",", ":"))
+        return body.encode(), b"application/json"
+
+    def _store(
+        self, sampler: StackSampler, name: str, fmt: str, filename: str
+    ) -> None:
+        """
+        Write a profile to the profile directory.
+        """
+        body, _ = self._render(sampler, name, fmt)
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, filename)
+        with open(path, "wb") as profile_file:
+            profile_file.write(body)
+        logger.info("Stored profile of %s in %s", name, filename)
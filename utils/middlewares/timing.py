@@ -0,0 +1,348 @@
+"""
+Per-request Server-Timing instrumentation
+"""
+
+import re
+import time
+import inspect
+import logging
+import functools
+
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Tuple
+from typing import Callable
+from typing import Optional
+
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+from db.registry import registry
+from libs.environs import env
+
+
+logger = logging.getLogger(__name__)
+
+SERVER_TIMING_ENABLED = env.bool("SERVER_TIMING_ENABLED", default=True)
+SERVER_TIMING_QUERY_BUDGET = env.int(
+    "SERVER_TIMING_QUERY_BUDGET", default=20
+)
+
+_LITERALS = re.compile(r"'[^']*'|\b\d+\b|\$\d+|%\(\w+\)s|\?")
+
+
+class RequestTimings:
+    """
+    Time spent per phase of one request, plus the SQL statements it ran.
+
+    Phases are accumulated across calls. Nested timing of the same phase
+    (e.g. `success` calling `_build_response`) only counts the outermost
+    call.
+    """
+
+    def __init__(self):
+        """
+        Initialize empty timings.
+        """
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.statements: Dict[str, int] = {}
+        self._depth: Dict[str, int] = {}
+
+    def add(self, phase: str, seconds: float) -> None:
+        """
+        Add time to a phase.
+
+        :param phase: Phase name, e.g. 'db'.
+        :param seconds: Duration to add.
+        """
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def enter(self, phase: str) -> bool:
+        """
+        Mark a phase as entered; return True for the outermost entry.
+        """
+        depth = self._depth.get(phase, 0)
+        self._depth[phase] = depth + 1
+        return depth == 0
+
+    def exit(self, phase: str) -> None:
+        """
+        Mark a phase as left.
+        """
+        self._depth[phase] -= 1
+
+    def query(self, statement: str) -> None:
+        """
+        Count a SQL statement by its shape, with literals stripped.
+
+        :param statement: SQL sent to the database.
+        """
+        shape = _LITERALS.sub("?", " ".join(statement.split()))
+        self.statements[shape] = self.statements.get(shape, 0) + 1
+
+    @property
+    def queries(self) -> int:
+        """
+        Number of SQL statements executed.
+        """
+        return sum(self.statements.values())
+
+    def repeated(self) -> Optional[Tuple[str, int]]:
+        """
+        Return the most repeated statement shape and its count.
+        """
+        if not self.statements:
+            return None
+        return max(self.statements.items(), key=lambda item: item[1])
+
+    def server_timing(self, total: float) -> str:
+        """
+        Format the timings as a Server-Timing header value.
+
+        :param total: Total time of the request in seconds.
+        :return: Header value with one metric per phase, in milliseconds.
+        """
+        metrics = []
+        for phase, seconds in self.phases.items():
+            metric = f"{phase};dur={seconds * 1000:.2f}"
+            if phase == "db":
+                metric += f';desc="{self.queries} queries"'
+            metrics.append(metric)
+        metrics.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(metrics)
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar(
+    "request_timings", default=None
+)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    """
+    Return the timings of the request being handled, if any.
+    """
+    return _current.get()
+
+
+def record(phase: str, seconds: float) -> None:
+    """
+    Add time to a phase of the current request; no-op outside requests.
+
+    :param phase: Phase name.
+    :param seconds: Duration to add.
+    """
+    timings = _current.get()
+    if timings is not None:
+        timings.add(phase, seconds)
+
+
+def timed(phase: str) -> Callable:
+    """
+    Decorator adding a function's run time to a phase of the request.
+
+    :param phase: Phase name, e.g. 'serialize'.
+    :return: Decorator for sync or async functions.
+    """
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                timings = _current.get()
+                if timings is None:
+                    return await func(*args, **kwargs)
+                outermost = timings.enter(phase)
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    timings.exit(phase)
+                    if outermost:
+                        timings.add(phase, time.perf_counter() - started)
+
+            async_wrapper.timed = True
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            timings = _current.get()
+            if timings is None:
+                return func(*args, **kwargs)
+            outermost = timings.enter(phase)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timings.exit(phase)
+                if outermost:
+                    timings.add(phase, time.perf_counter() - started)
+
+        wrapper.timed = True
+        return wrapper
+
+    return decorator
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    wait = connection_record.info.get("checkout_wait")
+    if wait is not None:
+        record("pool", wait)
+
+
+def _before_execute(conn, cursor, statement, parameters, context, many):
+    conn.info["query_started"] = time.perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, many):
+    timings = _current.get()
+    if timings is not None:
+        started = conn.info.pop("query_started", time.perf_counter())
+        timings.add("db", time.perf_counter() - started)
+        timings.query(statement)
+
+
+def instrument_engine(engine: Any) -> None:
+    """
+    Attach SQL and pool wait timing to a SQLAlchemy engine.
+
+    Pool wait is only reported for engines using TimedAsyncQueuePool.
+
+    :param engine: Sync or async SQLAlchemy engine.
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if event.contains(sync_engine, "after_cursor_execute", _after_execute):
+        return
+    event.listen(sync_engine, "checkout", _on_checkout)
+    event.listen(sync_engine, "before_cursor_execute", _before_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_execute)
+
+
+def instrument_redis(client: Any) -> None:
+    """
+    Time every command sent through a sync or asyncio Redis client,
+    including commands sent in pipelines, which bypass `execute_command`.
+
+    :param client: redis.Redis or redis.asyncio.Redis instance.
+    """
+    if getattr(client.execute_command, "timed", False):
+        return
+    client.execute_command = timed("redis")(client.execute_command)
+    pipeline = client.pipeline
+
+    @functools.wraps(pipeline)
+    def timed_pipeline(*args, **kwargs):
+        pipe = pipeline(*args, **kwargs)
+        pipe.execute = timed("redis")(pipe.execute)
+        return pipe
+
+    client.pipeline = timed_pipeline
+
+
+def instrument_rendering() -> None:
+    """
+    Count response rendering as the 'serialize' phase: FastAPI's
+    response_model validation and the JSON encoding of the body.
+    """
+    from fastapi import routing
+    from starlette.responses import JSONResponse
+
+    if getattr(routing.serialize_response, "timed", False):
+        return
+    routing.serialize_response = timed("serialize")(
+        routing.serialize_response
+    )
+    JSONResponse.render = timed("serialize")(JSONResponse.render)
+
+
+def install() -> None:
+    """
+    Instrument every datastore backend as soon as its client exists.
+    """
+    for name in ("postgres", "mysql"):
+        registry.backend(name).on_load(instrument_engine)
+    for name in ("redis", "redis_async"):
+        registry.backend(name).on_load(instrument_redis)
+    instrument_rendering()
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware reporting where each request spent its time.
+
+    Adds a `Server-Timing` header (pool wait, SQL, Redis, response
+    serialization and total) and logs one structured line per request.
+    Requests running more than SERVER_TIMING_QUERY_BUDGET statements are
+    logged as warnings with their most repeated statement, the usual
+    signature of an N+1 query pattern.
+    """
+
+    def __init__(
+        self, app: Any, query_budget: int = SERVER_TIMING_QUERY_BUDGET
+    ):
+        """
+        Wrap an ASGI app.
+
+        :param app: ASGI application.
+        :param query_budget: Statements per request before warning; 0
+            disables.
+        """
+        self.app = app
+        self.query_budget = query_budget
+        install()
+
+    async def __call__(
+        self, scope: Dict, receive: Callable, send: Callable
+    ) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        status: List[int] = []
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+                total = time.perf_counter() - timings.started
+                headers = list(message.get("headers", []))
+                headers.append((
+                    b"server-timing", timings.server_timing(total).encode()
+                ))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            self.log(scope, status[0] if status else 500, timings)
+
+    def log(self, scope: Dict, status: int, timings: RequestTimings) -> None:
+        """
+        Log the request's timings, warning when over the query budget.
+        """
+        total = time.perf_counter() - timings.started
+        fields = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "status": status,
+            "total_ms": round(total * 1000, 2),
+            "queries": timings.queries,
+            **{
+                f"{phase}_ms": round(seconds * 1000, 2)
+                for phase, seconds in timings.phases.items()
+            },
+        }
+        message = " ".join(f"{key}={value}" for key, value in fields.items())
+        if self.query_budget and timings.queries > self.query_budget:
+            statement, count = timings.repeated()
+            logger.warning(
+                "Query budget exceeded (%d > %d), %dx %s: %s",
+                timings.queries, self.query_budget, count, statement[:200],
+                message, extra={"timings": fields},
+            )
+        else:
+            logger.info(message, extra={"timings": fields})
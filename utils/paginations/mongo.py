@@ -2,36 +2,61 @@
 Mongo DB pagination
 """
 
+import base64
+
 import bson
 
+from bson import json_util
+
 from typing import Any
 from typing import List
 from typing import Dict
+from typing import Tuple
 from typing import Optional
+from typing import Sequence
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorCollection
+
 
-from motor.motor_asyncio import AsyncIOMotorCollection
+SortSpec = Sequence[Tuple[str, int]]
 
 
 class MongoPaginator:
     """
-    Implements pagination for MongoDB collections using a cursor-based approach.
+    Implements keyset pagination for MongoDB collections.
+
+    Each page is served by a single cursor that fetches ``limit + 1``
+    documents; the extra document only tells whether another page exists
+    in the direction of travel, so no additional probes are issued.
+
+    The sort may be any compound key, e.g. ``[("created_at", -1)]``.
+    ``_id`` is always appended as a tie-breaker so the key is unique, and
+    the collection should have a matching index such as
+    ``[("created_at", -1), ("_id", -1)]`` (see ``index_keys``).
 
     Attributes:
         collection (AsyncIOMotorCollection): The MongoDB collection to paginate.
-        query (Dict[str, Any]): The query filter for the collection.
+        query (Dict[str, Any]): The query filter for the collection. Never
+            mutated.
         limit (int): The maximum number of items per page.
-        cursor (Optional[str]): The starting point for pagination, represented as an ObjectId.
+        sort (List[Tuple[str, int]]): Compound sort key, ending with '_id'.
+        projection (Optional[Dict[str, Any]]): Fields to return for each
+            document.
+        cursor (Optional[Tuple[Any, ...]]): Sort key values to paginate from.
         next_cursor (Optional[str]): The cursor for the next page of results.
         previous_cursor (Optional[str]): The cursor for the previous page of results.
-        sort (int): Sorting order for the '_id' field (-1 for descending, 1 for ascending).
     """
 
     def __init__(
         self,
-        collection: AsyncIOMotorCollection,
+        collection: "AsyncIOMotorCollection",
         query: Dict[str, Any],
         limit: int,
-        cursor: Optional[str] = None
+        cursor: Optional[str] = None,
+        sort: Optional[SortSpec] = None,
+        projection: Optional[Dict[str, Any]] = None
     ):
         """
         Initialize the paginator with the collection, query, and pagination settings.
@@ -40,41 +65,170 @@ class MongoPaginator:
             collection (AsyncIOMotorCollection): The MongoDB collection to paginate.
             query (Dict[str, Any]): The query filter for the collection.
             limit (int): The maximum number of items per page.
-            cursor (Optional[str], optional): Starting point for pagination, as an ObjectId string.
+            cursor (Optional[str], optional): Cursor returned by a previous
+                page.
+            sort (Optional[SortSpec], optional): Compound sort key. Defaults
+                to '_id' descending.
+            projection (Optional[Dict[str, Any]], optional): Fields to return.
         """
         self.collection = collection
         self.query = query
         self.limit = limit
-        self.cursor = bson.ObjectId(cursor) if cursor else None
+        self.sort = self._build_sort(sort)
+        self.projection = self._build_projection(projection)
+        self.cursor = self.decode_cursor(cursor) if cursor else None
         self.next_cursor: Optional[str] = None
         self.previous_cursor: Optional[str] = None
-        self.sort = -1
 
-    async def has_next(self, last_item: bson.ObjectId) -> bool:
+    @staticmethod
+    def _build_sort(sort: Optional[SortSpec]) -> List[Tuple[str, int]]:
+        """
+        Normalize the sort spec and append '_id' as a unique tie-breaker.
+
+        Args:
+            sort (Optional[SortSpec]): Requested sort key.
+
+        Returns:
+            List[Tuple[str, int]]: Sort key guaranteed to end with '_id'.
+        """
+        keys = list(sort) if sort else [("_id", -1)]
+        if "_id" not in [field for field, _ in keys]:
+            keys.append(("_id", keys[-1][1]))
+        return keys
+
+    def _build_projection(
+        self,
+        projection: Optional[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
         """
-        Check if there is a next page of results.
+        Make sure an inclusion projection keeps the fields needed for cursors.
 
         Args:
-            last_item (bson.ObjectId): The ObjectId of the last item in the current page.
+            projection (Optional[Dict[str, Any]]): Requested projection.
 
         Returns:
-            bool: True if a next page exists, False otherwise.
+            Optional[Dict[str, Any]]: Projection including every sort field.
         """
-        result = await self.collection.find_one({"_id": {"$lt": last_item}})
-        return True if result else False
+        if not projection:
+            return None
+        projection = dict(projection)
+        if any(value for key, value in projection.items() if key != "_id"):
+            for field, _ in self.sort:
+                projection[field] = 1
+        return projection
 
-    async def has_previous(self, first_item: bson.ObjectId) -> bool:
+    @property
+    def index_keys(self) -> List[Tuple[str, int]]:
         """
-        Check if there is a previous page of results.
+        Index specification that backs this paginator's sort.
+
+        Returns:
+            List[Tuple[str, int]]: Keys to pass to ``create_index``.
+        """
+        return list(self.sort)
+
+    @staticmethod
+    def _get_value(document: Dict[str, Any], field: str) -> Any:
+        """
+        Read a (possibly dotted) field from a document.
+
+        Args:
+            document (Dict[str, Any]): The document to read from.
+            field (str): Field name, dotted for nested documents.
+
+        Returns:
+            Any: The field value, or None if missing.
+        """
+        value: Any = document
+        for part in field.split("."):
+            if not isinstance(value, dict):
+                return None
+            value = value.get(part)
+        return value
+
+    def encode_cursor(self, document: Dict[str, Any]) -> str:
+        """
+        Encode the sort key of a document into an opaque cursor string.
+
+        A plain ObjectId string is used when sorting on '_id' alone, which
+        keeps cursors compatible with the previous format.
 
         Args:
-            first_item (bson.ObjectId): The ObjectId of the first item in the current page.
+            document (Dict[str, Any]): The document at the page boundary.
 
         Returns:
-            bool: True if a previous page exists, False otherwise.
+            str: The cursor string.
         """
-        result = await self.collection.find_one({"_id": {"$gt": first_item}})
-        return True if result else False
+        values = [self._get_value(document, field) for field, _ in self.sort]
+        if len(values) == 1 and isinstance(values[0], bson.ObjectId):
+            return str(values[0])
+        payload = json_util.dumps(values).encode()
+        return base64.urlsafe_b64encode(payload).decode()
+
+    def decode_cursor(self, cursor: str) -> Tuple[Any, ...]:
+        """
+        Decode a cursor string back into sort key values.
+
+        Args:
+            cursor (str): The cursor string.
+
+        Returns:
+            Tuple[Any, ...]: Values for each field of the sort key.
+
+        Raises:
+            ValueError: If the cursor does not match the sort key.
+        """
+        if len(self.sort) == 1 and bson.ObjectId.is_valid(cursor):
+            return (bson.ObjectId(cursor),)
+        try:
+            values = json_util.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (ValueError, TypeError) as e:
+            raise ValueError("Invalid pagination cursor") from e
+        if not isinstance(values, list) or len(values) != len(self.sort):
+            raise ValueError("Invalid pagination cursor")
+        return tuple(values)
+
+    def _keyset_filter(self, forward: bool) -> Dict[str, Any]:
+        """
+        Build the filter that selects documents after (or before) the cursor.
+
+        For a sort key (k1, k2, ..., kn) this expands to
+        ``k1 > v1 OR (k1 = v1 AND k2 > v2) OR ...`` with the comparison
+        operator flipped for descending fields and for backward paging.
+
+        Args:
+            forward (bool): Direction of pagination.
+
+        Returns:
+            Dict[str, Any]: The keyset filter.
+        """
+        branches = []
+        for i, (field, direction) in enumerate(self.sort):
+            ascending = (direction == 1) == forward
+            branch = {
+                prev_field: self.cursor[j]
+                for j, (prev_field, _) in enumerate(self.sort[:i])
+            }
+            branch[field] = {"$gt" if ascending else "$lt": self.cursor[i]}
+            branches.append(branch)
+        return branches[0] if len(branches) == 1 else {"$or": branches}
+
+    def _build_query(self, forward: bool) -> Dict[str, Any]:
+        """
+        Combine the caller's query with the keyset filter without mutating it.
+
+        Args:
+            forward (bool): Direction of pagination.
+
+        Returns:
+            Dict[str, Any]: The query to run.
+        """
+        if self.cursor is None:
+            return self.query
+        keyset = self._keyset_filter(forward)
+        if not self.query:
+            return keyset
+        return {"$and": [self.query, keyset]}
 
     async def get_page(self, forward: bool = True) -> List[Dict[str, Any]]:
         """
@@ -86,34 +240,35 @@ class MongoPaginator:
         Returns:
             List[Dict[str, Any]]: A list of documents for the current page.
         """
-        if self.cursor:
-            if forward:
-                self.query['_id'] = {'$lt': self.cursor}
-            else:
-                self.query['_id'] = {'$gt': self.cursor}
-
+        sort = [
+            (field, direction if forward else -direction)
+            for field, direction in self.sort
+        ]
         cursor = (
             self.collection
-            .find(self.query)
-            .sort('_id', self.sort)
-            .limit(self.limit)
+            .find(self._build_query(forward), self.projection)
+            .sort(sort)
+            .limit(self.limit + 1)
         )
+        results = await cursor.to_list(length=self.limit + 1)
+
+        has_more = len(results) > self.limit
+        results = results[:self.limit]
+        if not forward:
+            results.reverse()
 
-        results = await cursor.to_list(length=None)
+        if forward:
+            has_next, has_previous = has_more, self.cursor is not None
+        else:
+            has_next, has_previous = self.cursor is not None, has_more
 
         if results:
-            if await self.has_previous(results[0]['_id']):
-                self.previous_cursor = str(results[0]['_id'])
-            else:
-                self.previous_cursor = None
-
-            if len(results) < self.limit:
-                self.next_cursor = None
-            else:
-                if await self.has_next(results[-1]['_id']):
-                    self.next_cursor = str(results[-1]['_id'])
-                else:
-                    self.next_cursor = None
+            self.previous_cursor = (
+                self.encode_cursor(results[0]) if has_previous else None
+            )
+            self.next_cursor = (
+                self.encode_cursor(results[-1]) if has_next else None
+            )
         else:
             self.next_cursor = None
             self.previous_cursor = None
@@ -0,0 +1,5 @@
+"""
+Initialize probes
+"""
+
+from .readiness import * # noqa
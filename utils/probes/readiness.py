@@ -0,0 +1,173 @@
+"""
+Readiness probe with cached dependency checks
+"""
+
+import time
+import asyncio
+import logging
+
+from typing import Any
+from typing import Dict
+from typing import Tuple
+from typing import Callable
+from typing import Awaitable
+
+from db.registry import registry
+from libs.environs import env
+
+
+logger = logging.getLogger(__name__)
+
+READINESS_CACHE_TTL = env.float("READINESS_CACHE_TTL", default=2.0)
+READINESS_TIMEOUT = env.float("READINESS_TIMEOUT", default=1.0)
+READINESS_CHECK_MIGRATIONS = env.bool(
+    "READINESS_CHECK_MIGRATIONS", default=True
+)
+
+Check = Callable[[], Awaitable[Any]]
+
+
+async def check_sql(name: str) -> None:
+    """
+    Run `SELECT 1` on a pooled connection of a SQL backend.
+    """
+    async with registry.get(name).connect() as connection:
+        await connection.exec_driver_sql("SELECT 1")
+
+
+async def check_shard(name: str) -> None:
+    """
+    Run `SELECT 1` on a pooled connection of a shard.
+    """
+    engine = registry.get("shards").engines[name]
+    async with engine.connect() as connection:
+        await connection.exec_driver_sql("SELECT 1")
+
+
+async def check_redis() -> None:
+    """
+    Ping the asyncio Redis client.
+    """
+    await registry.get("redis_async").ping()
+
+
+async def check_mongo() -> None:
+    """
+    Ping the MongoDB deployment.
+    """
+    await registry.get("mongo").client.admin.command("ping")
+
+
+async def check_migrations() -> None:
+    """
+    Fail while the PostgreSQL schema is behind the migration scripts.
+    """
+    from db.storage.postgres.revisions import pending_migrations
+
+    async with registry.get("postgres").connect() as connection:
+        if await pending_migrations(connection):
+            raise RuntimeError("migrations pending")
+
+
+class ReadinessProbe:
+    """
+    Runs the dependency checks of the readiness endpoint.
+
+    Checks run concurrently, each bounded by `timeout`, and their results
+    are cached for `ttl` seconds, so frequent probes from several
+    orchestrators cost at most one round of checks per interval. A single
+    round is in flight at a time; concurrent probes wait for it. Once
+    `draining` is set the probe fails without running any check.
+    """
+
+    def __init__(
+        self,
+        ttl: float = READINESS_CACHE_TTL,
+        timeout: float = READINESS_TIMEOUT,
+    ):
+        """
+        Initialize a probe without checks.
+
+        :param ttl: Seconds a round of results is reused.
+        :param timeout: Seconds each check may take.
+        """
+        self.ttl = ttl
+        self.timeout = timeout
+        self.checks: Dict[str, Check] = {}
+        self.draining = False
+        self._results: Dict[str, str] = {}
+        self._checked_at = float("-inf")
+        self._lock = asyncio.Lock()
+
+    def register(self, name: str, check: Check) -> None:
+        """
+        Add a check; it passes unless it raises or times out.
+
+        :param name: Name reported in the results.
+        :param check: Coroutine function running the check.
+        """
+        self.checks[name] = check
+
+    async def check(self) -> Tuple[bool, Dict[str, str]]:
+        """
+        Return whether every dependency is ready, and each check's result:
+        'ok' or the error.
+        """
+        if self.draining:
+            return False, {"draining": "shutting down"}
+        if time.monotonic() - self._checked_at >= self.ttl:
+            async with self._lock:
+                if time.monotonic() - self._checked_at >= self.ttl:
+                    self._results = await self._run()
+                    self._checked_at = time.monotonic()
+        results = dict(self._results)
+        return all(r == "ok" for r in results.values()), results
+
+    async def _run(self) -> Dict[str, str]:
+        names = list(self.checks)
+        outcomes = await asyncio.gather(
+            *(
+                asyncio.wait_for(self.checks[name](), self.timeout)
+                for name in names
+            ),
+            return_exceptions=True,
+        )
+        results = {}
+        for name, outcome in zip(names, outcomes):
+            if isinstance(outcome, BaseException):
+                if isinstance(outcome, asyncio.TimeoutError):
+                    outcome = "timed out"
+                results[name] = f"error: {outcome}"
+                logger.warning("Readiness check %s failed: %s", name, outcome)
+            else:
+                results[name] = "ok"
+        return results
+
+
+def default_probe() -> ReadinessProbe:
+    """
+    Build a probe checking every enabled datastore backend, and pending
+    migrations when PostgreSQL is enabled and READINESS_CHECK_MIGRATIONS
+    is set.
+    """
+    probe = ReadinessProbe()
+    for name in ("postgres", "mysql"):
+        if registry.is_enabled(name):
+            probe.register(name, lambda name=name: check_sql(name))
+    if registry.is_enabled("shards"):
+        from db.storage.postgres.shards import SHARDS
+
+        for name in SHARDS:
+            probe.register(
+                f"shard:{name}", lambda name=name: check_shard(name)
+            )
+    if registry.is_enabled("redis_async"):
+        probe.register("redis", check_redis)
+    if registry.is_enabled("mongo"):
+        probe.register("mongo", check_mongo)
+    if READINESS_CHECK_MIGRATIONS and registry.is_enabled("postgres"):
+        probe.register("migrations", check_migrations)
+    return probe
+
+
+readiness = default_probe()
@@ -0,0 +1,7 @@
+"""
+Initialize queues
+"""
+
+from .tasks import * # noqa
+from .queue import * # noqa
+from .worker import * # noqa
@@ -0,0 +1,261 @@
+"""
+Redis Streams job queue
+"""
+
+import json
+import time
+import uuid
+import random
+
+from typing import Any
+from typing import Dict
+from typing import Optional
+
+from db.registry import registry
+from libs.environs import env
+
+
+QUEUE_NAME = env.str("QUEUE_NAME", default="default")
+QUEUE_GROUP = env.str("QUEUE_GROUP", default="workers")
+QUEUE_MAX_LEN = env.int("QUEUE_MAX_LEN", default=100000)
+QUEUE_RESULT_TTL = env.int("QUEUE_RESULT_TTL", default=86400)
+QUEUE_RETRY_BACKOFF = env.float("QUEUE_RETRY_BACKOFF", default=1.0)
+QUEUE_RETRY_BACKOFF_MAX = env.float("QUEUE_RETRY_BACKOFF_MAX", default=300.0)
+
+PROMOTE_SCRIPT = """
+local due = redis.call(
+    'zrangebyscore', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2]
+)
+for _, member in ipairs(due) do
+    redis.call('zrem', KEYS[1], member)
+    local job = cjson.decode(member)
+    redis.call(
+        'xadd', KEYS[2], 'MAXLEN', '~', ARGV[3], '*',
+        'id', job.id, 'task', job.task, 'payload', job.payload,
+        'attempt', job.attempt, 'max_retries', job.max_retries
+    )
+end
+return #due
+"""
+
+
+def _decode(value: Any) -> Any:
+    """
+    Decode bytes returned by Redis into str.
+    """
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class JobQueue:
+    """
+    Job queue on a Redis Stream consumed through a consumer group.
+
+    Each job is a stream entry; its status lives in a `job:<id>` hash that
+    expires after QUEUE_RESULT_TTL so clients can poll it. Failed jobs are
+    retried with exponential backoff through a delayed sorted set, and
+    jobs that exhaust their retries are copied to a dead-letter stream.
+
+    Keys:
+        queue:<name>          stream of ready jobs
+        queue:<name>:delayed  sorted set of jobs waiting for a retry
+        queue:<name>:dead     dead-letter stream
+        job:<id>              status hash
+    """
+
+    def __init__(self, name: str = QUEUE_NAME, client: Any = None):
+        """
+        Initialize the queue.
+
+        :param name: Queue name.
+        :param client: redis.asyncio client; defaults to the registry's.
+        """
+        self.name = name
+        self.group = QUEUE_GROUP
+        self.stream = f"queue:{name}"
+        self.delayed = f"queue:{name}:delayed"
+        self.dead = f"queue:{name}:dead"
+        self._client = client
+
+    @property
+    def client(self) -> Any:
+        """
+        The asyncio Redis client given to the constructor, or else the
+        registry's, looked up on every access so that after
+        `registry.after_fork()` a worker never reuses its parent's client.
+        """
+        if self._client is not None:
+            return self._client
+        return registry.get("redis_async")
+
+    @staticmethod
+    def job_key(job_id: str) -> str:
+        """
+        Return the Redis key of a job's status hash.
+        """
+        return f"job:{job_id}"
+
+    async def ensure_group(self) -> None:
+        """
+        Create the stream and consumer group if they do not exist.
+        """
+        try:
+            await self.client.xgroup_create(
+                self.stream, self.group, id="0", mkstream=True
+            )
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def set_status(self, job_id: str, **fields: Any) -> None:
+        """
+        Update a job's status hash and refresh its expiry.
+
+        :param job_id: Job id.
+        :param fields: Fields to store; non-string values are JSON encoded.
+        """
+        mapping = {
+            key: value if isinstance(value, str) else json.dumps(value)
+            for key, value in fields.items()
+        }
+        key = self.job_key(job_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping=mapping)
+            pipe.expire(key, QUEUE_RESULT_TTL)
+            await pipe.execute()
+
+    async def enqueue(
+        self,
+        task: str,
+        max_retries: Optional[int] = None,
+        **kwargs: Any,
+    ) -> str:
+        """
+        Add a job to the queue.
+
+        :param task: Registered task name.
+        :param max_retries: Override of the task's retry limit.
+        :param kwargs: JSON-serializable keyword arguments for the task.
+        :return: Job id to poll with `status`.
+        """
+        job_id = uuid.uuid4().hex
+        key = self.job_key(job_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping={
+                "id": job_id,
+                "task": task,
+                "status": "queued",
+                "attempt": "0",
+                "enqueued_at": str(time.time()),
+            })
+            pipe.expire(key, QUEUE_RESULT_TTL)
+            pipe.xadd(
+                self.stream,
+                {
+                    "id": job_id,
+                    "task": task,
+                    "payload": json.dumps(kwargs),
+                    "attempt": "0",
+                    "max_retries": (
+                        "" if max_retries is None else str(max_retries)
+                    ),
+                },
+                maxlen=QUEUE_MAX_LEN,
+                approximate=True,
+            )
+            await pipe.execute()
+        return job_id
+
+    async def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return a job's status, or None if unknown or expired.
+
+        :param job_id: Job id.
+        :return: Status fields, with the JSON result decoded.
+        """
+        raw = await self.client.hgetall(self.job_key(job_id))
+        if not raw:
+            return None
+        status = {}
+        for key, value in raw.items():
+            key, value = _decode(key), _decode(value)
+            if key == "result":
+                value = json.loads(value)
+            status[key] = value
+        return status
+
+    async def ack(self, entry_id: str) -> None:
+        """
+        Acknowledge and remove a processed stream entry.
+
+        :param entry_id: Stream entry id.
+        """
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.xack(self.stream, self.group, entry_id)
+            pipe.xdel(self.stream, entry_id)
+            await pipe.execute()
+
+    async def touch(self, entry_id: str, consumer: str) -> None:
+        """
+        Reset the idle time of an entry being processed, so it is not
+        reclaimed by another consumer while its job is still running.
+
+        :param entry_id: Stream entry id.
+        :param consumer: Consumer currently owning the entry.
+        """
+        await self.client.xclaim(
+            self.stream, self.group, consumer,
+            min_idle_time=0, message_ids=[entry_id], justid=True,
+        )
+
+    async def retry(self, job: Dict[str, str], error: str) -> float:
+        """
+        Schedule a failed job for another attempt with exponential backoff.
+
+        :param job: Stream entry fields of the failed job.
+        :param error: Description of the failure.
+        :return: Delay in seconds before the retry.
+        """
+        attempt = int(job["attempt"]) + 1
+        delay = min(
+            QUEUE_RETRY_BACKOFF * 2 ** (attempt - 1), QUEUE_RETRY_BACKOFF_MAX
+        )
+        delay *= random.uniform(0.5, 1.0)
+        member = json.dumps({**job, "attempt": str(attempt)})
+        await self.client.zadd(self.delayed, {member: time.time() + delay})
+        await self.set_status(
+            job["id"], status="retrying", attempt=str(attempt), error=error
+        )
+        return delay
+
+    async def dead_letter(self, job: Dict[str, str], error: str) -> None:
+        """
+        Move a job that cannot succeed to the dead-letter stream.
+
+        :param job: Stream entry fields of the failed job.
+        :param error: Description of the last failure.
+        """
+        await self.client.xadd(
+            self.dead, {**job, "error": error}, maxlen=QUEUE_MAX_LEN,
+            approximate=True,
+        )
+        await self.set_status(
+            job["id"], status="dead", error=error, finished_at=str(time.time())
+        )
+
+    async def promote_delayed(self, batch: int = 100) -> int:
+        """
+        Move retries whose backoff has elapsed back onto the stream.
+
+        Runs as a Lua script so a job is never lost or duplicated between
+        the sorted set and the stream.
+
+        :param batch: Maximum number of jobs to move.
+        :return: Number of jobs moved.
+        """
+        return await self.client.eval(
+            PROMOTE_SCRIPT, 2, self.delayed, self.stream,
+            time.time(), batch, QUEUE_MAX_LEN,
+        )
+
+
+queue = JobQueue()
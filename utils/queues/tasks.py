@@ -0,0 +1,88 @@
+"""
+Background task registry
+"""
+
+from typing import Any
+from typing import Dict
+from typing import Callable
+from typing import Optional
+
+
+class Task:
+    """
+    Declaration of a background task.
+
+    Attributes:
+        name (str): Name the task is enqueued under.
+        func (Callable): Coroutine function or plain function to run.
+        max_retries (int): Retries before the job goes to the dead-letter
+            queue.
+    """
+
+    def __init__(self, name: str, func: Callable, max_retries: int):
+        """
+        Declare a task.
+
+        :param name: Name the task is enqueued under.
+        :param func: Coroutine function, or blocking function run in a thread.
+        :param max_retries: Retries before the job is dead-lettered.
+        """
+        self.name = name
+        self.func = func
+        self.max_retries = max_retries
+
+
+class TaskRegistry:
+    """
+    Registry of task handlers known to workers.
+
+    Usage:
+        @tasks.task("users.export", max_retries=5)
+        async def export_users(**kwargs): ...
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty registry.
+        """
+        self._tasks: Dict[str, Task] = {}
+
+    def task(
+        self,
+        name: Optional[str] = None,
+        max_retries: int = 3,
+    ) -> Callable[[Callable], Callable]:
+        """
+        Decorator declaring a function as a background task.
+
+        :param name: Task name; defaults to the function's qualified name.
+        :param max_retries: Retries before the job is dead-lettered.
+        :return: Decorator returning the function unchanged.
+        """
+        def decorator(func: Callable) -> Callable:
+            task_name = name or f"{func.__module__}.{func.__qualname__}"
+            if task_name in self._tasks:
+                raise ValueError(f"Task '{task_name}' is already registered")
+            self._tasks[task_name] = Task(task_name, func, max_retries)
+            return func
+
+        return decorator
+
+    def get(self, name: str) -> Task:
+        """
+        Return a task declaration by name.
+
+        :param name: Task name.
+        :return: Task declaration.
+        :raises KeyError: If the task is unknown.
+        """
+        return self._tasks[name]
+
+    def __contains__(self, name: Any) -> bool:
+        """
+        Check whether a task is registered.
+        """
+        return name in self._tasks
+
+
+tasks = TaskRegistry()
@@ -0,0 +1,218 @@
+"""
+Job queue worker
+"""
+
+import os
+import json
+import time
+import socket
+import asyncio
+import logging
+
+from typing import Any
+from typing import Dict
+from typing import Set
+from typing import Optional
+
+from libs.environs import env
+from utils.queues.tasks import tasks
+from utils.queues.tasks import TaskRegistry
+from utils.queues.queue import queue
+from utils.queues.queue import JobQueue
+from utils.queues.queue import _decode
+
+
+logger = logging.getLogger(__name__)
+
+QUEUE_CONCURRENCY = env.int("QUEUE_CONCURRENCY", default=10)
+QUEUE_VISIBILITY_TIMEOUT = env.int("QUEUE_VISIBILITY_TIMEOUT", default=300)
+QUEUE_BLOCK_MS = env.int("QUEUE_BLOCK_MS", default=1000)
+
+
+class Worker:
+    """
+    Consumes jobs from a JobQueue with bounded concurrency.
+
+    The worker reads only as many entries as it has free slots, runs
+    coroutine tasks on the event loop and blocking ones in threads, and
+    acknowledges each entry once it has succeeded, been scheduled for a
+    retry or been dead-lettered. While a job runs its entry is claimed
+    again every third of QUEUE_VISIBILITY_TIMEOUT, so only entries left
+    pending by a crashed worker go idle long enough to be reclaimed.
+    """
+
+    def __init__(
+        self,
+        job_queue: JobQueue = queue,
+        registry_: TaskRegistry = tasks,
+        concurrency: int = QUEUE_CONCURRENCY,
+        consumer: Optional[str] = None,
+    ):
+        """
+        Initialize the worker.
+
+        :param job_queue: Queue to consume.
+        :param registry_: Registry resolving task names to handlers.
+        :param concurrency: Maximum number of jobs running at once.
+        :param consumer: Consumer name; defaults to host and pid.
+        """
+        self.queue = job_queue
+        self.tasks = registry_
+        self.concurrency = concurrency
+        self.consumer = consumer or f"{socket.gethostname()}:{os.getpid()}"
+        self._running: Set[asyncio.Task] = set()
+        self._stopping = False
+
+    async def handle(self, entry_id: str, job: Dict[str, str]) -> None:
+        """
+        Run a single job and record its outcome.
+
+        :param entry_id: Stream entry id.
+        :param job: Stream entry fields.
+        """
+        job_id = job["id"]
+        try:
+            task = self.tasks.get(job["task"])
+        except KeyError:
+            await self.queue.dead_letter(job, f"Unknown task '{job['task']}'")
+            await self.queue.ack(entry_id)
+            return
+
+        max_retries = (
+            int(job["max_retries"]) if job.get("max_retries")
+            else task.max_retries
+        )
+        await self.queue.set_status(
+            job_id, status="running", started_at=str(time.time())
+        )
+        heartbeat = asyncio.create_task(self._heartbeat(entry_id))
+        try:
+            kwargs = json.loads(job["payload"])
+            if asyncio.iscoroutinefunction(task.func):
+                result = await task.func(**kwargs)
+            else:
+                result = await asyncio.to_thread(task.func, **kwargs)
+        except Exception as e:
+            error = repr(e)
+            if int(job["attempt"]) < max_retries:
+                delay = await self.queue.retry(job, error)
+                logger.warning(
+                    "Job %s (%s) failed, retrying in %.1fs: %s",
+                    job_id, task.name, delay, error,
+                )
+            else:
+                await self.queue.dead_letter(job, error)
+                logger.error(
+                    "Job %s (%s) dead-lettered: %s", job_id, task.name, error
+                )
+        else:
+            await self.queue.set_status(
+                job_id,
+                status="succeeded",
+                result=self._encode_result(job_id, result),
+                finished_at=str(time.time()),
+            )
+        finally:
+            heartbeat.cancel()
+        await self.queue.ack(entry_id)
+
+    async def _heartbeat(self, entry_id: str) -> None:
+        """
+        Keep claiming a running job's entry until cancelled.
+
+        :param entry_id: Stream entry id.
+        """
+        while True:
+            await asyncio.sleep(QUEUE_VISIBILITY_TIMEOUT / 3)
+            try:
+                await self.queue.touch(entry_id, self.consumer)
+            except Exception as e:
+                logger.warning("Heartbeat of %s failed: %s", entry_id, e)
+
+    @staticmethod
+    def _encode_result(job_id: str, result: Any) -> str:
+        """
+        JSON encode a job's result. The job already succeeded, so a result
+        that cannot be encoded is stored as its repr instead of failing it.
+
+        :param job_id: Job id, for logging.
+        :param result: Value returned by the task.
+        :return: JSON document.
+        """
+        try:
+            return json.dumps(result)
+        except (TypeError, ValueError) as e:
+            logger.warning(
+                "Result of job %s is not JSON serializable: %s", job_id, e
+            )
+            return json.dumps(repr(result))
+
+    def _spawn(self, entry_id: Any, fields: Dict[Any, Any]) -> None:
+        """
+        Start handling an entry in the background.
+        """
+        job = {_decode(k): _decode(v) for k, v in fields.items()}
+        task = asyncio.create_task(self.handle(_decode(entry_id), job))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _reclaim(self) -> None:
+        """
+        Take over entries another consumer left pending for too long.
+        """
+        free = self.concurrency - len(self._running)
+        if free <= 0:
+            return
+        result = await self.queue.client.xautoclaim(
+            self.queue.stream,
+            self.queue.group,
+            self.consumer,
+            min_idle_time=QUEUE_VISIBILITY_TIMEOUT * 1000,
+            count=free,
+        )
+        for entry_id, fields in result[1]:
+            if fields:
+                self._spawn(entry_id, fields)
+
+    async def run(self) -> None:
+        """
+        Consume jobs until `stop` is called, then wait for running jobs.
+        """
+        await self.queue.ensure_group()
+        logger.info(
+            "Worker %s consuming %s with concurrency %d",
+            self.consumer, self.queue.stream, self.concurrency,
+        )
+        last_reclaim = 0.0
+        while not self._stopping:
+            await self.queue.promote_delayed()
+            if time.monotonic() - last_reclaim > QUEUE_VISIBILITY_TIMEOUT / 2:
+                await self._reclaim()
+                last_reclaim = time.monotonic()
+
+            free = self.concurrency - len(self._running)
+            if free <= 0:
+                await asyncio.wait(
+                    self._running, return_when=asyncio.FIRST_COMPLETED
+                )
+                continue
+
+            response = await self.queue.client.xreadgroup(
+                self.queue.group,
+                self.consumer,
+                {self.queue.stream: ">"},
+                count=free,
+                block=QUEUE_BLOCK_MS,
+            )
+            for _, entries in response or []:
+                for entry_id, fields in entries:
+                    self._spawn(entry_id, fields)
+
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    def stop(self) -> None:
+        """
+        Ask the worker to stop reading new jobs.
+        """
+        self._stopping = True
@@ -0,0 +1,7 @@
+"""
+Initialize schedulers
+"""
+
+from .registry import * # noqa
+from .leader import * # noqa
+from .scheduler import * # noqa
@@ -0,0 +1,133 @@
+"""
+Redis leader election
+"""
+
+import os
+import uuid
+import socket
+import asyncio
+import logging
+
+from typing import Any
+from typing import Optional
+
+
+logger = logging.getLogger(__name__)
+
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class LeaderLock:
+    """
+    Elects a single leader across processes with a Redis lock.
+
+    The lock is a key set with `NX PX ttl` holding this instance's id. The
+    leader renews the TTL every third of its lifetime; followers retry
+    acquiring it at the same rate. If the leader dies, the key expires and
+    another instance takes over within one TTL.
+
+    Without a Redis client there is nothing to elect with: in standalone
+    mode the process always considers itself leader, otherwise it never
+    leads.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        key: str,
+        ttl: float = 30.0,
+        standalone: bool = True,
+    ):
+        """
+        Initialize the lock.
+
+        :param client: redis.asyncio client, or None to run without Redis.
+        :param key: Redis key of the lock.
+        :param ttl: Lock lifetime in seconds.
+        :param standalone: Whether to lead when there is no client; only
+            safe when this is the only process.
+        """
+        self.client = client
+        self.key = key
+        self.ttl = ttl
+        self.identity = (
+            f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}"
+        )
+        self.is_leader = client is None and standalone
+        self._task: Optional[asyncio.Task] = None
+
+    async def _try_acquire(self) -> bool:
+        """
+        Take the lock if it is free, or extend it if we already hold it.
+
+        :return: True if this instance holds the lock.
+        """
+        ttl_ms = int(self.ttl * 1000)
+        if self.is_leader:
+            renewed = await self.client.eval(
+                RENEW_SCRIPT, 1, self.key, self.identity, ttl_ms
+            )
+            return bool(renewed)
+        acquired = await self.client.set(
+            self.key, self.identity, nx=True, px=ttl_ms
+        )
+        return bool(acquired)
+
+    async def _run(self) -> None:
+        """
+        Acquire/renew loop running for the lifetime of the process.
+        """
+        while True:
+            try:
+                leader = await self._try_acquire()
+            except Exception as e:
+                logger.warning("Leader lock %s unavailable: %s", self.key, e)
+                leader = False
+            if leader != self.is_leader:
+                logger.info(
+                    "%s leadership of %s",
+                    "Acquired" if leader else "Lost",
+                    self.key,
+                )
+            self.is_leader = leader
+            await asyncio.sleep(self.ttl / 3)
+
+    async def start(self) -> None:
+        """
+        Start competing for leadership in the background.
+        """
+        if self.client is not None and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stop renewing and release the lock so another instance takes over.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self.is_leader:
+            try:
+                await self.client.eval(
+                    RELEASE_SCRIPT, 1, self.key, self.identity
+                )
+            except Exception as e:
+                logger.warning("Failed to release %s: %s", self.key, e)
+        self.is_leader = False
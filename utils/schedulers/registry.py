@@ -0,0 +1,159 @@
+"""
+Scheduled job registry
+"""
+
+import asyncio
+
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Callable
+from typing import Optional
+
+
+EXECUTORS = ("event_loop", "thread", "process")
+
+
+class Job:
+    """
+    Declaration of a scheduled job and its run statistics.
+
+    Attributes:
+        name (str): Unique job name, also used as the APScheduler job id.
+        func (Callable): Coroutine function or plain function to run.
+        trigger (str): APScheduler trigger name: 'interval', 'cron' or 'date'.
+        trigger_args (Dict[str, Any]): Arguments for the trigger.
+        executor (str): Where the job runs: 'event_loop', 'thread' or
+            'process'.
+        runs (int): Number of completed runs in this process.
+        failures (int): Number of failed runs in this process.
+        last_duration (Optional[float]): Duration of the last run in seconds.
+        last_lag (Optional[float]): Delay between scheduled and actual start.
+        last_error (Optional[str]): Error of the last failed run.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable,
+        trigger: str,
+        trigger_args: Dict[str, Any],
+        executor: str = "event_loop",
+    ):
+        """
+        Declare a job.
+
+        :param name: Unique job name.
+        :param func: Coroutine function or plain function to run.
+        :param trigger: APScheduler trigger name.
+        :param trigger_args: Arguments for the trigger.
+        :param executor: 'event_loop' (default for coroutines), 'thread' for
+            blocking I/O, or 'process' for CPU-heavy module-level functions.
+        :raises ValueError: If the executor does not fit the function.
+        """
+        if executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor '{executor}'")
+        if executor != "event_loop" and asyncio.iscoroutinefunction(func):
+            raise ValueError(
+                f"Job '{name}' is a coroutine and must run on the event loop"
+            )
+        self.name = name
+        self.func = func
+        self.trigger = trigger
+        self.trigger_args = trigger_args
+        self.executor = executor
+        self.runs = 0
+        self.failures = 0
+        self.last_run_at: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.last_lag: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the job's run statistics.
+
+        :return: Dictionary of statistics.
+        """
+        return {
+            "name": self.name,
+            "executor": self.executor,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_run_at": self.last_run_at,
+            "last_duration": self.last_duration,
+            "last_lag": self.last_lag,
+            "last_error": self.last_error,
+        }
+
+
+class JobRegistry:
+    """
+    Registry where modules declare their scheduled jobs.
+
+    Usage:
+        @jobs.job("interval", minutes=5, executor="thread")
+        def cleanup(): ...
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty registry.
+        """
+        self._jobs: Dict[str, Job] = {}
+
+    def register(self, job: Job) -> Job:
+        """
+        Add a job declaration.
+
+        :param job: Job declaration.
+        :return: The registered job.
+        :raises ValueError: If a job with the same name exists.
+        """
+        if job.name in self._jobs:
+            raise ValueError(f"Job '{job.name}' is already registered")
+        self._jobs[job.name] = job
+        return job
+
+    def job(
+        self,
+        trigger: str,
+        name: Optional[str] = None,
+        executor: str = "event_loop",
+        **trigger_args: Any,
+    ) -> Callable[[Callable], Callable]:
+        """
+        Decorator declaring a function as a scheduled job.
+
+        :param trigger: APScheduler trigger name.
+        :param name: Job name; defaults to the function's qualified name.
+        :param executor: Where the job runs, see `Job`.
+        :param trigger_args: Arguments for the trigger.
+        :return: Decorator returning the function unchanged.
+        """
+        def decorator(func: Callable) -> Callable:
+            job_name = name or f"{func.__module__}.{func.__qualname__}"
+            self.register(Job(job_name, func, trigger, trigger_args, executor))
+            return func
+
+        return decorator
+
+    def get(self, name: str) -> Job:
+        """
+        Return a job declaration by name.
+
+        :param name: Job name.
+        :return: Job declaration.
+        """
+        return self._jobs[name]
+
+    def all(self) -> List[Job]:
+        """
+        Return every registered job.
+
+        :return: List of job declarations.
+        """
+        return list(self._jobs.values())
+
+
+jobs = JobRegistry()
@@ -0,0 +1,201 @@
+"""
+Distributed-safe job scheduler
+"""
+
+import time
+import asyncio
+import logging
+
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from concurrent.futures import Executor
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor
+
+from db.registry import registry
+from libs.environs import env
+from utils.metrics.collectors import SCHEDULER_JOB_DURATION
+from utils.metrics.collectors import SCHEDULER_JOB_FAILURES
+from utils.schedulers.registry import Job
+from utils.schedulers.registry import jobs
+from utils.schedulers.registry import JobRegistry
+from utils.schedulers.leader import LeaderLock
+
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_ENABLED = env.bool("SCHEDULER_ENABLED", default=True)
+SCHEDULER_LOCK_KEY = env.str(
+    "SCHEDULER_LOCK_KEY", default="scheduler:leader"
+)
+SCHEDULER_LOCK_TTL = env.float("SCHEDULER_LOCK_TTL", default=30.0)
+SCHEDULER_THREAD_WORKERS = env.int("SCHEDULER_THREAD_WORKERS", default=4)
+SCHEDULER_PROCESS_WORKERS = env.int("SCHEDULER_PROCESS_WORKERS", default=2)
+# Number of server processes; set by `python -m src.commands.serve`.
+WEB_WORKERS = env.int("WEB_WORKERS", default=1)
+
+
+class Scheduler:
+    """
+    Runs registered jobs exactly once across all workers.
+
+    Every worker starts an APScheduler instance, but a job body only runs
+    in the worker currently holding the Redis leader lock. When Redis is
+    disabled the scheduler runs standalone, as leader, with a single
+    worker; with several workers and no Redis no worker can be elected,
+    so jobs do not run at all rather than once per worker.
+
+    Coroutine jobs run on the event loop. Blocking jobs can run in a
+    thread pool, and CPU-heavy ones in a process pool so they do not
+    starve request handling. Pools are created on start, after any fork.
+    """
+
+    def __init__(self, registry_: JobRegistry = jobs):
+        """
+        Initialize the scheduler for a job registry.
+
+        :param registry_: Registry holding the jobs to schedule.
+        """
+        self.jobs = registry_
+        self.leader: Optional[LeaderLock] = None
+        self._scheduler: Any = None
+        self._executors: Dict[str, Executor] = {}
+
+    def _executor(self, kind: str) -> Executor:
+        """
+        Return the pool for a job executor kind, creating it on first use.
+
+        :param kind: 'thread' or 'process'.
+        :return: The executor.
+        """
+        if kind not in self._executors:
+            if kind == "process":
+                self._executors[kind] = ProcessPoolExecutor(
+                    max_workers=SCHEDULER_PROCESS_WORKERS
+                )
+            else:
+                self._executors[kind] = ThreadPoolExecutor(
+                    max_workers=SCHEDULER_THREAD_WORKERS,
+                    thread_name_prefix="scheduler",
+                )
+        return self._executors[kind]
+
+    async def run_job(self, job: Job) -> None:
+        """
+        Run a job once if this worker is the leader, recording its stats.
+
+        :param job: Job to run.
+        """
+        if self.leader is None or not self.leader.is_leader:
+            return
+
+        started = time.perf_counter()
+        job.last_run_at = time.time()
+        try:
+            if job.executor == "event_loop":
+                result = job.func()
+                if asyncio.iscoroutine(result):
+                    await result
+            else:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(
+                    self._executor(job.executor), job.func
+                )
+            job.runs += 1
+            job.last_error = None
+        except Exception as e:
+            job.failures += 1
+            job.last_error = repr(e)
+            SCHEDULER_JOB_FAILURES.inc((job.name,))
+            logger.exception("Scheduled job %s failed", job.name)
+        finally:
+            job.last_duration = time.perf_counter() - started
+            SCHEDULER_JOB_DURATION.observe(job.last_duration, (job.name,))
+            logger.info(
+                "Scheduled job %s finished in %.3fs (lag %.3fs)",
+                job.name,
+                job.last_duration,
+                job.last_lag or 0.0,
+            )
+
+    def _record_lag(self, event: Any) -> None:
+        """
+        APScheduler listener storing how late a job was submitted.
+
+        :param event: JobSubmissionEvent.
+        """
+        if event.job_id not in [job.name for job in self.jobs.all()]:
+            return
+        scheduled = event.scheduled_run_times[-1]
+        lag = time.time() - scheduled.timestamp()
+        self.jobs.get(event.job_id).last_lag = max(lag, 0.0)
+
+    async def start(self) -> None:
+        """
+        Start leader election and schedule every registered job.
+        """
+        if not SCHEDULER_ENABLED or self._scheduler is not None:
+            return
+
+        from apscheduler.events import EVENT_JOB_SUBMITTED
+        from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+        client = (
+            registry.get("redis_async")
+            if registry.is_enabled("redis_async") else None
+        )
+        if client is None and WEB_WORKERS > 1:
+            logger.warning(
+                "Scheduled jobs are disabled: %d workers but Redis is off, "
+                "so no leader can be elected; enable Redis or run one "
+                "worker",
+                WEB_WORKERS,
+            )
+        self.leader = LeaderLock(
+            client,
+            SCHEDULER_LOCK_KEY,
+            SCHEDULER_LOCK_TTL,
+            standalone=WEB_WORKERS <= 1,
+        )
+        await self.leader.start()
+
+        self._scheduler = AsyncIOScheduler()
+        self._scheduler.add_listener(self._record_lag, EVENT_JOB_SUBMITTED)
+        for job in self.jobs.all():
+            self._scheduler.add_job(
+                self.run_job,
+                job.trigger,
+                args=[job],
+                id=job.name,
+                name=job.name,
+                max_instances=1,
+                coalesce=True,
+                **job.trigger_args,
+            )
+        self._scheduler.start()
+
+    async def shutdown(self) -> None:
+        """
+        Stop scheduling, hand leadership over and shut the pools down.
+        """
+        if self._scheduler is not None:
+            self._scheduler.shutdown(wait=False)
+            self._scheduler = None
+        if self.leader is not None:
+            await self.leader.stop()
+        for executor in self._executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        self._executors.clear()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """
+        Return run statistics for every registered job.
+
+        :return: List of per-job statistics.
+        """
+        return [job.stats() for job in self.jobs.all()]
+
+
+scheduler = Scheduler()